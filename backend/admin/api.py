@@ -3,16 +3,28 @@ Admin API router for FastAPI MashinMan project.
 """
 
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import List, Optional
 
+from .plates import backfill_plate_keys, search_plates
+from .search import backfill_search_keys, global_search
+from .vehicle_search import MILEAGE_BANDS, build_vehicle_filter, search_vehicles
 from users.models import User, UserOut
 from vehicles.models import Vehicle
-from services.models import Service
+from vehicles.garage import reconcile_garage_summaries
+from vehicles.valuation import run_valuation
+from history.analytics import rebuild_vehicle
+from history.parts import run_parts_usage
+from archive.archiver import run_archival
+from services.due_dates import run_due_dates
+from services.centers import center_location
+from services.models import Service, ServiceCenter, ServiceCenterCreate, ServiceCenterOut
 from pricing.models import CarPricing
+from pricing.alerts import price_alert_engine
 from emergency.models import EmergencyRequest, EmergencyServiceProvider
 from users.dependencies import get_current_active_user
 from core.security_middleware import get_current_admin_user
+from core.jalali import format_jalali_dates
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
@@ -136,17 +148,169 @@ async def list_all_vehicles(
     """Get list of all vehicles (admin only)"""
     vehicles = await Vehicle.find_all().skip(skip).limit(limit).to_list()
     
-    # Convert dates to Jalali for response
-    from core.jalali import gregorian_to_jalali
-    vehicles_out = []
-    for vehicle in vehicles:
-        vehicle_dict = vehicle.dict()
-        if vehicle.last_service_date:
-            jalali_date = gregorian_to_jalali(vehicle.last_service_date)
-            vehicle_dict['last_service_date'] = jalali_date.strftime("%Y/%m/%d")
-        vehicles_out.append(vehicle_dict)
+    # Convert the page's dates to Jalali at once
+    dates = format_jalali_dates(vehicle.last_service_date for vehicle in vehicles)
+    return [
+        {**vehicle.dict(), 'last_service_date': jalali_date}
+        for vehicle, jalali_date in zip(vehicles, dates)
+    ]
+
+
+@router.get("/vehicles/search")
+async def search_all_vehicles(
+    brand: Optional[List[str]] = Query(None),
+    model: Optional[List[str]] = Query(None),
+    year_from: Optional[int] = None,
+    year_to: Optional[int] = None,
+    mileage_band: Optional[str] = None,
+    overdue: Optional[bool] = None,
+    skip: int = 0,
+    limit: int = Query(50, ge=1, le=500),
+    admin_user: dict = Depends(get_current_admin_user)
+):
+    """Filter vehicles by brand, model, year, mileage band and overdue status with facet counts (admin only)"""
+    if mileage_band is not None and mileage_band not in MILEAGE_BANDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown mileage band. Expected one of: {', '.join(MILEAGE_BANDS)}"
+        )
+    
+    query = build_vehicle_filter(
+        brands=brand,
+        models=model,
+        year_from=year_from,
+        year_to=year_to,
+        mileage_band=mileage_band,
+        overdue=overdue,
+    )
+    return await search_vehicles(query, skip=skip, limit=limit)
+
+
+@router.get("/search")
+async def search_everything(
+    q: str = Query(..., min_length=2),
+    limit: int = Query(20, ge=1, le=100),
+    admin_user: dict = Depends(get_current_admin_user)
+):
+    """Find users, vehicles and emergency requests by partial name, phone or plate (admin only)"""
+    return await global_search(q, limit=limit)
+
+
+@router.post("/search/backfill")
+async def backfill_search(
+    admin_user: dict = Depends(get_current_admin_user)
+):
+    """Set the name and phone search keys on existing users and emergency requests (admin only)"""
+    stats = await backfill_search_keys()
+    
+    return {
+        "message": f"Updated search keys of {sum(stats.values())} documents",
+        **stats
+    }
+
+
+@router.get("/plates")
+async def search_by_plate(
+    q: str = Query(..., min_length=2),
+    prefix: bool = False,
+    limit: int = Query(50, ge=1, le=500),
+    admin_user: dict = Depends(get_current_admin_user)
+):
+    """Find vehicles, emergency requests and service history by exact or prefix plate (admin only)"""
+    return await search_plates(q, prefix=prefix, limit=limit)
+
+
+@router.post("/plates/backfill")
+async def backfill_plates(
+    admin_user: dict = Depends(get_current_admin_user)
+):
+    """Set the canonical plate key on existing vehicles, emergency requests and history (admin only)"""
+    stats = await backfill_plate_keys()
+    
+    return {
+        "message": f"Updated plate keys of {sum(stats.values())} documents",
+        **stats
+    }
+
+
+@router.post("/vehicles/valuation/run")
+async def run_vehicle_valuation(
+    admin_user: dict = Depends(get_current_admin_user)
+):
+    """Recompute estimated market values of all vehicles (admin only)"""
+    stats = await run_valuation()
+    
+    return {
+        "message": f"Valued {stats['valued']} of {stats['scanned']} vehicles",
+        **stats
+    }
+
+
+@router.post("/vehicles/{vehicle_id}/expense-summaries/rebuild")
+async def rebuild_vehicle_expense_summaries(
+    vehicle_id: str,
+    admin_user: dict = Depends(get_current_admin_user)
+):
+    """Recompute all monthly expense summaries of a vehicle (admin only)"""
+    summaries_count = await rebuild_vehicle(vehicle_id)
     
-    return vehicles_out
+    return {
+        "message": f"Rebuilt {summaries_count} monthly expense summaries",
+        "summaries_count": summaries_count
+    }
+
+
+@router.post("/history/parts-usage/run")
+async def run_history_parts_usage(
+    full: bool = False,
+    admin_user: dict = Depends(get_current_admin_user)
+):
+    """Recompute parts usage analytics for touched months, or all months if full (admin only)"""
+    stats = await run_parts_usage(full=full)
+    
+    return {
+        "message": f"Refreshed part usage for {stats['months']} months",
+        **stats
+    }
+
+
+@router.post("/archive/run")
+async def run_archive(
+    admin_user: dict = Depends(get_current_admin_user)
+):
+    """Move cold history, emergency and reminder records into archive bundles (admin only)"""
+    stats = await run_archival()
+    
+    return {
+        "message": f"Archived {sum(stats.values())} records",
+        **stats
+    }
+
+
+@router.post("/services/due-dates/run")
+async def run_service_due_dates(
+    admin_user: dict = Depends(get_current_admin_user)
+):
+    """Recompute maintenance due dates of the whole fleet (admin only)"""
+    stats = await run_due_dates()
+    
+    return {
+        "message": f"Computed due dates for {stats['scanned']} vehicles",
+        **stats
+    }
+
+
+@router.post("/garage-summaries/reconcile")
+async def reconcile_garage_summary_documents(
+    admin_user: dict = Depends(get_current_admin_user)
+):
+    """Recompute every user's garage summary from scratch (admin only)"""
+    stats = await reconcile_garage_summaries()
+    
+    return {
+        "message": f"Reconciled {stats['reconciled']} garage summaries",
+        **stats
+    }
 
 
 @router.get("/services")
@@ -174,6 +338,27 @@ async def list_all_services(
     return services_out
 
 
+@router.post("/service-centers", response_model=ServiceCenterOut, status_code=status.HTTP_201_CREATED)
+async def create_service_center(
+    center_data: ServiceCenterCreate,
+    admin_user: dict = Depends(get_current_admin_user)
+):
+    """Register a service center (admin only)"""
+    if center_data.closing_hour <= center_data.opening_hour:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Closing hour must be after opening hour"
+        )
+    
+    center = ServiceCenter(
+        **center_data.dict(),
+        location=center_location(center_data.latitude, center_data.longitude),
+    )
+    await center.insert()
+    
+    return ServiceCenterOut(**{**center.dict(), 'id': str(center.id)})
+
+
 @router.get("/emergency-requests")
 async def list_all_emergency_requests(
     status: str = None,
@@ -210,6 +395,7 @@ async def bulk_update_pricing(
 ):
     """Bulk update car pricing data (admin only)"""
     updated_count = 0
+    written_records = []
     
     for data in pricing_data:
         # Check if record already exists
@@ -227,15 +413,20 @@ async def bulk_update_pricing(
                     setattr(existing_record, key, value)
             existing_record.updated_at = datetime.utcnow()
             await existing_record.save()
+            written_records.append(existing_record)
         else:
             # Create new record
             new_record = CarPricing(**data)
             new_record.created_at = datetime.utcnow()
             new_record.updated_at = datetime.utcnow()
             await new_record.insert()
+            written_records.append(new_record)
         
         updated_count += 1
     
+    # Evaluate price alerts once for the whole batch
+    await price_alert_engine.on_prices(written_records)
+    
     return {
         "message": f"Successfully updated {updated_count} pricing records",
         "updated_count": updated_count
@@ -0,0 +1,105 @@
+"""
+Cross-collection plate lookup for FastAPI MashinMan project.
+
+Vehicles, emergency requests and service history entries all carry the
+canonical plate_key of their plate, indexed in each collection. An exact
+or prefix lookup over the three is one aggregation: the vehicle match is
+unioned with the matching emergency requests and history entries.
+"""
+
+import logging
+from typing import Dict, List
+
+from pymongo import UpdateOne
+
+from vehicles.models import Vehicle
+from emergency.models import EmergencyRequest
+from history.models import ServiceHistory
+from core.config import get_settings
+from core.jalali import format_jalali_dates
+from core.plates import plate_data_key, plate_key, plate_key_query
+
+logger = logging.getLogger('mashinman')
+_settings = get_settings()
+
+
+def _branch(match: Dict, source: str, label: str, date_field: str, limit: int) -> List[Dict]:
+    return [
+        {"$match": match},
+        {"$sort": {date_field: -1}},
+        {"$limit": limit},
+        {"$project": {
+            "_id": 0,
+            "source": {"$literal": source},
+            "id": {"$toString": "$_id"},
+            "plate_key": 1,
+            "user_id": 1,
+            "vehicle_id": {"$toString": "$_id"} if source == "vehicle" else 1,
+            "label": label,
+            "date": f"${date_field}",
+        }},
+    ]
+
+
+async def search_plates(query: str, prefix: bool = False, limit: int = 50) -> List[Dict]:
+    """
+    Find vehicles, emergency requests and service history entries by plate.
+
+    Args:
+        query (str): Full or partial plate as typed
+        prefix (bool): Match plates starting with the query
+        limit (int): Maximum matches per collection
+
+    Returns:
+        List[Dict]: Matches with source, id, plate_key, user_id, vehicle_id, label and Jalali date
+    """
+    match = {"plate_key": plate_key_query(query, prefix)}
+    pipeline = _branch(match, "vehicle", {"$concat": ["$brand", " ", "$model"]}, "created_at", limit) + [
+        {"$unionWith": {
+            "coll": EmergencyRequest.get_motor_collection().name,
+            "pipeline": _branch(match, "emergency", "$emergency_type", "created_at", limit),
+        }},
+        {"$unionWith": {
+            "coll": ServiceHistory.get_motor_collection().name,
+            "pipeline": _branch(match, "history", "$service_name", "actual_date", limit),
+        }},
+    ]
+    results = await Vehicle.get_motor_collection().aggregate(pipeline).to_list(length=None)
+
+    dates = format_jalali_dates(result["date"] for result in results)
+    for result, jalali_date in zip(results, dates):
+        result["date"] = jalali_date
+    return results
+
+
+async def backfill_plate_keys() -> Dict[str, int]:
+    """
+    Set plate_key on all documents of the three collections from their plates.
+
+    Returns:
+        Dict[str, int]: Number of documents updated per collection
+    """
+    sources = [
+        ("vehicles", Vehicle, "license_plate_data", plate_data_key),
+        ("emergency_requests", EmergencyRequest, "license_plate", plate_key),
+        ("service_histories", ServiceHistory, "vehicle_license_plate", plate_key),
+    ]
+    batch_size = _settings.PLATE_KEY_BACKFILL_BATCH_SIZE
+    stats = {}
+    for name, document, field, key_of in sources:
+        collection = document.get_motor_collection()
+        updated = 0
+        operations = []
+        async for record in collection.find({}, projection={field: 1, "plate_key": 1}).batch_size(batch_size):
+            key = key_of(record.get(field))
+            if record.get("plate_key") != key:
+                operations.append(UpdateOne({"_id": record["_id"]}, {"$set": {"plate_key": key}}))
+            if len(operations) >= batch_size:
+                updated += (await collection.bulk_write(operations, ordered=False)).modified_count
+                operations = []
+        if operations:
+            updated += (await collection.bulk_write(operations, ordered=False)).modified_count
+        stats[name] = updated
+
+    logger.info("Backfilled plate keys: %s", stats)
+    return stats
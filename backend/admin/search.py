@@ -0,0 +1,163 @@
+"""
+Admin global search for FastAPI MashinMan project.
+
+Users are found by prefixes of their normalized name words or phone,
+vehicles by plate prefix and emergency requests by phone or plate prefix.
+Every lookup is an anchored regex on a key that is normalized and indexed
+when the document is saved. The collections are queried concurrently with
+a time limit, and the matches are merged and ranked by how much of the
+matched key the query covers.
+"""
+
+import asyncio
+import logging
+import re
+from typing import Dict, List, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import ExecutionTimeout
+
+from users.models import User
+from vehicles.models import Vehicle
+from emergency.models import EmergencyRequest
+from core.config import get_settings
+from core.persian import fold_digits, fold_phone, tokenize_persian
+from core.plates import fold_plate
+
+logger = logging.getLogger('mashinman')
+_settings = get_settings()
+
+# Result types in the order they win ties
+SEARCH_TYPES = ['user', 'vehicle', 'emergency']
+
+_PHONE_QUERY = re.compile(r'^\+?[0-9\s\-()]+$')
+_DIGIT = re.compile(r'[0-9]')
+
+
+def _prefix(value: str) -> Dict:
+    return {"$regex": f"^{re.escape(value)}"}
+
+
+def _coverage(query: str, key: Optional[str]) -> float:
+    # 1.0 for an exact match, lower the more of the key the query leaves out
+    if not query or not key or not key.startswith(query):
+        return 0.0
+    return len(query) / len(key)
+
+
+def _name_score(tokens: List[str], names: List[str]) -> float:
+    # Every query word counts with the name word it covers best
+    return sum(max((_coverage(token, name) for name in names), default=0.0) for token in tokens) / len(tokens)
+
+
+async def _find(document, query: Dict, projection: Dict, limit: int) -> List[Dict]:
+    cursor = document.get_motor_collection().find(query, projection=projection).limit(limit)
+    try:
+        return await cursor.max_time_ms(_settings.ADMIN_SEARCH_MAX_TIME_MS).to_list(length=limit)
+    except ExecutionTimeout:
+        logger.warning("Admin search on %s timed out", document.get_motor_collection().name)
+        return []
+
+
+async def global_search(query: str, limit: int = 20) -> List[Dict]:
+    """
+    Search users, vehicles and emergency requests at once.
+
+    Args:
+        query (str): Partial name, phone or plate as typed
+        limit (int): Maximum number of results
+
+    Returns:
+        List[Dict]: Results with type, id, title, subtitle, matched field and score, best first
+    """
+    folded = fold_digits(query).strip()
+    phone = fold_phone(folded) if _PHONE_QUERY.match(folded) else ''
+    if len(phone) < _settings.ADMIN_SEARCH_MIN_PHONE_DIGITS:
+        phone = ''
+    plate = fold_plate(query) if _DIGIT.search(folded) else ''
+    # Digit-only queries are phones or plates, not names
+    tokens = tokenize_persian(query) if not _PHONE_QUERY.match(folded) else []
+
+    lookups = {}
+    if tokens:
+        lookups['user_name'] = _find(
+            User, {"$and": [{"search_names": _prefix(token)} for token in tokens]},
+            {"name": 1, "phone": 1, "search_names": 1, "is_active": 1}, limit,
+        )
+    if phone:
+        lookups['user_phone'] = _find(
+            User, {"phone_key": _prefix(phone)}, {"name": 1, "phone": 1, "phone_key": 1, "is_active": 1}, limit,
+        )
+    if plate:
+        lookups['vehicle'] = _find(
+            Vehicle, {"plate_key": _prefix(plate)}, {"brand": 1, "model": 1, "plate_key": 1, "user_id": 1}, limit,
+        )
+    if phone or plate:
+        conditions = ([{"phone_key": _prefix(phone)}] if phone else []) + ([{"plate_key": _prefix(plate)}] if plate else [])
+        lookups['emergency'] = _find(
+            EmergencyRequest, {"$or": conditions},
+            {"name": 1, "phone": 1, "phone_key": 1, "license_plate": 1, "plate_key": 1, "status": 1, "user_id": 1}, limit,
+        )
+    found = dict(zip(lookups, await asyncio.gather(*lookups.values())))
+
+    results: Dict[tuple, Dict] = {}
+
+    def add(result_type: str, record: Dict, matched: str, score: float, **fields) -> None:
+        key = (result_type, str(record["_id"]))
+        if score > 0 and (key not in results or results[key]["score"] < score):
+            results[key] = {"type": result_type, "id": key[1], "matched": matched, "score": round(score, 3), **fields}
+
+    for user in found.get('user_name', []):
+        add('user', user, 'name', _name_score(tokens, user.get("search_names", [])),
+            title=user.get("name"), subtitle=user.get("phone"), is_active=user.get("is_active"))
+    for user in found.get('user_phone', []):
+        add('user', user, 'phone', _coverage(phone, user.get("phone_key")),
+            title=user.get("name"), subtitle=user.get("phone"), is_active=user.get("is_active"))
+    for vehicle in found.get('vehicle', []):
+        add('vehicle', vehicle, 'plate', _coverage(plate, vehicle.get("plate_key")),
+            title=f"{vehicle.get('brand', '')} {vehicle.get('model', '')}".strip(), subtitle=vehicle.get("plate_key"),
+            user_id=vehicle.get("user_id"))
+    for request in found.get('emergency', []):
+        phone_score = _coverage(phone, request.get("phone_key"))
+        plate_score = _coverage(plate, request.get("plate_key"))
+        add('emergency', request, 'phone' if phone_score >= plate_score else 'plate', max(phone_score, plate_score),
+            title=request.get("name"), subtitle=request.get("license_plate"),
+            status=request.get("status"), user_id=request.get("user_id"))
+
+    ranked = sorted(results.values(), key=lambda result: (-result["score"], SEARCH_TYPES.index(result["type"])))
+    return ranked[:limit]
+
+
+async def backfill_search_keys() -> Dict[str, int]:
+    """
+    Set the name and phone search keys on existing users and emergency requests.
+
+    Returns:
+        Dict[str, int]: Number of documents updated per collection
+    """
+    sources = [
+        ("users", User, {"name": 1, "phone": 1, "search_names": 1, "phone_key": 1},
+         lambda record: {"search_names": tokenize_persian(record.get("name") or ''),
+                         "phone_key": fold_phone(record.get("phone") or '') or None}),
+        ("emergency_requests", EmergencyRequest, {"phone": 1, "phone_key": 1},
+         lambda record: {"phone_key": fold_phone(record.get("phone") or '') or None}),
+    ]
+    batch_size = _settings.ADMIN_SEARCH_BACKFILL_BATCH_SIZE
+    stats = {}
+    for name, document, projection, keys_of in sources:
+        collection = document.get_motor_collection()
+        updated = 0
+        operations = []
+        async for record in collection.find({}, projection=projection).batch_size(batch_size):
+            keys = keys_of(record)
+            if any(record.get(field) != value for field, value in keys.items()):
+                operations.append(UpdateOne({"_id": record["_id"]}, {"$set": keys}))
+            if len(operations) >= batch_size:
+                updated += (await collection.bulk_write(operations, ordered=False)).modified_count
+                operations = []
+        if operations:
+            updated += (await collection.bulk_write(operations, ordered=False)).modified_count
+        stats[name] = updated
+
+    logger.info("Backfilled search keys: %s", stats)
+    return stats
@@ -0,0 +1,138 @@
+"""
+Tests for the admin app.
+"""
+
+import pytest
+
+from admin import search as admin_search
+from admin.search import _coverage, _name_score, global_search
+from admin.vehicle_search import MILEAGE_BANDS, _facet_stages, _format_facets, build_vehicle_filter
+
+
+def test_build_vehicle_filter_is_empty_without_filters():
+    assert build_vehicle_filter() == {}
+
+
+def test_build_vehicle_filter_combines_filters():
+    assert build_vehicle_filter(
+        brands=['سایپا'], models=['پراید'], year_from=1390, year_to=1400,
+        mileage_band='50000-100000', overdue=False,
+    ) == {
+        "brand": {"$in": ['سایپا']},
+        "model": {"$in": ['پراید']},
+        "manufacture_year": {"$gte": 1390, "$lte": 1400},
+        "current_mileage": {"$gte": 50000, "$lt": 100000},
+        "is_overdue": False,
+    }
+
+
+def test_build_vehicle_filter_open_ranges():
+    assert build_vehicle_filter(year_to=1395) == {"manufacture_year": {"$lte": 1395}}
+    assert build_vehicle_filter(mileage_band='200000+') == {"current_mileage": {"$gte": 200000}}
+
+
+def test_mileage_band_boundaries_match_bands():
+    bucket = _facet_stages()["mileage_bands"][0]["$bucket"]
+
+    assert bucket["boundaries"] == [lower for lower, _ in MILEAGE_BANDS.values()]
+    # Vehicles past the last boundary are counted in the open band
+    assert bucket["default"] == MILEAGE_BANDS['200000+'][0]
+
+
+def test_format_facets():
+    row = {
+        "total": [{"count": 7}],
+        "brands": [{"_id": 'ایران خودرو', "count": 4}, {"_id": 'سایپا', "count": 3}],
+        "models": [{"_id": {"brand": 'سایپا', "model": 'پراید'}, "count": 3}],
+        "years": [{"_id": 1400, "count": 5}, {"_id": 1395, "count": 2}],
+        "mileage_bands": [
+            {"_id": 0, "count": 1},
+            {"_id": 100000, "count": 4},
+            {"_id": 200000, "count": 2},
+        ],
+        "overdue": [{"_id": True, "count": 2}, {"_id": False, "count": 5}],
+    }
+
+    assert _format_facets(row) == {
+        "total": 7,
+        "brands": [{"brand": 'ایران خودرو', "count": 4}, {"brand": 'سایپا', "count": 3}],
+        "models": [{"brand": 'سایپا', "model": 'پراید', "count": 3}],
+        "years": [{"year": 1400, "count": 5}, {"year": 1395, "count": 2}],
+        "mileage_bands": [
+            {"band": '0-50000', "count": 1},
+            {"band": '100000-200000', "count": 4},
+            {"band": '200000+', "count": 2},
+        ],
+        "overdue": {"true": 2, "false": 5},
+    }
+
+
+def test_format_facets_of_an_empty_match():
+    row = {"total": [], "brands": [], "models": [], "years": [], "mileage_bands": [], "overdue": []}
+
+    assert _format_facets(row) == {
+        "total": 0, "brands": [], "models": [], "years": [], "mileage_bands": [], "overdue": {},
+    }
+
+
+def test_coverage():
+    assert _coverage('9121', '9121234567') == pytest.approx(0.4)
+    assert _coverage('9121234567', '9121234567') == 1.0
+    assert _coverage('9122', '9121234567') == 0.0
+    assert _coverage('', '9121234567') == 0.0
+    assert _coverage('9121', None) == 0.0
+
+
+def test_name_score_uses_the_best_covered_word_per_token():
+    names = ['علی', 'رضایی']
+
+    assert _name_score(['علی'], names) == 1.0
+    assert _name_score(['علی', 'رضایی'], names) == 1.0
+    assert _name_score(['رض'], names) == pytest.approx(2 / 5)
+    assert _name_score(['علی', 'رض'], names) == pytest.approx((1.0 + 2 / 5) / 2)
+    assert _name_score(['محمد'], names) == 0.0
+    assert _name_score(['علی'], []) == 0.0
+
+
+@pytest.fixture
+def search_records(monkeypatch):
+    records = {}
+
+    async def find(document, query, projection, limit):
+        return records.get(document.__name__, [])[:limit]
+
+    monkeypatch.setattr(admin_search, '_find', find)
+    return records
+
+
+@pytest.mark.asyncio
+async def test_global_search_ranks_exact_names_first(search_records):
+    search_records['User'] = [
+        {"_id": 1, "name": 'علیرضا رضایی', "search_names": ['علیرضا', 'رضایی']},
+        {"_id": 2, "name": 'علی رضایی', "search_names": ['علی', 'رضایی']},
+        {"_id": 3, "name": 'علی رضوانی', "search_names": ['علی', 'رضوانی']},
+    ]
+
+    results = await global_search('علی رضا')
+
+    # Both words partly covered beat one word missed
+    assert [result["id"] for result in results] == ['2', '1', '3']
+    assert results[0]["matched"] == 'name'
+    assert results[0]["score"] == round((1.0 + 3 / 5) / 2, 3)
+
+
+@pytest.mark.asyncio
+async def test_global_search_breaks_ties_by_type_and_limits(search_records):
+    search_records['User'] = [{"_id": 'u1', "name": 'علی', "phone": '09121234', "phone_key": '9121234'}]
+    search_records['EmergencyRequest'] = [
+        {"_id": 'e1', "name": 'علی', "phone": '09121234', "phone_key": '9121234'},
+        {"_id": 'e2', "name": 'مریم', "phone": '09121234567', "phone_key": '9121234567'},
+    ]
+
+    results = await global_search('0912 1234')
+
+    assert [(result["type"], result["id"]) for result in results] == [
+        ('user', 'u1'), ('emergency', 'e1'), ('emergency', 'e2'),
+    ]
+    assert results[1]["matched"] == 'phone'
+    assert len(await global_search('0912 1234', limit=2)) == 2
@@ -0,0 +1,188 @@
+"""
+Faceted admin vehicle search for FastAPI MashinMan project.
+
+Filters on brand, model, manufacture year, mileage band and overdue status
+run against compound indexes, and the result page and the facet counts of
+the filtered set come from one $facet aggregation. The facet counts of the
+unfiltered fleet, which cost the most, are computed in the background and
+served from memory.
+"""
+
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from vehicles.models import Vehicle
+from core.config import get_settings
+from core.jobs import PeriodicJob
+from core.jalali import format_jalali_dates
+
+logger = logging.getLogger('mashinman')
+_settings = get_settings()
+
+# Mileage band key -> [lower, upper) in km; the last band has no upper bound
+MILEAGE_BANDS = {
+    '0-50000': (0, 50000),
+    '50000-100000': (50000, 100000),
+    '100000-200000': (100000, 200000),
+    '200000+': (200000, None),
+}
+
+_BAND_BY_LOWER = {lower: key for key, (lower, upper) in MILEAGE_BANDS.items()}
+
+_RESULT_PROJECTION = {
+    "license_plate_data": 1, "plate_key": 1, "brand": 1, "model": 1, "manufacture_year": 1,
+    "current_mileage": 1, "last_service_date": 1, "last_service_mileage": 1,
+    "user_id": 1, "is_overdue": 1, "created_at": 1,
+}
+
+
+def build_vehicle_filter(
+    brands: Optional[List[str]] = None,
+    models: Optional[List[str]] = None,
+    year_from: Optional[int] = None,
+    year_to: Optional[int] = None,
+    mileage_band: Optional[str] = None,
+    overdue: Optional[bool] = None,
+) -> Dict:
+    """
+    Build the MongoDB filter of a faceted vehicle search.
+
+    Returns:
+        Dict: Filter on the vehicles collection, empty if nothing is filtered
+    """
+    query: Dict = {}
+    if brands:
+        query["brand"] = {"$in": brands}
+    if models:
+        query["model"] = {"$in": models}
+    if year_from is not None or year_to is not None:
+        query["manufacture_year"] = {
+            **({"$gte": year_from} if year_from is not None else {}),
+            **({"$lte": year_to} if year_to is not None else {}),
+        }
+    if mileage_band is not None:
+        lower, upper = MILEAGE_BANDS[mileage_band]
+        query["current_mileage"] = {"$gte": lower, **({"$lt": upper} if upper is not None else {})}
+    if overdue is not None:
+        query["is_overdue"] = overdue
+    return query
+
+
+def _facet_stages() -> Dict[str, List[Dict]]:
+    lowers = list(_BAND_BY_LOWER)
+    return {
+        "total": [{"$count": "count"}],
+        "brands": [{"$sortByCount": "$brand"}],
+        "models": [
+            {"$group": {"_id": {"brand": "$brand", "model": "$model"}, "count": {"$sum": 1}}},
+            {"$sort": {"count": -1}},
+            {"$limit": _settings.VEHICLE_FACET_MODELS_LIMIT},
+        ],
+        "years": [
+            {"$group": {"_id": "$manufacture_year", "count": {"$sum": 1}}},
+            {"$sort": {"_id": -1}},
+        ],
+        # Vehicles past the last boundary fall into the open band via the default
+        "mileage_bands": [{"$bucket": {
+            "groupBy": "$current_mileage",
+            "boundaries": lowers,
+            "default": lowers[-1],
+        }}],
+        "overdue": [{"$group": {"_id": {"$ifNull": ["$is_overdue", False]}, "count": {"$sum": 1}}}],
+    }
+
+
+def _format_facets(row: Dict) -> Dict:
+    return {
+        "total": row["total"][0]["count"] if row["total"] else 0,
+        "brands": [{"brand": item["_id"], "count": item["count"]} for item in row["brands"]],
+        "models": [{**item["_id"], "count": item["count"]} for item in row["models"]],
+        "years": [{"year": item["_id"], "count": item["count"]} for item in row["years"]],
+        "mileage_bands": [
+            {"band": _BAND_BY_LOWER[item["_id"]], "count": item["count"]}
+            for item in row["mileage_bands"]
+        ],
+        "overdue": {str(item["_id"]).lower(): item["count"] for item in row["overdue"]},
+    }
+
+
+async def compute_facets(query: Dict) -> Dict:
+    """
+    Compute the facet counts of the vehicles matching a filter.
+
+    Args:
+        query (Dict): Filter on the vehicles collection
+
+    Returns:
+        Dict: Total and counts per brand, model, year, mileage band and overdue status
+    """
+    pipeline = [{"$match": query}, {"$facet": _facet_stages()}]
+    rows = await Vehicle.get_motor_collection().aggregate(pipeline).to_list(length=None)
+    return _format_facets(rows[0])
+
+
+def _format_results(vehicles: List[Dict]) -> List[Dict]:
+    dates = format_jalali_dates(vehicle.get("last_service_date") for vehicle in vehicles)
+    return [
+        {**vehicle, "id": str(vehicle.pop("_id")), "last_service_date": jalali_date}
+        for vehicle, jalali_date in zip(vehicles, dates)
+    ]
+
+
+async def search_vehicles(query: Dict, skip: int = 0, limit: int = 50) -> Dict:
+    """
+    Get a page of vehicles matching a filter with the facet counts of the match.
+
+    Args:
+        query (Dict): Filter built with build_vehicle_filter
+        skip (int): Number of vehicles to skip
+        limit (int): Page size
+
+    Returns:
+        Dict: 'results' page (newest first), 'facets' and 'facets_cached_at' (None if computed now)
+    """
+    page = [{"$sort": {"_id": -1}}, {"$skip": skip}, {"$limit": limit}, {"$project": _RESULT_PROJECTION}]
+    collection = Vehicle.get_motor_collection()
+
+    if not query and vehicle_facet_cache.facets is not None:
+        vehicles = await collection.aggregate(page).to_list(length=None)
+        return {
+            "results": _format_results(vehicles),
+            "facets": vehicle_facet_cache.facets,
+            "facets_cached_at": vehicle_facet_cache.refreshed_at,
+        }
+
+    pipeline = [{"$match": query}, {"$facet": {"results": page, **_facet_stages()}}]
+    rows = await collection.aggregate(pipeline).to_list(length=None)
+    return {
+        "results": _format_results(rows[0]["results"]),
+        "facets": _format_facets(rows[0]),
+        "facets_cached_at": None,
+    }
+
+
+class VehicleFacetCache:
+    """
+    Holds the facet counts of the unfiltered fleet and refreshes them in the background.
+    """
+
+    def __init__(self, refresh_seconds: float):
+        self.facets: Optional[Dict] = None
+        self.refreshed_at: Optional[datetime] = None
+        self._job = PeriodicJob("Vehicle facet refresh", self.refresh, refresh_seconds)
+
+    async def refresh(self) -> None:
+        self.facets = await compute_facets({})
+        self.refreshed_at = datetime.utcnow()
+        logger.info("Vehicle facet counts refreshed for %d vehicles", self.facets["total"])
+
+    def start(self) -> None:
+        self._job.start()
+
+    async def stop(self) -> None:
+        await self._job.stop()
+
+
+# Global vehicle facet cache instance
+vehicle_facet_cache = VehicleFacetCache(_settings.VEHICLE_FACETS_REFRESH_SECONDS)
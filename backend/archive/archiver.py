@@ -0,0 +1,264 @@
+"""
+Tiered archival for FastAPI MashinMan project.
+
+Cold records (old service history, closed emergency requests and sent
+reminders) are moved out of their hot collections into ArchiveBundle
+documents: one zlib-compressed BSON bundle per source, vehicle and Jalali
+month. Bundles are written before the originals are deleted, and merged by
+record id, so an interrupted run can simply be repeated. Each bundle write
+is conditional on the version that was read; a bundle changed by a
+concurrent run makes the batch re-read and re-merge its bundles, so no
+run overwrites records another run has already deleted.
+"""
+
+import logging
+import zlib
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional, Tuple
+
+import bson
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from .models import ArchiveBundle
+from core.config import get_settings
+from core.jobs import PeriodicJob
+from core.jalali import jalali_year_month
+from emergency.models import EmergencyRequest, CLOSED_EMERGENCY_STATUSES
+from history.models import ServiceHistory
+from services.models import ServiceReminder
+
+logger = logging.getLogger('mashinman')
+_settings = get_settings()
+
+# (vehicle key, jalali year, jalali month)
+BundleKey = Tuple[str, int, int]
+
+
+class ArchivePolicy(NamedTuple):
+    source: str
+    document: type
+    # Field whose Jalali month selects the bundle
+    date_field: str
+
+    def cold_filter(self, now: datetime) -> Dict:
+        if self.source == 'service_histories':
+            return {"actual_date": {"$lt": now - timedelta(days=_settings.ARCHIVE_HISTORY_RETENTION_DAYS)}}
+        if self.source == 'emergency_requests':
+            return {
+                "status": {"$in": CLOSED_EMERGENCY_STATUSES},
+                "updated_at": {"$lt": now - timedelta(days=_settings.ARCHIVE_EMERGENCY_DAYS)},
+            }
+        return {
+            "is_sent": True,
+            "updated_at": {"$lt": now - timedelta(days=_settings.ARCHIVE_REMINDER_DAYS)},
+        }
+
+
+ARCHIVE_POLICIES = [
+    ArchivePolicy('service_histories', ServiceHistory, 'actual_date'),
+    ArchivePolicy('emergency_requests', EmergencyRequest, 'created_at'),
+    ArchivePolicy('service_reminders', ServiceReminder, 'reminder_date'),
+]
+
+
+def decode_records(payload: bytes) -> List[Dict]:
+    """Decompress and deserialize the records of a bundle."""
+    return bson.decode(zlib.decompress(payload))["records"]
+
+
+def _vehicle_key(record: Dict) -> str:
+    # Emergency requests may not reference a vehicle; those are bundled per user
+    return record.get("vehicle_id") or f"user:{record.get('user_id')}"
+
+
+async def _write_bundles(policy: ArchivePolicy, groups: Dict[BundleKey, List[Dict]]) -> bool:
+    bundles = ArchiveBundle.get_motor_collection()
+
+    # Months that were partly archived before are merged into their existing bundle
+    existing: Dict[BundleKey, Tuple[Optional[int], List[Dict]]] = {}
+    cursor = bundles.find({
+        "source": policy.source,
+        "$or": [{"vehicle_id": vehicle_id, "year": year, "month": month} for vehicle_id, year, month in groups],
+    }, projection={"vehicle_id": 1, "year": 1, "month": 1, "payload": 1, "version": 1})
+    async for bundle in cursor:
+        existing[(bundle["vehicle_id"], bundle["year"], bundle["month"])] = (
+            bundle.get("version"), decode_records(bundle["payload"])
+        )
+
+    now = datetime.utcnow()
+    operations = []
+    for (vehicle_id, year, month), group in groups.items():
+        # None matches both a missing bundle and one written before versioning
+        version, previous = existing.get((vehicle_id, year, month), (None, []))
+        merged = {str(record["_id"]): record for record in previous}
+        merged.update((str(record["_id"]), record) for record in group)
+        bundle_records = sorted(merged.values(), key=lambda record: record[policy.date_field])
+        raw = bson.encode({"records": bundle_records})
+        payload = zlib.compress(raw, _settings.ARCHIVE_COMPRESSION_LEVEL)
+        operations.append(UpdateOne(
+            {"source": policy.source, "vehicle_id": vehicle_id, "year": year, "month": month, "version": version},
+            {
+                "$set": {
+                    "version": (version or 0) + 1,
+                    "user_id": group[0].get("user_id"),
+                    "record_ids": list(merged),
+                    "records_count": len(merged),
+                    "payload": payload,
+                    "raw_size": len(raw),
+                    "compressed_size": len(payload),
+                    "updated_at": now,
+                },
+                "$setOnInsert": {"created_at": now},
+            },
+            upsert=True,
+        ))
+
+    try:
+        await bundles.bulk_write(operations, ordered=False)
+    except BulkWriteError as exc:
+        # A bundle whose version moved no longer matches, and its upsert hits the unique bundle key
+        if any(error.get("code") != 11000 for error in exc.details.get("writeErrors", [])):
+            raise
+        return False
+    return True
+
+
+async def _archive_batch(policy: ArchivePolicy, records: List[Dict]) -> int:
+    groups: Dict[BundleKey, List[Dict]] = {}
+    for record in records:
+        year, month = jalali_year_month(record[policy.date_field])
+        groups.setdefault((_vehicle_key(record), year, month), []).append(record)
+
+    for _ in range(_settings.ARCHIVE_CONFLICT_RETRIES):
+        if await _write_bundles(policy, groups):
+            break
+    else:
+        # Originals stay in place and are picked up by the next run
+        logger.warning("Archive bundles of %s kept changing, skipped %d records", policy.source, len(records))
+        return 0
+
+    # Originals are only removed once their bundles are written
+    await policy.document.get_motor_collection().delete_many({"_id": {"$in": [record["_id"] for record in records]}})
+    return len(records)
+
+
+async def archive_source(policy: ArchivePolicy, now: Optional[datetime] = None) -> int:
+    """
+    Move the cold records of one source collection into archive bundles.
+
+    Args:
+        policy (ArchivePolicy): Source collection and its retention rule
+        now (datetime): Reference time for the retention horizon
+
+    Returns:
+        int: Number of records archived
+    """
+    now = now or datetime.utcnow()
+    batch_size = _settings.ARCHIVE_BATCH_SIZE
+    cursor = policy.document.get_motor_collection().find(policy.cold_filter(now)).sort("_id", 1).batch_size(batch_size)
+
+    archived = 0
+    batch = []
+    async for record in cursor:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            archived += await _archive_batch(policy, batch)
+            batch = []
+    if batch:
+        archived += await _archive_batch(policy, batch)
+    return archived
+
+
+async def run_archival() -> Dict[str, int]:
+    """
+    Archive the cold records of every source collection.
+
+    Returns:
+        Dict[str, int]: Number of records archived per source collection
+    """
+    now = datetime.utcnow()
+    stats = {}
+    for policy in ARCHIVE_POLICIES:
+        stats[policy.source] = await archive_source(policy, now)
+    logger.info("Archived cold records: %s", stats)
+    return stats
+
+
+async def find_archived_record(source: str, record_id: str) -> Optional[Dict]:
+    """
+    Find one archived record by its original ID.
+
+    Args:
+        source (str): Source collection name
+        record_id (str): Original record ID
+
+    Returns:
+        Optional[Dict]: The archived record, or None
+    """
+    bundle = await ArchiveBundle.get_motor_collection().find_one(
+        {"source": source, "record_ids": record_id}, projection={"payload": 1}
+    )
+    if bundle is None:
+        return None
+    for record in decode_records(bundle["payload"]):
+        if str(record["_id"]) == record_id:
+            return record
+    return None
+
+
+async def load_archived_records(source: str, bundle_query: Dict) -> List[Dict]:
+    """
+    Load every archived record of the bundles matching a filter.
+
+    Args:
+        source (str): Source collection name
+        bundle_query (Dict): Filter on the bundle key, e.g. {"vehicle_id": ..., "year": ..., "month": ...}
+
+    Returns:
+        List[Dict]: Archived records
+    """
+    cursor = ArchiveBundle.get_motor_collection().find(
+        {"source": source, **bundle_query}, projection={"payload": 1}
+    )
+    records: List[Dict] = []
+    async for bundle in cursor:
+        records.extend(decode_records(bundle["payload"]))
+    return records
+
+
+async def iter_archived_records(source: str, vehicle_ids: List[str], date_field: str) -> AsyncIterator[Dict]:
+    """
+    Iterate the archived records of some vehicles, newest first.
+
+    Bundles are decoded one Jalali month at a time, so callers that stop
+    early never decompress older months.
+
+    Args:
+        source (str): Source collection name
+        vehicle_ids (List[str]): Vehicle IDs
+        date_field (str): Field the records are ordered by
+
+    Yields:
+        Dict: Archived records
+    """
+    cursor = ArchiveBundle.get_motor_collection().find(
+        {"source": source, "vehicle_id": {"$in": vehicle_ids}},
+        projection={"year": 1, "month": 1, "payload": 1},
+    ).sort([("year", -1), ("month", -1)])
+
+    period = None
+    pending: List[Dict] = []
+    async for bundle in cursor:
+        if (bundle["year"], bundle["month"]) != period:
+            for record in sorted(pending, key=lambda record: record[date_field], reverse=True):
+                yield record
+            period = (bundle["year"], bundle["month"])
+            pending = []
+        pending.extend(decode_records(bundle["payload"]))
+    for record in sorted(pending, key=lambda record: record[date_field], reverse=True):
+        yield record
+
+
+# Global archive job instance
+archive_job = PeriodicJob("Archive job", run_archival, _settings.ARCHIVE_INTERVAL_HOURS * 3600)
@@ -0,0 +1,41 @@
+"""
+Archive models for FastAPI MashinMan project using Beanie ODM.
+"""
+
+from typing import Optional, List
+from datetime import datetime
+from beanie import Document
+from pymongo import IndexModel
+from pydantic import Field
+
+
+class ArchiveBundle(Document):
+    """
+    Compressed bundle of cold records of one source collection for one vehicle and Jalali month.
+    """
+    
+    # Bundle key
+    source: str = Field(..., description="مجموعه مبدأ")
+    user_id: Optional[str] = Field(None, description="شناسه کاربر")
+    vehicle_id: str = Field(..., description="شناسه خودرو")
+    year: int = Field(..., description="سال")
+    month: int = Field(..., description="ماه")
+    
+    # Contents
+    record_ids: List[str] = Field(default=[], description="شناسه رکوردهای بایگانی‌شده")
+    records_count: int = Field(default=0, description="تعداد رکوردها")
+    payload: bytes = Field(..., description="رکوردهای فشرده‌شده (BSON + zlib)")
+    raw_size: int = Field(default=0, description="حجم پیش از فشرده‌سازی (بایت)")
+    compressed_size: int = Field(default=0, description="حجم فشرده (بایت)")
+    version: int = Field(default=1, description="نسخه (برای به‌روزرسانی همزمان)")
+    
+    # Metadata
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "archive_bundles"
+        indexes = [
+            IndexModel([("source", 1), ("vehicle_id", 1), ("year", 1), ("month", 1)], unique=True),
+            [("source", 1), ("record_ids", 1)],
+        ]
@@ -0,0 +1,28 @@
+"""
+Catalog API router for FastAPI MashinMan project.
+"""
+
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Query
+
+from .autocomplete import catalog_autocomplete
+from .models import CatalogSuggestion
+from users.models import User
+from users.dependencies import get_current_active_user
+
+router = APIRouter(prefix="/catalog", tags=["catalog"])
+
+
+@router.get("/autocomplete", response_model=List[CatalogSuggestion])
+async def autocomplete(
+    q: str = "",
+    kind: Optional[str] = Query(None, pattern="^(brand|model)$"),
+    brand: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=50),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Suggest car brands and models for a typed prefix"""
+    # Served entirely from the in-memory index
+    suggestions = catalog_autocomplete.search(q, kind=kind, brand=brand, limit=limit)
+    
+    return [CatalogSuggestion(**entry._asdict()) for entry in suggestions]
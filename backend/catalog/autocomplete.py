@@ -0,0 +1,182 @@
+"""
+Brand/model autocomplete index for FastAPI MashinMan project.
+
+Names from car pricing records, vehicles and the static brand list are
+normalized and kept in a sorted array, so a prefix lookup is a pair of
+bisects. The index is rebuilt in the background and swapped in whole, so
+requests never wait on the database.
+"""
+
+import heapq
+import logging
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from core.config import get_settings
+from core.jobs import PeriodicJob
+from core.persian import normalize_persian
+from core.utils import get_iranian_car_brands
+from pricing.models import CarPricing
+from vehicles.models import Vehicle
+
+logger = logging.getLogger('mashinman')
+_settings = get_settings()
+
+# Sorts after every character that can appear in a normalized name
+_PREFIX_END = '\U0010ffff'
+
+
+class CatalogEntry(NamedTuple):
+    kind: str
+    name: str
+    brand: Optional[str]
+    popularity: int
+
+
+class AutocompleteIndex:
+    """
+    Immutable prefix index over catalog entries.
+    """
+
+    def __init__(self, entries: List[CatalogEntry]):
+        self.entries = entries
+        self._normalized_brands = [normalize_persian(entry.brand or '') for entry in entries]
+
+        # Index the full name and every word start inside it, so "s3" finds "جک S3"
+        keyed = []
+        for position, entry in enumerate(entries):
+            tokens = normalize_persian(entry.name).split(' ')
+            for start in range(len(tokens)):
+                keyed.append((' '.join(tokens[start:]), position))
+        keyed.sort()
+        self._keys = [key for key, _ in keyed]
+        self._positions = [position for _, position in keyed]
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def search(
+        self,
+        prefix: str,
+        kind: Optional[str] = None,
+        brand: Optional[str] = None,
+        limit: int = 10,
+    ) -> List[CatalogEntry]:
+        """
+        Find the most popular entries whose name (or a word in it) starts with prefix.
+
+        Args:
+            prefix (str): User-typed prefix
+            kind (str): Restrict to 'brand' or 'model'
+            brand (str): Restrict models to this brand
+            limit (int): Maximum number of suggestions
+
+        Returns:
+            List[CatalogEntry]: Suggestions ordered by popularity
+        """
+        normalized = normalize_persian(prefix)
+        normalized_brand = normalize_persian(brand) if brand else None
+
+        if normalized:
+            lo = bisect_left(self._keys, normalized)
+            hi = bisect_left(self._keys, normalized + _PREFIX_END)
+            positions = set(self._positions[lo:hi])
+        else:
+            positions = range(len(self.entries))
+
+        candidates = []
+        for position in positions:
+            entry = self.entries[position]
+            if kind and entry.kind != kind:
+                continue
+            if normalized_brand and self._normalized_brands[position] != normalized_brand:
+                continue
+            candidates.append(entry)
+
+        return heapq.nlargest(limit, candidates, key=lambda entry: (entry.popularity, -len(entry.name)))
+
+
+async def _count_models(document, brand_field: str, model_field: str) -> Counter:
+    pipeline = [
+        {"$group": {"_id": {"brand": f"${brand_field}", "model": f"${model_field}"}, "count": {"$sum": 1}}},
+    ]
+    counts = Counter()
+    async for row in document.aggregate(pipeline):
+        brand, model = row["_id"].get("brand"), row["_id"].get("model")
+        if brand and model:
+            counts[(brand, model)] += row["count"]
+    return counts
+
+
+def merge_entries(model_counts: Counter, brands: List[str]) -> List[CatalogEntry]:
+    """
+    Merge brand/model usage counts into catalog entries.
+
+    Args:
+        model_counts (Counter): Number of records per (brand, model) as spelled in them
+        brands (List[str]): Static brand list, listed even without any record
+
+    Returns:
+        List[CatalogEntry]: One entry per distinct brand and per distinct model of a brand
+    """
+    # Spellings that only differ in Arabic/Persian characters, digits or ZWNJ are the same name
+    brand_names: Dict[str, Counter] = {normalize_persian(brand): Counter({brand: 0}) for brand in brands}
+    model_names: Dict[Tuple[str, str], Counter] = {}
+    for (brand, model), count in model_counts.items():
+        brand_key, model_key = normalize_persian(brand), normalize_persian(model)
+        if not brand_key or not model_key:
+            continue
+        brand_names.setdefault(brand_key, Counter())[brand] += count
+        model_names.setdefault((brand_key, model_key), Counter())[model] += count
+
+    # Most used spelling is shown
+    brand_display = {brand_key: names.most_common(1)[0][0] for brand_key, names in brand_names.items()}
+    entries = [
+        CatalogEntry('brand', brand_display[brand_key], None, sum(names.values()))
+        for brand_key, names in brand_names.items()
+    ]
+    entries.extend(
+        CatalogEntry('model', names.most_common(1)[0][0], brand_display[brand_key], sum(names.values()))
+        for (brand_key, _), names in model_names.items()
+    )
+    return entries
+
+
+async def build_index() -> AutocompleteIndex:
+    """
+    Build a fresh index from vehicles, car pricings and the static brand list.
+
+    Returns:
+        AutocompleteIndex: New index snapshot
+    """
+    model_counts = await _count_models(Vehicle, "brand", "model")
+    model_counts.update(await _count_models(CarPricing, "brand", "model"))
+    return AutocompleteIndex(merge_entries(model_counts, get_iranian_car_brands()))
+
+
+class CatalogAutocomplete:
+    """
+    Holds the current index snapshot and refreshes it in the background.
+    """
+
+    def __init__(self, refresh_seconds: float):
+        self.index = AutocompleteIndex([])
+        self._job = PeriodicJob("Catalog autocomplete refresh", self.refresh, refresh_seconds)
+
+    async def refresh(self) -> None:
+        self.index = await build_index()
+        logger.info("Catalog autocomplete index rebuilt with %d entries", len(self.index))
+
+    def search(self, prefix: str, kind: Optional[str] = None, brand: Optional[str] = None, limit: int = 10) -> List[CatalogEntry]:
+        return self.index.search(prefix, kind=kind, brand=brand, limit=limit)
+
+    def start(self) -> None:
+        self._job.start()
+
+    async def stop(self) -> None:
+        await self._job.stop()
+
+
+# Global autocomplete instance
+catalog_autocomplete = CatalogAutocomplete(_settings.CATALOG_AUTOCOMPLETE_REFRESH_SECONDS)
@@ -0,0 +1,16 @@
+"""
+Catalog models for FastAPI MashinMan project.
+"""
+
+from typing import Optional
+from pydantic import BaseModel, Field
+
+
+class CatalogSuggestion(BaseModel):
+    """
+    Schema for a brand or model autocomplete suggestion.
+    """
+    kind: str = Field(..., description="نوع پیشنهاد (brand یا model)")
+    name: str = Field(..., description="نام")
+    brand: Optional[str] = Field(None, description="برند (برای مدل‌ها)")
+    popularity: int = Field(..., description="میزان محبوبیت")
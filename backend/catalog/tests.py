@@ -0,0 +1,77 @@
+"""
+Tests for the catalog app.
+"""
+
+from collections import Counter
+
+from catalog.autocomplete import AutocompleteIndex, CatalogEntry, merge_entries
+
+
+def _index():
+    return AutocompleteIndex([
+        CatalogEntry('brand', 'ایران خودرو', None, 40),
+        CatalogEntry('brand', 'جک', None, 15),
+        CatalogEntry('model', 'پژو 206', 'ایران خودرو', 30),
+        CatalogEntry('model', 'پژو پارس', 'ایران خودرو', 25),
+        CatalogEntry('model', 'جک S3', 'جک', 10),
+        CatalogEntry('model', 'جک S5', 'جک', 12),
+    ])
+
+
+def _names(entries):
+    return [entry.name for entry in entries]
+
+
+def test_search_matches_prefix_of_name_ordered_by_popularity():
+    assert _names(_index().search('پژو')) == ['پژو 206', 'پژو پارس']
+
+
+def test_search_matches_prefix_of_inner_word():
+    assert _names(_index().search('s')) == ['جک S5', 'جک S3']
+    assert _names(_index().search('پارس')) == ['پژو پارس']
+
+
+def test_search_normalizes_the_prefix():
+    # Arabic yeh/kaf and Persian digits fold to the indexed spelling
+    assert _names(_index().search('پژو ۲۰')) == ['پژو 206']
+    assert _names(_index().search('جك')) == ['جک', 'جک S5', 'جک S3']
+
+
+def test_search_prefix_stops_at_the_last_matching_key():
+    assert _index().search('پژوx') == []
+    assert _names(_index().search('ایران', kind='brand')) == ['ایران خودرو']
+
+
+def test_search_filters_by_kind_and_brand():
+    assert _names(_index().search('', kind='brand')) == ['ایران خودرو', 'جک']
+    assert _names(_index().search('', kind='model', brand='جك')) == ['جک S5', 'جک S3']
+
+
+def test_search_limit():
+    assert len(_index().search('', limit=3)) == 3
+
+
+def test_merge_entries_sums_spellings_and_shows_the_most_used():
+    counts = Counter({
+        ('ایران خودرو', 'پژو 206'): 5,
+        ('ايران خودرو', 'پژو ۲۰۶'): 2,
+        ('ایران خودرو', 'پژو‌پارس'): 3,
+    })
+
+    entries = {(entry.kind, entry.name): entry for entry in merge_entries(counts, ['ایران خودرو'])}
+
+    assert entries[('brand', 'ایران خودرو')].popularity == 10
+    assert entries[('model', 'پژو 206')] == CatalogEntry('model', 'پژو 206', 'ایران خودرو', 7)
+    assert entries[('model', 'پژو‌پارس')].popularity == 3
+    assert len(entries) == 3
+
+
+def test_merge_entries_keeps_unused_static_brands_and_skips_blank_names():
+    counts = Counter({('', 'پراید'): 4, ('سایپا', ' '): 1})
+
+    entries = merge_entries(counts, ['سایپا', 'جک'])
+
+    assert sorted((entry.kind, entry.name, entry.popularity) for entry in entries) == [
+        ('brand', 'جک', 0),
+        ('brand', 'سایپا', 0),
+    ]
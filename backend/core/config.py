@@ -58,6 +58,99 @@ class Settings(BaseSettings):
     SMS_API_KEY: str = ""
     SMS_SENDER: str = "10008663"
     
+    # Price alert settings
+    PRICE_ALERT_OUTBOX_BATCH_SIZE: int = 500
+    PRICE_ALERT_OUTBOX_FLUSH_SECONDS: float = 5.0
+    
+    # Vehicle valuation settings
+    VEHICLE_VALUATION_INTERVAL_HOURS: float = 24.0
+    VEHICLE_VALUATION_BATCH_SIZE: int = 1000
+    
+    # Vehicle import settings
+    VEHICLE_IMPORT_CHUNK_SIZE: int = 500
+    VEHICLE_IMPORT_MAX_ROWS: int = 20000
+    
+    # Catalog autocomplete settings
+    CATALOG_AUTOCOMPLETE_REFRESH_SECONDS: float = 300.0
+    
+    # Service cost estimator settings
+    SERVICE_PRICING_CHECK_SECONDS: float = 30.0
+    
+    # History export settings
+    HISTORY_EXPORT_BATCH_SIZE: int = 1000
+    HISTORY_EXPORT_PROCESS_WORKERS: int = 2
+    HISTORY_EXPORT_PDF_FONT_PATH: str = ""
+    
+    # History search settings
+    HISTORY_SEARCH_CACHE_SIZE: int = 256
+    
+    # Parts usage analytics settings
+    PARTS_USAGE_INTERVAL_MINUTES: float = 60.0
+    
+    # Archive settings
+    ARCHIVE_INTERVAL_HOURS: float = 24.0
+    ARCHIVE_BATCH_SIZE: int = 1000
+    ARCHIVE_COMPRESSION_LEVEL: int = 6
+    ARCHIVE_HISTORY_RETENTION_DAYS: int = 730
+    ARCHIVE_EMERGENCY_DAYS: int = 90
+    ARCHIVE_REMINDER_DAYS: int = 30
+    ARCHIVE_CONFLICT_RETRIES: int = 5
+    
+    # Maintenance due-date settings
+    DUE_DATE_INTERVAL_HOURS: float = 6.0
+    DUE_DATE_BATCH_SIZE: int = 1000
+    DUE_DATE_RATE_WINDOW_DAYS: int = 365
+    DUE_DATE_MIN_RATE_DAYS: int = 14
+    DUE_DATE_DEFAULT_DAILY_MILEAGE: float = 40.0
+    
+    # Bulk service scheduling settings
+    SERVICE_BULK_CHUNK_SIZE: int = 500
+    SERVICE_BULK_MAX_VEHICLES: int = 5000
+    
+    # Maintenance plan settings
+    MAINTENANCE_PLAN_MAX_OCCURRENCES: int = 100
+    
+    # Reminder dispatcher settings
+    REMINDER_PAGE_SIZE: int = 1000
+    REMINDER_BATCH_SIZE: int = 200
+    REMINDER_RESCAN_SECONDS: float = 300.0
+    REMINDER_DISPATCH_HOUR: int = 5
+    
+    # Fuel log settings
+    FUEL_ROLLING_WINDOW: int = 5
+    
+    # Garage summary settings
+    GARAGE_SUMMARY_RECONCILE_HOURS: float = 24.0
+    
+    # Vehicle summary settings
+    VEHICLE_SUMMARY_MILEAGE_POINTS: int = 10
+    
+    # Service center settings
+    SERVICE_CENTER_SEARCH_RADIUS_KM: float = 30.0
+    SERVICE_CENTER_UNVERIFIED_PENALTY_KM: float = 5.0
+    SERVICE_CENTER_MISSING_SERVICE_PENALTY_KM: float = 20.0
+    SERVICE_CENTER_BOOKING_DAYS_AHEAD: int = 30
+    
+    # Admin vehicle search settings
+    VEHICLE_FACETS_REFRESH_SECONDS: float = 600.0
+    VEHICLE_FACET_MODELS_LIMIT: int = 50
+    
+    # Admin global search settings
+    ADMIN_SEARCH_MAX_TIME_MS: int = 80
+    ADMIN_SEARCH_MIN_PHONE_DIGITS: int = 3
+    ADMIN_SEARCH_BACKFILL_BATCH_SIZE: int = 1000
+    
+    # Plate key settings
+    PLATE_KEY_BACKFILL_BATCH_SIZE: int = 1000
+    
+    # Telemetry ingestion settings
+    TELEMETRY_FLUSH_SIZE: int = 5000
+    TELEMETRY_FLUSH_SECONDS: float = 2.0
+    TELEMETRY_MAX_BUFFERED: int = 50000
+    TELEMETRY_MAX_FRAMES_PER_REQUEST: int = 5000
+    TELEMETRY_OWNER_CACHE_SECONDS: float = 300.0
+    TELEMETRY_OWNER_CACHE_SIZE: int = 100000
+    
     # Paths
     BASE_DIR: Path = Path(__file__).resolve().parent.parent
     STATIC_ROOT: Path = BASE_DIR / 'staticfiles'
@@ -2,11 +2,15 @@
 Database connection module for FastAPI MashinMan project.
 """
 
+from typing import Dict
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 from .config import get_settings
 
 _settings = get_settings()
 
+# Whether each client's deployment supports multi-document transactions
+_transaction_support: Dict[int, bool] = {}
+
 class Database:
     client: AsyncIOMotorClient = None
     db: AsyncIOMotorDatabase = None
@@ -37,4 +41,11 @@ db = Database()
 
 async def get_database() -> AsyncIOMotorDatabase:
     """Dependency for FastAPI to get database instance"""
-    return db.get_db()
\ No newline at end of file
+    return db.get_db()
+
+async def supports_transactions(client: AsyncIOMotorClient) -> bool:
+    """Check whether a client is connected to a replica set or sharded cluster"""
+    if id(client) not in _transaction_support:
+        hello = await client.admin.command('hello')
+        _transaction_support[id(client)] = 'setName' in hello or hello.get('msg') == 'isdbgrid'
+    return _transaction_support[id(client)]
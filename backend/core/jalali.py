@@ -2,8 +2,9 @@
 Jalali calendar utilities for the MashinMan project.
 """
 
-from datetime import datetime, date
-from typing import Union
+from datetime import datetime, date, time
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple, Union
 import jdatetime
 
 
@@ -114,4 +115,82 @@ def get_jalali_weekday_name(weekday: int) -> str:
         Persian weekday name
     """
     weekdays = ['شنبه', 'یکشنبه', 'دوشنبه', 'سه‌شنبه', 'چهارشنبه', 'پنجشنبه', 'جمعه']
-    return weekdays[weekday] if 0 <= weekday <= 6 else ""
\ No newline at end of file
+    return weekdays[weekday] if 0 <= weekday <= 6 else ""
+
+def jalali_year_month(gregorian_date: Union[date, datetime]) -> Tuple[int, int]:
+    """
+    Get the Jalali (year, month) a Gregorian date falls in.
+    
+    Args:
+        gregorian_date: Gregorian date or datetime object
+        
+    Returns:
+        (year, month) tuple in the Jalali calendar
+    """
+    jalali_date = gregorian_to_jalali(gregorian_date)
+    return jalali_date.year, jalali_date.month
+
+
+def jalali_month_range(year: int, month: int) -> Tuple[datetime, datetime]:
+    """
+    Get the Gregorian datetime range covered by a Jalali month.
+    
+    Args:
+        year: Jalali year
+        month: Jalali month (1-12)
+        
+    Returns:
+        (start, end) datetimes, start inclusive and end exclusive
+    """
+    next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+    start = jdatetime.date(year, month, 1).togregorian()
+    end = jdatetime.date(next_year, next_month, 1).togregorian()
+    return datetime.combine(start, time.min), datetime.combine(end, time.min)
+
+
+def jalali_month_boundaries(start_date: Union[date, datetime], end_date: Union[date, datetime]) -> List[datetime]:
+    """
+    Get the Gregorian start datetimes of every Jalali month from start_date's
+    month up to and including the month after end_date's month.
+    
+    Useful as $bucket boundaries for grouping by Jalali month in MongoDB.
+    
+    Args:
+        start_date: First date to cover
+        end_date: Last date to cover
+        
+    Returns:
+        Sorted list of month start datetimes
+    """
+    year, month = jalali_year_month(start_date)
+    last_year, last_month = jalali_year_month(end_date)
+    boundaries = []
+    while (year, month) <= (last_year, last_month):
+        boundaries.append(jalali_month_range(year, month)[0])
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    boundaries.append(jalali_month_range(year, month)[0])
+    return boundaries
+
+
+@lru_cache(maxsize=8192)
+def _format_jalali_ordinal(ordinal: int) -> str:
+    return format_jalali_date(gregorian_to_jalali(date.fromordinal(ordinal)))
+
+
+def format_jalali_dates(gregorian_dates: Iterable[Optional[Union[date, datetime]]]) -> List[Optional[str]]:
+    """
+    Convert many Gregorian dates to Jalali date strings at once.
+    
+    Each distinct day is converted only once, which makes this much cheaper
+    than calling gregorian_to_jalali per row for large exports.
+    
+    Args:
+        gregorian_dates: Gregorian dates or datetimes (None is passed through)
+        
+    Returns:
+        Jalali dates in YYYY/MM/DD format
+    """
+    return [
+        _format_jalali_ordinal(value.toordinal()) if value else None
+        for value in gregorian_dates
+    ]
@@ -0,0 +1,44 @@
+"""
+Background jobs for FastAPI MashinMan project.
+
+Periodic batch work (valuation, analytics, archival, reconciliation, cache
+refreshes) runs as a PeriodicJob: the coroutine function is called, any
+failure is logged, and the job sleeps for its interval before the next
+call. Jobs are started and stopped from the application's startup and
+shutdown events.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Optional
+
+logger = logging.getLogger('mashinman')
+
+
+class PeriodicJob:
+    """
+    Runs a coroutine function periodically in the background.
+    """
+
+    def __init__(self, name: str, coro_fn: Callable[[], Awaitable[Any]], interval_seconds: float):
+        self.name = name
+        self.coro_fn = coro_fn
+        self.interval_seconds = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.coro_fn()
+            except Exception:
+                logger.exception("%s failed", self.name)
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
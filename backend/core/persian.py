@@ -0,0 +1,120 @@
+"""
+Persian text normalization utilities for the MashinMan project.
+Used wherever user-typed Persian text is matched against stored text.
+"""
+
+import re
+from typing import List
+
+# Arabic code points commonly typed in place of their Persian equivalents
+_CHARACTER_MAP = {
+    'ي': 'ی',  # Arabic yeh
+    'ى': 'ی',  # Alef maksura
+    'ك': 'ک',  # Arabic kaf
+    'ة': 'ه',  # Teh marbuta
+    'ۀ': 'ه',  # Heh with yeh above
+    'أ': 'ا',
+    'إ': 'ا',
+    'ٱ': 'ا',
+    'ؤ': 'و',
+}
+
+# Persian and Arabic-Indic digits folded to ASCII
+_DIGIT_MAP = {
+    **{chr(0x06F0 + i): str(i) for i in range(10)},
+    **{chr(0x0660 + i): str(i) for i in range(10)},
+}
+
+# Diacritics (harakat), superscript alef and tatweel are dropped
+_REMOVED_CHARACTERS = [chr(c) for c in range(0x064B, 0x0653)] + ['\u0670', '\u0640']
+
+# Zero-width non-joiner and other joiners/marks become word separators
+_SEPARATOR_CHARACTERS = ['\u200c', '\u200d', '\u200e', '\u200f', '\u00a0']
+
+_TRANSLATION_TABLE = str.maketrans({
+    **_CHARACTER_MAP,
+    **_DIGIT_MAP,
+    **{c: None for c in _REMOVED_CHARACTERS},
+    **{c: ' ' for c in _SEPARATOR_CHARACTERS},
+})
+
+_DIGIT_TABLE = str.maketrans(_DIGIT_MAP)
+
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+_TOKEN_PATTERN = re.compile(r'\w+')
+_NON_DIGIT_PATTERN = re.compile(r'[^0-9]')
+
+
+def fold_digits(text: str) -> str:
+    """
+    Convert Persian and Arabic-Indic digits to ASCII digits.
+
+    Args:
+        text (str): Input text
+
+    Returns:
+        str: Text with ASCII digits
+    """
+    if not text:
+        return ""
+    return text.translate(_DIGIT_TABLE)
+
+
+def normalize_persian(text: str) -> str:
+    """
+    Normalize Persian text for matching.
+
+    Unifies Arabic/Persian character variants, folds digits to ASCII,
+    drops diacritics, turns ZWNJ into a space, lowercases Latin letters
+    and collapses whitespace.
+
+    Args:
+        text (str): Input text
+
+    Returns:
+        str: Normalized text
+    """
+    if not text:
+        return ""
+    text = text.translate(_TRANSLATION_TABLE).lower()
+    return _WHITESPACE_PATTERN.sub(' ', text).strip()
+
+
+def tokenize_persian(text: str) -> List[str]:
+    """
+    Split text into normalized word tokens.
+
+    Args:
+        text (str): Input text
+
+    Returns:
+        List[str]: Normalized tokens
+    """
+    return _TOKEN_PATTERN.findall(normalize_persian(text))
+
+
+
+def fold_phone(phone: str) -> str:
+    """
+    Reduce a typed phone number to its national digits for matching.
+
+    Digits are folded to ASCII, everything else is dropped, and the
+    +98/0098 country code or the leading trunk 0 is removed, so
+    '۰۹۱۲ ۱۲۳ ۴۵۶۷' and '+989121234567' both become '9121234567'.
+    Works on partial numbers for prefix lookups.
+
+    Args:
+        phone (str): Phone number as typed
+
+    Returns:
+        str: National digits
+    """
+    if not phone:
+        return ""
+    stripped = fold_digits(phone).strip()
+    digits = _NON_DIGIT_PATTERN.sub('', stripped)
+    if stripped.startswith('+98'):
+        return digits[2:]
+    if digits.startswith('0098'):
+        return digits[4:]
+    return digits.lstrip('0')
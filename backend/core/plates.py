@@ -0,0 +1,104 @@
+"""
+License plate canonicalization for the MashinMan project.
+Every stored plate, whatever field or format it came from, is reduced to
+one canonical plate_key so plates can be matched with an indexed query.
+"""
+
+import re
+from typing import Any, Dict, Optional
+
+from core.persian import normalize_persian
+
+# Letters used in the middle of Iranian plates
+PLATE_LETTERS = 'آابپتثجچحخدذرزژسشصضطظعغفقکگلمنوهی'
+
+# All accepted plate formats on folded text, in one pattern:
+#   car 12ب34567 (serial optional), taxi T.., police P.., IR15546T55, motorcycle 12345678
+PLATE_PATTERN = re.compile(
+    rf'^(?P<prefix>[TP]?)(?P<left>[0-9]{{2,3}})(?P<char>[{PLATE_LETTERS}])(?P<right>[0-9]{{3}})(?P<serial>[0-9]{{2}})?$'
+    r'|^IR[0-9]{5}[A-Z][0-9]{2}$'
+    r'|^[0-9]{8,9}$'
+)
+
+# Spelled-out letter and country label sometimes typed into plates
+_WORD_REPLACEMENTS = [('الف', 'ا'), ('ایران', '')]
+
+_NOISE_PATTERN = re.compile(r'[\s\-_.|/]+')
+
+
+def fold_plate(plate: str) -> str:
+    """
+    Fold a typed plate into the alphabet of plate keys.
+
+    Persian/Arabic character variants and digits are unified, separators
+    are dropped and Latin letters are uppercased. Usable on partial plates
+    for prefix lookups.
+
+    Args:
+        plate (str): Plate as typed
+
+    Returns:
+        str: Folded plate text
+    """
+    if not plate:
+        return ""
+    text = normalize_persian(plate)
+    for word, replacement in _WORD_REPLACEMENTS:
+        text = text.replace(word, replacement)
+    return _NOISE_PATTERN.sub('', text).upper()
+
+
+def match_plate(plate: str) -> Optional[re.Match]:
+    """Match a plate against PLATE_PATTERN after folding, None if it is not a valid plate."""
+    return PLATE_PATTERN.match(fold_plate(plate))
+
+
+def plate_key(plate: Optional[str]) -> Optional[str]:
+    """
+    Get the canonical key of a plate string.
+
+    Args:
+        plate (str): Plate as typed, e.g. '۱۲ ب ۳۴۵ - ایران ۶۷'
+
+    Returns:
+        str: Canonical key, e.g. '12ب34567', or None if it is not a valid plate
+    """
+    match = match_plate(plate) if plate else None
+    return match.group(0) if match else None
+
+
+def plate_data_key(plate_data: Any) -> Optional[str]:
+    """
+    Get the canonical key of structured plate data.
+
+    Args:
+        plate_data: LicensePlateData or its dict
+
+    Returns:
+        str: Canonical key, or None if the parts do not form a valid plate
+    """
+    if not plate_data:
+        return None
+    if isinstance(plate_data, dict):
+        parts = [plate_data.get(field) for field in ('plaqueLeftNo', 'plaqueMiddleChar', 'plaqueRightNo', 'plaqueSerial')]
+    else:
+        parts = [plate_data.plaqueLeftNo, plate_data.plaqueMiddleChar, plate_data.plaqueRightNo, plate_data.plaqueSerial]
+    return plate_key(''.join(part or '' for part in parts))
+
+
+def plate_key_query(query: str, prefix: bool = False) -> Dict:
+    """
+    Build a MongoDB condition on plate_key for an exact or prefix lookup.
+
+    Both use the plate_key index; a prefix lookup is an anchored regex.
+
+    Args:
+        query (str): Full or partial plate as typed
+        prefix (bool): Match keys starting with the query
+
+    Returns:
+        Dict: Condition for the plate_key field
+    """
+    if prefix:
+        return {"$regex": f"^{re.escape(fold_plate(query))}"}
+    return plate_key(query) or fold_plate(query)
@@ -0,0 +1,105 @@
+"""
+Tests for the core utilities.
+"""
+
+from core.persian import fold_digits, fold_phone, normalize_persian, tokenize_persian
+from core.plates import fold_plate, match_plate, plate_data_key, plate_key, plate_key_query
+
+
+def test_plate_key_canonicalizes_typed_car_plates():
+    assert plate_key('۱۲ ب ۳۴۵ - ایران ۶۷') == '12ب34567'
+    assert plate_key('12ب345-67') == '12ب34567'
+    assert plate_key('12 ب 345') == '12ب345'
+
+
+def test_plate_key_folds_spelled_and_arabic_letters():
+    assert plate_key('123الف456') == '123ا456'
+    assert plate_key('12ي345') == '12ی345'
+
+
+def test_plate_key_accepts_taxi_police_free_zone_and_motorcycle_plates():
+    assert plate_key('t12ب345') == 'T12ب345'
+    assert plate_key('P12ب345') == 'P12ب345'
+    assert plate_key('IR15-546T55') == 'IR15546T55'
+    assert plate_key('123 456 78') == '12345678'
+
+
+def test_plate_key_rejects_invalid_plates():
+    assert plate_key('ab') is None
+    assert plate_key('12X345') is None
+    assert plate_key('') is None
+    assert plate_key(None) is None
+
+
+def test_fold_plate_keeps_partial_plates():
+    assert fold_plate('ab') == 'AB'
+    assert fold_plate('۱۲ ب') == '12ب'
+    assert fold_plate('') == ''
+
+
+def test_match_plate_exposes_plate_parts():
+    match = match_plate('۱۲ ب ۳۴۵ - ایران ۶۷')
+    assert match.group('left') == '12'
+    assert match.group('char') == 'ب'
+    assert match.group('right') == '345'
+    assert match.group('serial') == '67'
+    assert match_plate('ab') is None
+
+
+def test_plate_data_key_joins_structured_parts():
+    plate_data = {'plaqueLeftNo': '12', 'plaqueMiddleChar': 'ب', 'plaqueRightNo': '345', 'plaqueSerial': '67'}
+    assert plate_data_key(plate_data) == '12ب34567'
+    assert plate_data_key({**plate_data, 'plaqueSerial': None}) == '12ب345'
+    assert plate_data_key({**plate_data, 'plaqueMiddleChar': ''}) is None
+    assert plate_data_key(None) is None
+
+
+def test_plate_key_query_builds_exact_and_prefix_conditions():
+    assert plate_key_query('۱۲ ب ۳۴۵ ۶۷') == '12ب34567'
+    assert plate_key_query('12 ب', prefix=True) == {'$regex': '^12ب'}
+    assert plate_key_query('IR15', prefix=True) == {'$regex': '^IR15'}
+
+
+def test_fold_digits_converts_persian_and_arabic_digits():
+    assert fold_digits('۱۲۳۴') == '1234'
+    assert fold_digits('٥٦٧') == '567'
+    assert fold_digits('abc 89') == 'abc 89'
+    assert fold_digits('') == ''
+
+
+def test_normalize_persian_unifies_arabic_variants():
+    assert normalize_persian('كيا') == normalize_persian('کیا') == 'کیا'
+    assert normalize_persian('خانۀ') == 'خانه'
+
+
+def test_normalize_persian_drops_diacritics_and_tatweel():
+    assert normalize_persian('مُحَمَّد') == 'محمد'
+    assert normalize_persian('پـــژو') == 'پژو'
+
+
+def test_normalize_persian_folds_separators_case_and_whitespace():
+    assert normalize_persian('می‌رود') == 'می رود'
+    assert normalize_persian('  جک   S3 ') == 'جک s3'
+    assert normalize_persian('پژو ۲۰۶') == 'پژو 206'
+    assert normalize_persian('') == ''
+    assert normalize_persian(None) == ''
+
+
+def test_tokenize_persian_splits_normalized_words():
+    assert tokenize_persian('علی‌رضا  رضايي') == ['علی', 'رضا', 'رضایی']
+    assert tokenize_persian('سمند، LX') == ['سمند', 'lx']
+    assert tokenize_persian('') == []
+
+
+def test_fold_phone_strips_country_code_and_trunk_zero():
+    assert fold_phone('۰۹۱۲ ۱۲۳ ۴۵۶۷') == '9121234567'
+    assert fold_phone('+989121234567') == '9121234567'
+    assert fold_phone('+98 (912) 123-4567') == '9121234567'
+    assert fold_phone('00989121234567') == '9121234567'
+    assert fold_phone('09121234567') == '9121234567'
+
+
+def test_fold_phone_handles_partial_and_invalid_input():
+    assert fold_phone('0912') == '912'
+    assert fold_phone('abc') == ''
+    assert fold_phone('') == ''
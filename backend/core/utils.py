@@ -6,24 +6,15 @@ Includes Jalali date handling, license plate validation, and other common functi
 import re
 import jdatetime
 from datetime import datetime, date
-from typing import Union, Optional, Dict, List
+from typing import TYPE_CHECKING, Union, Optional, Dict, List
 from fastapi import HTTPException
 from pydantic import ValidationError
-from vehicles.models import LicensePlateData
-
-# Iranian license plate patterns
-LICENSE_PLATE_PATTERNS = [
-    # Standard format: 123آ456
-    r'^[0-9]{2,3}[آابپتثجچحخدذرزژسشصضطظعغفقکگلمنوهی][0-9]{3}$',
-    # Alternative format: IR15-546T55
-    r'^IR[0-9]{2}-[0-9]{3}[A-Z][0-9]{2}$',
-    # Motorcycle format: 123456789
-    r'^[0-9]{8,9}$',
-    # Taxi format: T123آ456
-    r'^T[0-9]{2,3}[آابپتثجچحخدذرزژسشصضطظعغفقکگلمنوهی][0-9]{3}$',
-    # Police format: P123آ456
-    r'^P[0-9]{2,3}[آابپتثجچحخدذرزژسشصضطظعغفقکگلمنوهی][0-9]{3}$',
-]
+from core.persian import fold_digits, fold_phone
+from core.plates import fold_plate, match_plate
+
+# vehicles.models imports this module, so the model is imported on use
+if TYPE_CHECKING:
+    from vehicles.models import LicensePlateData
 
 # Persian month names for Jalali date handling
 PERSIAN_MONTHS = [
@@ -58,6 +49,13 @@ SERVICE_TYPES = [
     'exhaust_system_check', 'electrical_system_check', 'ac_service'
 ]
 
+# Characters accepted in a typed phone number
+PHONE_PATTERN = re.compile(r'^\+?[0-9\s\-()]+$')
+
+# HTML tags and control characters dropped from free text
+MARKUP_PATTERN = re.compile(r'<[^>]*>')
+CONTROL_CHARACTERS_PATTERN = re.compile(r'[\x00-\x08\x0b-\x1f\x7f]')
+
 def validate_iranian_license_plate(plate: str) -> bool:
     """
     Validate Iranian license plate format.
@@ -71,15 +69,7 @@ def validate_iranian_license_plate(plate: str) -> bool:
     if not plate:
         return False
         
-    # Normalize plate (remove spaces and convert to uppercase)
-    normalized_plate = plate.replace(' ', '').replace('-', '').upper()
-    
-    # Check against all patterns
-    for pattern in LICENSE_PLATE_PATTERNS:
-        if re.match(pattern, normalized_plate):
-            return True
-            
-    return False
+    return match_plate(plate) is not None
 
 def normalize_license_plate(plate: str) -> str:
     """
@@ -94,10 +84,10 @@ def normalize_license_plate(plate: str) -> str:
     if not plate:
         return ""
         
-    # Remove extra spaces and normalize
-    return plate.replace(' ', '').replace('-', '').upper()
+    # Fold Persian/Arabic variants and digits, drop separators
+    return fold_plate(plate)
 
-def format_license_plate_data(plate_data: LicensePlateData) -> str:
+def format_license_plate_data(plate_data: 'LicensePlateData') -> str:
     """
     Format license plate data into a string.
     
@@ -117,7 +107,7 @@ def format_license_plate_data(plate_data: LicensePlateData) -> str:
     # Default to car plate format
     return f"{plate_data.plaqueLeftNo}{plate_data.plaqueMiddleChar}{plate_data.plaqueRightNo}-{plate_data.plaqueSerial}"
 
-def parse_license_plate_string(plate_string: str) -> LicensePlateData:
+def parse_license_plate_string(plate_string: str) -> 'LicensePlateData':
     """
     Parse license plate string into LicensePlateData object.
     
@@ -127,6 +117,8 @@ def parse_license_plate_string(plate_string: str) -> LicensePlateData:
     Returns:
         LicensePlateData: Parsed license plate data
     """
+    from vehicles.models import LicensePlateData
+
     if not plate_string:
         return LicensePlateData(
             plaqueLeftNo="",
@@ -135,24 +127,14 @@ def parse_license_plate_string(plate_string: str) -> LicensePlateData:
             plaqueSerial=""
         )
     
-    # Try to parse as car plate (format like "123ب456-78")
-    car_match = re.match(r'^(\d{2})([آابپتثجچحخدذرزژسشصضطظعغفقکگلمنوهی])(\d{3})-(\d{2})$', plate_string)
-    if car_match:
+    # Car plates have a two-digit serial ("12ب345-67"), motorcycle plates none ("123ب456")
+    match = match_plate(plate_string)
+    if match and match.group('char'):
         return LicensePlateData(
-            plaqueLeftNo=car_match.group(1),
-            plaqueMiddleChar=car_match.group(2),
-            plaqueRightNo=car_match.group(3),
-            plaqueSerial=car_match.group(4)
-        )
-    
-    # Try to parse as motorcycle plate (format like "12345678")
-    motorcycle_match = re.match(r'^(\d{3})([آابپتثجچحخدذرزژسشصضطظعغفقکگلمنوهی])(\d{3})$', plate_string)
-    if motorcycle_match:
-        return LicensePlateData(
-            plaqueLeftNo=motorcycle_match.group(1),
-            plaqueMiddleChar=motorcycle_match.group(2),
-            plaqueRightNo=motorcycle_match.group(3),
-            plaqueSerial=""
+            plaqueLeftNo=match.group('left'),
+            plaqueMiddleChar=match.group('char'),
+            plaqueRightNo=match.group('right'),
+            plaqueSerial=match.group('serial') or ""
         )
     
     # Default empty plate
@@ -211,6 +193,39 @@ def validate_mileage(mileage: int) -> bool:
     # Mileage should be a positive integer not exceeding 1,000,000 km
     return isinstance(mileage, int) and 0 <= mileage <= 1000000
 
+def validate_phone_number(phone: str) -> bool:
+    """
+    Validate an Iranian phone number as typed.
+    
+    Args:
+        phone (str): Phone number, with or without +98/0098/0 prefix
+        
+    Returns:
+        bool: True if valid, False otherwise
+    """
+    if not phone or not PHONE_PATTERN.match(fold_digits(phone).strip()):
+        return False
+    
+    # Mobile and landline numbers both have ten national digits
+    digits = fold_phone(phone)
+    return len(digits) == 10 and not digits.startswith('0')
+
+def sanitize_input(text: str) -> str:
+    """
+    Remove markup and control characters from user-typed text.
+    
+    Args:
+        text (str): Raw text
+        
+    Returns:
+        str: Sanitized text
+    """
+    if not text:
+        return ""
+    
+    text = MARKUP_PATTERN.sub('', text)
+    return CONTROL_CHARACTERS_PATTERN.sub('', text).strip()
+
 def get_iranian_car_brands() -> List[str]:
     """
     Get list of Iranian car brands.
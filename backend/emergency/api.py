@@ -8,14 +8,17 @@ from fastapi import APIRouter, Depends, HTTPException, status
 import math
 
 from .models import (
-    EmergencyRequest, EmergencyServiceProvider,
+    EmergencyRequest, EmergencyServiceProvider, CLOSED_EMERGENCY_STATUSES,
     EmergencyRequestCreate, EmergencyRequestUpdate, EmergencyRequestOut,
     EmergencyServiceProviderCreate, EmergencyServiceProviderUpdate, EmergencyServiceProviderOut
 )
+from vehicles.garage import record_emergencies
 from vehicles.models import Vehicle
 from users.models import User
 from users.dependencies import get_current_active_user
 from core.jalali import gregorian_to_jalali
+from core.persian import fold_phone
+from core.plates import plate_key
 
 router = APIRouter(prefix="/emergency", tags=["emergency"])
 
@@ -50,6 +53,7 @@ async def create_emergency_request(
     
     # Save emergency request to database
     await emergency_request.insert()
+    await record_emergencies(str(current_user.id), 1)
     
     # Convert to output model
     request_out = EmergencyRequestOut(**emergency_request.dict())
@@ -129,6 +133,8 @@ async def update_emergency_request(
             detail="Not authorized to update this emergency request"
         )
     
+    was_open = request.status not in CLOSED_EMERGENCY_STATUSES
+    
     # Update request fields
     update_data = request_update.dict(exclude_unset=True)
     
@@ -139,9 +145,14 @@ async def update_emergency_request(
     for key, value in update_data.items():
         if hasattr(request, key) and value is not None:
             setattr(request, key, value)
+    request.plate_key = plate_key(request.license_plate)
+    request.phone_key = fold_phone(request.phone) or None
     
     # Save updated request
     await request.save()
+    is_open = request.status not in CLOSED_EMERGENCY_STATUSES
+    if is_open != was_open:
+        await record_emergencies(str(request.user_id), 1 if is_open else -1)
     
     # Convert to output model
     request_out = EmergencyRequestOut(**request.dict())
@@ -10,6 +10,11 @@ import jdatetime
 from core.utils import validate_phone_number, sanitize_input
 from core.exceptions import EmergencyRequestFailedException
 from core.jalali import gregorian_to_jalali, jalali_to_gregorian
+from core.persian import fold_phone
+from core.plates import plate_key
+
+# Statuses of emergency requests that no longer need attention
+CLOSED_EMERGENCY_STATUSES = ['completed', 'cancelled']
 
 
 class EmergencyRequest(Document):
@@ -25,6 +30,8 @@ class EmergencyRequest(Document):
     # Vehicle information
     vehicle_id: Optional[str] = Field(None, description="شناسه خودرو")
     license_plate: str = Field(..., description="شماره پلاک خودرو")
+    plate_key: Optional[str] = Field(None, description="کلید یکسان‌شده پلاک")
+    phone_key: Optional[str] = Field(None, description="کلید یکسان‌شده شماره تلفن")
     brand: Optional[str] = Field(None, description="برند خودرو")
     model: Optional[str] = Field(None, description="مدل خودرو")
     
@@ -49,6 +56,18 @@ class EmergencyRequest(Document):
     
     class Settings:
         name = "emergency_requests"
+        indexes = [
+            "plate_key",
+            "phone_key",
+        ]
+    
+    @validator('plate_key', always=True)
+    def set_plate_key(cls, v, values):
+        return plate_key(values.get('license_plate'))
+    
+    @validator('phone_key', always=True)
+    def set_phone_key(cls, v, values):
+        return fold_phone(values.get('phone') or '') or None
     
     @validator('phone')
     def validate_phone(cls, v):
@@ -0,0 +1,268 @@
+"""
+Expense analytics for FastAPI MashinMan project.
+
+Service history costs are rolled up with aggregation pipelines into one
+VehicleExpenseSummary document per vehicle and Jalali month. Writes to a
+history record only recompute the month(s) it touches; statistics are
+read from the summaries instead of the raw history. Records moved to the
+archive still count towards their months: they are read back from their
+bundles and folded into the totals of the hot records.
+"""
+
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import DeleteOne, UpdateOne
+
+from .models import ServiceHistory, VehicleExpenseSummary
+from archive.archiver import load_archived_records
+from core.jalali import (
+    jalali_month_boundaries,
+    jalali_month_range,
+    jalali_now,
+    jalali_year_month,
+    get_jalali_month_name,
+)
+
+logger = logging.getLogger('mashinman')
+
+# (vehicle_id, jalali year, jalali month)
+SummaryKey = Tuple[str, int, int]
+
+# Accumulators shared by the single-month and the full-rebuild pipelines
+_TOTALS_ACCUMULATORS = {
+    "user_id": {"$first": "$user_id"},
+    "total_expenses": {"$sum": "$total_cost"},
+    "parts_expenses": {"$sum": "$parts_cost"},
+    "labor_expenses": {"$sum": "$labor_cost"},
+    "services_count": {"$sum": 1},
+    "start_mileage": {"$min": "$actual_mileage"},
+    "end_mileage": {"$max": "$actual_mileage"},
+}
+
+
+def _fold_records(totals: Dict, breakdown: Dict[str, int], records: Iterable[Dict]) -> None:
+    """Add raw history records to aggregated totals the way _TOTALS_ACCUMULATORS does."""
+    for record in records:
+        if totals.get("user_id") is None:
+            totals["user_id"] = record.get("user_id")
+        cost = record.get("total_cost", 0)
+        totals["total_expenses"] = totals.get("total_expenses", 0) + cost
+        totals["parts_expenses"] = totals.get("parts_expenses", 0) + record.get("parts_cost", 0)
+        totals["labor_expenses"] = totals.get("labor_expenses", 0) + record.get("labor_cost", 0)
+        totals["services_count"] = totals.get("services_count", 0) + 1
+        mileage = record.get("actual_mileage")
+        if mileage is not None:
+            start, end = totals.get("start_mileage"), totals.get("end_mileage")
+            totals["start_mileage"] = mileage if start is None else min(start, mileage)
+            totals["end_mileage"] = mileage if end is None else max(end, mileage)
+        breakdown[record["service_type"]] = breakdown.get(record["service_type"], 0) + cost
+
+
+def _summary_fields(totals: Dict, breakdown: Dict[str, int]) -> Dict:
+    """Turn aggregated totals into the fields of a summary document."""
+    start_mileage = totals.get("start_mileage")
+    end_mileage = totals.get("end_mileage")
+    distance = (end_mileage - start_mileage) if start_mileage is not None and end_mileage is not None else 0
+    return {
+        "user_id": totals.get("user_id"),
+        "total_expenses": totals.get("total_expenses", 0),
+        "parts_expenses": totals.get("parts_expenses", 0),
+        "labor_expenses": totals.get("labor_expenses", 0),
+        "services_count": totals.get("services_count", 0),
+        "expense_breakdown": breakdown,
+        "start_mileage": start_mileage,
+        "end_mileage": end_mileage,
+        "distance_driven": distance,
+        "cost_per_km": round(totals.get("total_expenses", 0) / distance, 2) if distance > 0 else None,
+        "updated_at": datetime.utcnow(),
+    }
+
+
+def summary_key(history: ServiceHistory) -> SummaryKey:
+    """Get the summary a history record contributes to."""
+    year, month = jalali_year_month(history.actual_date)
+    return history.vehicle_id, year, month
+
+
+async def refresh_month(vehicle_id: str, year: int, month: int) -> Optional[Dict]:
+    """
+    Recompute the expense summary of one vehicle for one Jalali month.
+
+    Args:
+        vehicle_id (str): Vehicle ID
+        year (int): Jalali year
+        month (int): Jalali month
+
+    Returns:
+        Optional[Dict]: The new summary fields, or None if the month has no records
+    """
+    key = {"vehicle_id": vehicle_id, "year": year, "month": month}
+    archived = await load_archived_records('service_histories', key)
+
+    start, end = jalali_month_range(year, month)
+    pipeline = [
+        # Records of an interrupted archive run are in both places, their bundle copy is counted
+        {"$match": {
+            "vehicle_id": vehicle_id,
+            "actual_date": {"$gte": start, "$lt": end},
+            "_id": {"$nin": [record["_id"] for record in archived]},
+        }},
+        {"$facet": {
+            "totals": [{"$group": {"_id": None, **_TOTALS_ACCUMULATORS}}],
+            "breakdown": [{"$group": {"_id": "$service_type", "total": {"$sum": "$total_cost"}}}],
+        }},
+    ]
+    rows = await ServiceHistory.aggregate(pipeline).to_list()
+    collection = VehicleExpenseSummary.get_motor_collection()
+
+    totals = rows[0]["totals"][0] if rows and rows[0]["totals"] else {}
+    breakdown = {row["_id"]: row["total"] for row in rows[0]["breakdown"]} if rows else {}
+    _fold_records(totals, breakdown, archived)
+    if not totals:
+        await collection.delete_one(key)
+        return None
+
+    fields = _summary_fields(totals, breakdown)
+    await collection.update_one(key, {"$set": fields}, upsert=True)
+    return fields
+
+
+async def refresh_months(keys: Iterable[SummaryKey]) -> None:
+    """Recompute each distinct summary in keys once."""
+    for vehicle_id, year, month in set(keys):
+        await refresh_month(vehicle_id, year, month)
+
+
+async def rebuild_vehicle(vehicle_id: str) -> int:
+    """
+    Recompute every monthly summary of a vehicle from scratch.
+
+    Args:
+        vehicle_id (str): Vehicle ID
+
+    Returns:
+        int: Number of summaries written
+    """
+    archived = await load_archived_records('service_histories', {"vehicle_id": vehicle_id})
+    match = {"vehicle_id": vehicle_id, "_id": {"$nin": [record["_id"] for record in archived]}}
+    span = await ServiceHistory.aggregate([
+        {"$match": match},
+        {"$group": {"_id": None, "first": {"$min": "$actual_date"}, "last": {"$max": "$actual_date"}}},
+    ]).to_list()
+
+    months: Dict[Tuple[int, int], Tuple[Dict, Dict[str, int]]] = {}
+    if span:
+        # Jalali month starts as bucket boundaries group the records by Jalali month in one pass
+        boundaries = jalali_month_boundaries(span[0]["first"], span[0]["last"])
+        pipeline = [
+            {"$match": match},
+            {"$bucket": {
+                "groupBy": "$actual_date",
+                "boundaries": boundaries,
+                "output": {
+                    **_TOTALS_ACCUMULATORS,
+                    "breakdown": {"$push": {"service_type": "$service_type", "total_cost": "$total_cost"}},
+                },
+            }},
+        ]
+        async for bucket in ServiceHistory.aggregate(pipeline):
+            breakdown: Dict[str, int] = {}
+            for item in bucket.pop("breakdown"):
+                breakdown[item["service_type"]] = breakdown.get(item["service_type"], 0) + item["total_cost"]
+            months[jalali_year_month(bucket["_id"])] = (bucket, breakdown)
+
+    for record in archived:
+        totals, breakdown = months.setdefault(jalali_year_month(record["actual_date"]), ({}, {}))
+        _fold_records(totals, breakdown, [record])
+
+    collection = VehicleExpenseSummary.get_motor_collection()
+    operations = [
+        UpdateOne(
+            {"vehicle_id": vehicle_id, "year": year, "month": month},
+            {"$set": _summary_fields(totals, breakdown)},
+            upsert=True,
+        )
+        for (year, month), (totals, breakdown) in months.items()
+    ]
+
+    # Drop summaries of months that no longer have any records
+    async for summary in collection.find({"vehicle_id": vehicle_id}, projection={"year": 1, "month": 1}):
+        if (summary["year"], summary["month"]) not in months:
+            operations.append(DeleteOne({"_id": summary["_id"]}))
+
+    if operations:
+        await collection.bulk_write(operations, ordered=False)
+    return len(months)
+
+
+async def get_expense_stats(query: Dict, trend_months: int = 12) -> Dict:
+    """
+    Compute expense statistics from the monthly summaries.
+
+    Args:
+        query (Dict): Summary filter, e.g. {"vehicle_id": ...} or {"user_id": ...}
+        trend_months (int): Number of months in the monthly trend
+
+    Returns:
+        Dict: Fields of ExpenseStatsOut
+    """
+    summaries = await VehicleExpenseSummary.get_motor_collection().find(query).to_list(length=None)
+
+    today = jalali_now()
+    current = (today.year, today.month)
+
+    total = 0
+    yearly = 0
+    monthly = 0
+    breakdown: Dict[str, int] = {}
+    per_month: Dict[Tuple[int, int], int] = {}
+    mileage: Dict[str, List[int]] = {}
+    for summary in summaries:
+        period = (summary["year"], summary["month"])
+        total += summary["total_expenses"]
+        per_month[period] = per_month.get(period, 0) + summary["total_expenses"]
+        if period[0] == current[0]:
+            yearly += summary["total_expenses"]
+        if period == current:
+            monthly += summary["total_expenses"]
+        for service_type, cost in summary.get("expense_breakdown", {}).items():
+            breakdown[service_type] = breakdown.get(service_type, 0) + cost
+        if summary.get("start_mileage") is not None:
+            bounds = mileage.setdefault(summary["vehicle_id"], [summary["start_mileage"], summary["end_mileage"]])
+            bounds[0] = min(bounds[0], summary["start_mileage"])
+            bounds[1] = max(bounds[1], summary["end_mileage"])
+
+    # Average over every month from the first recorded one up to now
+    if per_month:
+        first_year, first_month = min(per_month)
+        months_span = (current[0] - first_year) * 12 + (current[1] - first_month) + 1
+        average = total / max(months_span, 1)
+    else:
+        average = 0.0
+
+    distance = sum(end - start for start, end in mileage.values())
+
+    trend = []
+    year, month = current
+    for _ in range(trend_months):
+        trend.append({
+            "year": year,
+            "month": month,
+            "month_name": get_jalali_month_name(month),
+            "total_expenses": per_month.get((year, month), 0),
+        })
+        year, month = (year - 1, 12) if month == 1 else (year, month - 1)
+    trend.reverse()
+
+    return {
+        "total_expenses": total,
+        "monthly_expenses": monthly,
+        "yearly_expenses": yearly,
+        "average_monthly_cost": round(average, 2),
+        "cost_per_km": round(total / distance, 2) if distance > 0 else None,
+        "expense_breakdown": breakdown,
+        "monthly_trend": trend,
+        "top_expense_categories": sorted(breakdown, key=breakdown.get, reverse=True)[:5],
+    }
@@ -2,16 +2,36 @@
 History API router for FastAPI MashinMan project.
 """
 
+import asyncio
 from datetime import datetime
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 
-from .models import ServiceHistory, ServiceHistoryCreate, ServiceHistoryUpdate, ServiceHistoryOut
+from .models import (
+    ServiceHistory, ServiceHistoryCreate, ServiceHistoryUpdate, ServiceHistoryOut,
+    VehicleExpenseSummary, VehicleExpenseSummaryOut, ExpenseStatsOut,
+    HistoryExportJob, HistoryExportJobOut, HistorySearchResult, PartUsageOut,
+    FuelLog, FuelLogCreate, FuelLogOut, FuelStats, FuelStatsOut
+)
+from .analytics import get_expense_stats, refresh_month, refresh_months, summary_key
+from .export import (
+    STREAMING_FORMATS, JOB_FORMATS, start_export_job, stream_csv, stream_ndjson
+)
+from .search import history_search
+from .parts import get_parts_usage, mark_months_dirty, parts_month_key
+from .fuel import get_efficiency_series, recompute_vehicle, record_fill
+from .ingest import bump_vehicle_mileage, ingest_history
+from archive.archiver import find_archived_record, iter_archived_records
+from services.due_dates import run_due_dates
+from vehicles.garage import record_spend
+from vehicles.mileage import record_mileage
 from vehicles.models import Vehicle
 from services.models import Service
 from users.models import User
 from users.dependencies import get_current_active_user
-from core.jalali import gregorian_to_jalali, jalali_to_gregorian, parse_jalali_date
+from core.jalali import format_jalali_dates, gregorian_to_jalali, jalali_to_gregorian, parse_jalali_date
+from core.plates import plate_key
 
 router = APIRouter(prefix="/history", tags=["history"])
 
@@ -19,11 +39,21 @@ router = APIRouter(prefix="/history", tags=["history"])
 @router.post("/", response_model=ServiceHistoryOut, status_code=status.HTTP_201_CREATED)
 async def create_history_record(
     history_data: ServiceHistoryCreate,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_active_user)
 ):
     """Create a new history record"""
+    # Vehicle and service are independent reads; the service is optional
+    service = None
+    if history_data.service_id:
+        vehicle, service = await asyncio.gather(
+            Vehicle.get(history_data.vehicle_id),
+            Service.get(history_data.service_id),
+        )
+    else:
+        vehicle = await Vehicle.get(history_data.vehicle_id)
+    
     # Check if user owns the vehicle
-    vehicle = await Vehicle.get(history_data.vehicle_id)
     if not vehicle:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -37,62 +67,21 @@ async def create_history_record(
         )
     
     # Check if service belongs to this vehicle
-    if history_data.service_id:
-        service = await Service.get(history_data.service_id)
-        if not service or service.vehicle_id != vehicle.id:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Service does not belong to this vehicle"
-            )
-    
-    # Parse Jalali date
-    try:
-        jalali_date = parse_jalali_date(history_data.service_date)
-        history_data.service_date_gregorian = jalali_to_gregorian(jalali_date)
-    except ValueError as e:
+    if history_data.service_id and (not service or service.vehicle_id != history_data.vehicle_id):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=str(e)
+            detail="Service does not belong to this vehicle"
         )
     
-    # Create history record
-    history = ServiceHistory(
-        service_id=history_data.service_id,
-        vehicle_id=history_data.vehicle_id,
-        mileage=history_data.mileage,
-        service_date=history_data.service_date_gregorian,
-        cost=history_data.cost,
-        service_center=history_data.service_center,
-        notes=history_data.notes,
-        receipt_image=history_data.receipt_image,
-        created_at=datetime.utcnow(),
-        updated_at=datetime.utcnow(),
-    )
-    
-    # Save history to database
-    await history.insert()
+    # Completes the service, raises the vehicle mileage and updates the summaries
+    history = ServiceHistory(**{**history_data.dict(), 'user_id': str(current_user.id)})
+    await ingest_history(history)
+    history_search.invalidate(history.user_id)
     
-    # If this is linked to a service, mark it as completed
-    if history_data.service_id and service:
-        service.is_completed = True
-        service.last_service_mileage = history_data.mileage
-        service.last_service_date = history_data.service_date_gregorian
-        # Calculate next service
-        service.next_service_mileage = history_data.mileage + service.interval
-        await service.save()
+    # A new service moves the vehicle's due dates, recomputed after the response is sent
+    background_tasks.add_task(run_due_dates, [history.vehicle_id])
     
-    # Update vehicle mileage if this is higher
-    if history_data.mileage > vehicle.current_mileage:
-        vehicle.current_mileage = history_data.mileage
-        vehicle.updated_at = datetime.utcnow()
-        await vehicle.save()
-    
-    # Convert dates to Jalali for response
-    history_out = ServiceHistoryOut(**history.dict())
-    jalali_date = gregorian_to_jalali(history.service_date)
-    history_out.service_date = jalali_date.strftime("%Y/%m/%d")
-    
-    return history_out
+    return ServiceHistoryOut(**{**history.dict(), 'id': str(history.id)})
 
 
 @router.get("/", response_model=List[ServiceHistoryOut])
@@ -118,7 +107,21 @@ async def list_history_records(
         vehicle_ids = [v.id async for v in Vehicle.find(Vehicle.user_id == current_user.id)]
         query = ServiceHistory.vehicle_id.in_(vehicle_ids)
     
-    history_records = await ServiceHistory.find(query).sort(-ServiceHistory.service_date).skip(skip).limit(limit).to_list()
+    history_records = await ServiceHistory.find(query).sort(-ServiceHistory.actual_date).skip(skip).limit(limit).to_list()
+    
+    # The page goes past the hot records, continue with the archived ones; both are ordered by
+    # actual_date, and archived records are all older than the hot ones
+    if len(history_records) < limit:
+        hot_count = await ServiceHistory.find(query).count()
+        archive_skip = max(skip - hot_count, 0)
+        archived_vehicle_ids = [vehicle_id] if vehicle_id else [str(v_id) for v_id in vehicle_ids]
+        async for record in iter_archived_records('service_histories', archived_vehicle_ids, 'actual_date'):
+            if archive_skip:
+                archive_skip -= 1
+                continue
+            history_records.append(ServiceHistory.parse_obj(record))
+            if len(history_records) >= limit:
+                break
     
     # Convert dates to Jalali for response
     history_out_list = []
@@ -131,6 +134,316 @@ async def list_history_records(
     return history_out_list
 
 
+@router.get("/stats", response_model=ExpenseStatsOut)
+async def get_history_expense_stats(
+    vehicle_id: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get expense statistics for a vehicle or for all of the user's vehicles"""
+    if vehicle_id:
+        # Check if user owns this vehicle
+        vehicle = await Vehicle.get(vehicle_id)
+        if not vehicle or vehicle.user_id != current_user.id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not authorized to access history for this vehicle"
+            )
+        query = {"vehicle_id": vehicle_id}
+    else:
+        query = {"user_id": str(current_user.id)}
+    
+    stats = await get_expense_stats(query)
+    
+    return ExpenseStatsOut(**stats)
+
+
+@router.get("/summaries", response_model=List[VehicleExpenseSummaryOut])
+async def list_expense_summaries(
+    vehicle_id: str,
+    year: Optional[int] = None,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get monthly expense summaries of a vehicle (Jalali months)"""
+    # Check if user owns this vehicle
+    vehicle = await Vehicle.get(vehicle_id)
+    if not vehicle or vehicle.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to access history for this vehicle"
+        )
+    
+    query = VehicleExpenseSummary.vehicle_id == vehicle_id
+    if year:
+        query = query & (VehicleExpenseSummary.year == year)
+    
+    summaries = await VehicleExpenseSummary.find(query).sort(
+        -VehicleExpenseSummary.year, -VehicleExpenseSummary.month
+    ).to_list()
+    
+    return [VehicleExpenseSummaryOut(**summary.dict()) for summary in summaries]
+
+
+@router.get("/search", response_model=List[HistorySearchResult])
+async def search_history(
+    q: str,
+    vehicle_id: Optional[str] = None,
+    limit: int = 20,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Search the user's service history by service, part, center and technician names"""
+    if vehicle_id:
+        # Check if user owns this vehicle
+        vehicle = await Vehicle.get(vehicle_id)
+        if not vehicle or vehicle.user_id != current_user.id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not authorized to access history for this vehicle"
+            )
+    
+    results = await history_search.search(
+        str(current_user.id), q, vehicle_id=vehicle_id, limit=max(1, min(limit, 100))
+    )
+    jalali_dates = format_jalali_dates(document.actual_date for document, _ in results)
+    
+    return [
+        HistorySearchResult(**{**document._asdict(), 'actual_date': jalali_date}, score=score)
+        for (document, score), jalali_date in zip(results, jalali_dates)
+    ]
+
+
+@router.get("/parts/usage", response_model=List[PartUsageOut])
+async def get_history_parts_usage(
+    part: Optional[str] = None,
+    months: int = 12,
+    limit: int = 20,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get consumption and unit price trends of the parts used across the user's vehicles"""
+    usage = await get_parts_usage(
+        str(current_user.id), part=part, months=max(1, min(months, 60)), limit=max(1, min(limit, 100))
+    )
+    
+    return [PartUsageOut(**item) for item in usage]
+
+
+@router.get("/export")
+async def export_history(
+    vehicle_id: Optional[str] = None,
+    format: str = "pdf",
+    current_user: User = Depends(get_current_active_user)
+):
+    """Export history records (CSV/NDJSON streamed, XLSX/PDF as a background job)"""
+    if format not in STREAMING_FORMATS + JOB_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported export format. Expected one of: {', '.join(STREAMING_FORMATS + JOB_FORMATS)}"
+        )
+    
+    if vehicle_id:
+        # Check if user owns this vehicle
+        vehicle = await Vehicle.get(vehicle_id)
+        if not vehicle or vehicle.user_id != current_user.id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not authorized to export history for this vehicle"
+            )
+        query = {"vehicle_id": vehicle_id}
+    else:
+        vehicle_ids = [str(v.id) async for v in Vehicle.find(Vehicle.user_id == current_user.id)]
+        query = {"vehicle_id": {"$in": vehicle_ids}}
+    
+    filename = f"history-{vehicle_id or 'all'}"
+    if format == 'csv':
+        return StreamingResponse(
+            stream_csv(query),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": f'attachment; filename="{filename}.csv"'}
+        )
+    
+    if format == 'ndjson':
+        return StreamingResponse(
+            stream_ndjson(query),
+            media_type="application/x-ndjson",
+            headers={"Content-Disposition": f'attachment; filename="{filename}.ndjson"'}
+        )
+    
+    # XLSX and PDF are rendered in the background
+    job = HistoryExportJob(
+        user_id=str(current_user.id),
+        vehicle_id=vehicle_id,
+        format=format,
+    )
+    await job.insert()
+    start_export_job(job, query)
+    
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content=HistoryExportJobOut(**job.dict()).model_dump(mode="json")
+    )
+
+
+@router.get("/export/jobs/{job_id}", response_model=HistoryExportJobOut)
+async def get_export_job(
+    job_id: str,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get the status of a history export job"""
+    job = await HistoryExportJob.get(job_id)
+    if not job or job.user_id != str(current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Export job not found"
+        )
+    
+    return HistoryExportJobOut(**job.dict())
+
+
+@router.get("/export/jobs/{job_id}/download")
+async def download_export_job(
+    job_id: str,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Download the file produced by a history export job"""
+    job = await HistoryExportJob.get(job_id)
+    if not job or job.user_id != str(current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Export job not found"
+        )
+    
+    if job.status != 'completed' or not job.file_path:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Export job is {job.status}"
+        )
+    
+    media_types = {
+        'xlsx': "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        'pdf': "application/pdf",
+    }
+    return FileResponse(
+        job.file_path,
+        media_type=media_types[job.format],
+        filename=f"history-{job.vehicle_id or 'all'}.{job.format}"
+    )
+
+
+@router.post("/fuel", response_model=FuelLogOut, status_code=status.HTTP_201_CREATED)
+async def create_fuel_log(
+    fuel_data: FuelLogCreate,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Record a fill-up and update the vehicle's fuel statistics"""
+    # Check if user owns this vehicle
+    vehicle = await Vehicle.get(fuel_data.vehicle_id)
+    if not vehicle or vehicle.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to add fuel logs for this vehicle"
+        )
+    
+    fuel_log = FuelLog(
+        vehicle_id=fuel_data.vehicle_id,
+        user_id=str(current_user.id),
+        fill_date=fuel_data.fill_date,
+        mileage=fuel_data.mileage,
+        fuel_amount=fuel_data.fuel_amount,
+        fuel_price_per_liter=fuel_data.fuel_price_per_liter,
+        cost=fuel_data.cost if fuel_data.cost is not None else round(fuel_data.fuel_amount * fuel_data.fuel_price_per_liter),
+        fuel_type=fuel_data.fuel_type,
+        is_full_tank=fuel_data.is_full_tank,
+    )
+    await fuel_log.insert()
+    stats = await record_fill(fuel_log)
+    
+    # Update vehicle mileage if this is higher
+    await bump_vehicle_mileage(fuel_log.vehicle_id, fuel_log.mileage)
+    await record_mileage(fuel_log.vehicle_id, fuel_log.mileage, 'fuel', fuel_log.fill_date)
+    
+    # Efficiency is only known when this fill-up closed a full-tank segment
+    closes_segment = fuel_log.is_full_tank and stats.last_full_mileage == fuel_log.mileage and stats.recent_segments
+    return FuelLogOut(
+        **fuel_log.dict(exclude={'id', 'fill_date'}),
+        id=str(fuel_log.id),
+        fill_date=format_jalali_dates([fuel_log.fill_date])[0],
+        efficiency=stats.last_efficiency if closes_segment else None,
+        rolling_efficiency=stats.rolling_efficiency if closes_segment else None,
+    )
+
+
+@router.get("/fuel", response_model=List[FuelLogOut])
+async def list_fuel_logs(
+    vehicle_id: str,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get the fill-ups of a vehicle with their computed efficiency"""
+    # Check if user owns this vehicle
+    vehicle = await Vehicle.get(vehicle_id)
+    if not vehicle or vehicle.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to access fuel logs for this vehicle"
+        )
+    
+    series = await get_efficiency_series(vehicle_id)
+    jalali_dates = format_jalali_dates(item['log'].fill_date for item in series)
+    
+    return [
+        FuelLogOut(
+            **item['log'].dict(exclude={'id', 'fill_date'}),
+            id=str(item['log'].id),
+            fill_date=jalali_date,
+            efficiency=item['efficiency'],
+            rolling_efficiency=item['rolling_efficiency'],
+            cost_per_km=item['cost_per_km'],
+        )
+        for item, jalali_date in zip(series, jalali_dates)
+    ]
+
+
+@router.get("/fuel/stats", response_model=FuelStatsOut)
+async def get_fuel_stats(
+    vehicle_id: str,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get fuel efficiency and cost statistics of a vehicle"""
+    # Check if user owns this vehicle
+    vehicle = await Vehicle.get(vehicle_id)
+    if not vehicle or vehicle.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to access fuel logs for this vehicle"
+        )
+    
+    stats = await FuelStats.find_one(FuelStats.vehicle_id == vehicle_id)
+    if stats is None:
+        stats = await recompute_vehicle(vehicle_id)
+    
+    return FuelStatsOut(**stats.dict())
+
+
+@router.delete("/fuel/{log_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_fuel_log(
+    log_id: str,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Delete a fill-up"""
+    fuel_log = await FuelLog.get(log_id)
+    if not fuel_log or fuel_log.user_id != str(current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Fuel log not found"
+        )
+    
+    vehicle_id = fuel_log.vehicle_id
+    await fuel_log.delete()
+    
+    # Removing a fill-up changes the segments around it
+    await recompute_vehicle(vehicle_id)
+    
+    return None
+
+
 @router.get("/{history_id}", response_model=ServiceHistoryOut)
 async def get_history_record(
     history_id: str,
@@ -138,6 +451,11 @@ async def get_history_record(
 ):
     """Get history record by ID"""
     history = await ServiceHistory.get(history_id)
+    if not history:
+        # Fall through to the archive for records past the retention horizon
+        archived = await find_archived_record('service_histories', history_id)
+        if archived:
+            history = ServiceHistory.parse_obj(archived)
     if not history:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -182,6 +500,11 @@ async def update_history_record(
             detail="Not authorized to update this history record"
         )
     
+    # Remember which monthly summary the record belonged to before the update
+    previous_summary_key = summary_key(history)
+    previous_parts_key = parts_month_key(history)
+    previous_spend = (history.actual_date, history.total_cost)
+    
     # Update history fields
     update_data = history_update.dict(exclude_unset=True)
     
@@ -207,10 +530,20 @@ async def update_history_record(
     for key, value in update_data.items():
         if hasattr(history, key) and value is not None:
             setattr(history, key, value)
+    history.plate_key = plate_key(history.vehicle_license_plate)
     
     # Save updated history
     await history.save()
     
+    # Refresh the old and the new monthly summary (the same one unless date or vehicle changed)
+    await refresh_months([previous_summary_key, summary_key(history)])
+    history_search.invalidate(history.user_id)
+    if parts_month_key(history) != previous_parts_key:
+        await mark_months_dirty([previous_parts_key])
+    if (history.actual_date, history.total_cost) != previous_spend:
+        await record_spend(history.user_id, previous_spend[0], -previous_spend[1])
+        await record_spend(history.user_id, history.actual_date, history.total_cost)
+    
     # Convert dates to Jalali for response
     history_out = ServiceHistoryOut(**history.dict())
     jalali_date = gregorian_to_jalali(history.service_date)
@@ -241,33 +574,11 @@ async def delete_history_record(
         )
     
     # Delete history record
+    previous_summary_key = summary_key(history)
     await history.delete()
+    await refresh_month(*previous_summary_key)
+    history_search.invalidate(history.user_id)
+    await mark_months_dirty([parts_month_key(history)])
+    await record_spend(history.user_id, history.actual_date, -history.total_cost)
     
     return None
-
-
-@router.get("/export", response_model=dict)
-async def export_history(
-    vehicle_id: Optional[str] = None,
-    format: str = "pdf",
-    current_user: User = Depends(get_current_active_user)
-):
-    """Export history records (placeholder for actual implementation)"""
-    # In a real implementation, this would generate a PDF or other format
-    # For now, we'll just return a placeholder response
-    
-    if vehicle_id:
-        # Check if user owns this vehicle
-        vehicle = await Vehicle.get(vehicle_id)
-        if not vehicle or vehicle.user_id != current_user.id:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Not authorized to export history for this vehicle"
-            )
-    
-    return {
-        "message": f"History export in {format} format would be generated here",
-        "vehicle_id": vehicle_id,
-        "format": format,
-        "status": "placeholder"
-    }
\ No newline at end of file
@@ -0,0 +1,252 @@
+"""
+Service history export for FastAPI MashinMan project.
+
+CSV and NDJSON exports are streamed straight from the ServiceHistory
+cursor in batches, so memory use does not grow with the number of
+records. XLSX and PDF need the whole document before they can be sent,
+so they run as background jobs: the rows are first spooled to a CSV file
+the same way, then rendered in a process pool into a downloadable file.
+Exports cover the hot collection only: records moved to the archive (older
+than ARCHIVE_HISTORY_RETENTION_DAYS) are left out.
+"""
+
+import asyncio
+import csv
+import io
+import json
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Set
+
+from .models import ServiceHistory, HistoryExportJob
+from core.config import get_settings
+from core.jalali import format_jalali_dates
+
+logger = logging.getLogger('mashinman')
+_settings = get_settings()
+
+STREAMING_FORMATS = ['csv', 'ndjson']
+JOB_FORMATS = ['xlsx', 'pdf']
+
+# (field, column title) pairs in export order
+EXPORT_COLUMNS = [
+    ('actual_date', 'تاریخ انجام'),
+    ('vehicle_license_plate', 'پلاک'),
+    ('vehicle_brand', 'برند'),
+    ('vehicle_model', 'مدل'),
+    ('service_type', 'نوع سرویس'),
+    ('service_name', 'نام سرویس'),
+    ('actual_mileage', 'کیلومتر'),
+    ('parts_cost', 'هزینه قطعات'),
+    ('labor_cost', 'هزینه دست‌مزد'),
+    ('total_cost', 'هزینه کل'),
+    ('service_center_name', 'مرکز سرویس'),
+    ('technician_name', 'تکنسین'),
+    ('service_description', 'توضیحات'),
+]
+
+_PROJECTION = {field: 1 for field, _ in EXPORT_COLUMNS}
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+# Keeps references to running export tasks so they are not garbage collected
+_running_jobs: Set[asyncio.Task] = set()
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Get the shared process pool used for rendering, creating it on first use."""
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=_settings.HISTORY_EXPORT_PROCESS_WORKERS)
+    return _process_pool
+
+
+def shutdown_process_pool() -> None:
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+
+async def iter_history_batches(query: Dict, batch_size: Optional[int] = None) -> AsyncIterator[List[Dict]]:
+    """
+    Iterate history records matching query in batches, with Jalali dates.
+
+    Args:
+        query (Dict): MongoDB filter on the service_histories collection
+        batch_size (int): Number of records per batch
+
+    Yields:
+        List[Dict]: A batch of records restricted to the export columns
+    """
+    batch_size = batch_size or _settings.HISTORY_EXPORT_BATCH_SIZE
+    cursor = ServiceHistory.get_motor_collection().find(
+        query, projection=_PROJECTION
+    ).sort("actual_date", -1).batch_size(batch_size)
+
+    batch = []
+    async for record in cursor:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield _prepare_batch(batch)
+            batch = []
+    if batch:
+        yield _prepare_batch(batch)
+
+
+def _prepare_batch(records: List[Dict]) -> List[Dict]:
+    # Convert the whole batch's dates at once
+    jalali_dates = format_jalali_dates(record.get('actual_date') for record in records)
+    prepared = []
+    for record, jalali_date in zip(records, jalali_dates):
+        row = {field: record.get(field) for field, _ in EXPORT_COLUMNS}
+        row['actual_date'] = jalali_date
+        prepared.append(row)
+    return prepared
+
+
+def _csv_chunk(rows: List[List]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+async def stream_csv(query: Dict) -> AsyncIterator[bytes]:
+    """Stream history records as UTF-8 CSV (with BOM so spreadsheets detect Persian text)."""
+    yield ('\ufeff' + _csv_chunk([[title for _, title in EXPORT_COLUMNS]])).encode('utf-8')
+    async for batch in iter_history_batches(query):
+        rows = [[row[field] if row[field] is not None else '' for field, _ in EXPORT_COLUMNS] for row in batch]
+        yield _csv_chunk(rows).encode('utf-8')
+
+
+async def stream_ndjson(query: Dict) -> AsyncIterator[bytes]:
+    """Stream history records as newline-delimited JSON."""
+    async for batch in iter_history_batches(query):
+        yield ''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in batch).encode('utf-8')
+
+
+def render_xlsx(source_path: str, target_path: str) -> int:
+    """
+    Render a spooled CSV file into an XLSX workbook (runs in a worker process).
+
+    Returns:
+        int: Number of data rows written
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title='history')
+    sheet.sheet_view.rightToLeft = True
+    rows = 0
+    with open(source_path, newline='', encoding='utf-8-sig') as source:
+        for row in csv.reader(source):
+            sheet.append(row)
+            rows += 1
+    workbook.save(target_path)
+    # Header row is not counted
+    return max(rows - 1, 0)
+
+
+def render_pdf(source_path: str, target_path: str, font_path: str = "") -> int:
+    """
+    Render a spooled CSV file into a PDF table (runs in a worker process).
+
+    Persian text is reshaped and reordered for display; a font with Persian
+    glyphs must be configured through HISTORY_EXPORT_PDF_FONT_PATH.
+
+    Returns:
+        int: Number of data rows written
+    """
+    import arabic_reshaper
+    from bidi.algorithm import get_display
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
+
+    font_name = 'Helvetica'
+    if font_path:
+        pdfmetrics.registerFont(TTFont('ExportFont', font_path))
+        font_name = 'ExportFont'
+
+    with open(source_path, newline='', encoding='utf-8-sig') as source:
+        # Columns are reversed so the table reads right to left
+        data = [
+            [get_display(arabic_reshaper.reshape(cell)) for cell in reversed(row)]
+            for row in csv.reader(source)
+        ]
+
+    table = Table(data, repeatRows=1)
+    table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (-1, -1), font_name),
+        ('FONTSIZE', (0, 0), (-1, -1), 7),
+        ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+        ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
+    ]))
+    SimpleDocTemplate(target_path, pagesize=landscape(A4)).build([table])
+    return len(data) - 1
+
+
+def export_directory() -> Path:
+    directory = _settings.MEDIA_ROOT / 'exports'
+    directory.mkdir(exist_ok=True)
+    return directory
+
+
+async def run_export_job(job: HistoryExportJob, query: Dict) -> None:
+    """
+    Spool the matching records to CSV and render the requested format in the process pool.
+
+    Args:
+        job (HistoryExportJob): Job document to update with progress
+        query (Dict): MongoDB filter on the service_histories collection
+    """
+    directory = export_directory()
+    spool_path = directory / f"{job.id}.csv"
+    target_path = directory / f"{job.id}.{job.format}"
+
+    job.status = 'running'
+    await job.save()
+
+    try:
+        with open(spool_path, 'w', newline='', encoding='utf-8-sig') as spool:
+            writer = csv.writer(spool)
+            writer.writerow([title for _, title in EXPORT_COLUMNS])
+            async for batch in iter_history_batches(query):
+                writer.writerows(
+                    [str(row[field]) if row[field] is not None else '' for field, _ in EXPORT_COLUMNS]
+                    for row in batch
+                )
+
+        loop = asyncio.get_running_loop()
+        if job.format == 'xlsx':
+            rows = await loop.run_in_executor(get_process_pool(), render_xlsx, str(spool_path), str(target_path))
+        else:
+            rows = await loop.run_in_executor(
+                get_process_pool(), render_pdf, str(spool_path), str(target_path),
+                _settings.HISTORY_EXPORT_PDF_FONT_PATH
+            )
+
+        job.status = 'completed'
+        job.rows_count = rows
+        job.file_path = str(target_path)
+    except Exception as exc:
+        logger.exception("History export job %s failed", job.id)
+        job.status = 'failed'
+        job.error = str(exc)
+    finally:
+        spool_path.unlink(missing_ok=True)
+
+    job.completed_at = datetime.utcnow()
+    await job.save()
+
+
+def start_export_job(job: HistoryExportJob, query: Dict) -> None:
+    """Run an export job in the background."""
+    task = asyncio.create_task(run_export_job(job, query))
+    _running_jobs.add(task)
+    task.add_done_callback(_running_jobs.discard)
@@ -0,0 +1,302 @@
+"""
+Fuel efficiency engine for FastAPI MashinMan project.
+
+Efficiency uses the full-tank method: the fuel added from one full-tank
+fill-up to the next, divided by the distance between them, gives the
+consumption over that segment in liters per 100 km. A vehicle's whole log
+is computed in one vectorized pass with NumPy; FuelStats keeps running
+totals so that appending a fill-up is an O(1) update.
+"""
+
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .models import FuelLog, FuelStats
+from core.config import get_settings
+
+logger = logging.getLogger('mashinman')
+_settings = get_settings()
+
+
+def compute_segments(mileage: np.ndarray, fuel: np.ndarray, cost: np.ndarray, full: np.ndarray, window: int) -> Dict[str, np.ndarray]:
+    """
+    Compute per-segment efficiency, rolling efficiency and cost per km.
+
+    Args:
+        mileage (np.ndarray): Odometer readings, sorted ascending
+        fuel (np.ndarray): Liters added at each fill-up
+        cost (np.ndarray): Cost of each fill-up
+        full (np.ndarray): Whether each fill-up filled the tank
+        window (int): Number of segments in the rolling average
+
+    Returns:
+        Dict[str, np.ndarray]: 'end' (index of the fill-up closing each segment),
+        'fuel', 'distance', 'cost', 'efficiency', 'rolling_efficiency', 'cost_per_km'
+    """
+    full_index = np.flatnonzero(full)
+    if len(full_index) < 2:
+        empty = np.array([], dtype=float)
+        return {key: empty for key in ('end', 'fuel', 'distance', 'cost', 'efficiency', 'rolling_efficiency', 'cost_per_km')}
+
+    # Fuel added after the opening full tank up to and including the closing one
+    cumulative_fuel = np.cumsum(fuel)
+    cumulative_cost = np.cumsum(cost)
+    start, end = full_index[:-1], full_index[1:]
+    segment_fuel = cumulative_fuel[end] - cumulative_fuel[start]
+    segment_cost = cumulative_cost[end] - cumulative_cost[start]
+    segment_distance = mileage[end] - mileage[start]
+
+    valid = segment_distance > 0
+    end, segment_fuel, segment_cost, segment_distance = end[valid], segment_fuel[valid], segment_cost[valid], segment_distance[valid]
+
+    # Rolling sums over the last `window` segments via prefix sums
+    fuel_prefix = np.concatenate(([0.0], np.cumsum(segment_fuel)))
+    distance_prefix = np.concatenate(([0.0], np.cumsum(segment_distance)))
+    upper = np.arange(1, len(end) + 1)
+    lower = np.maximum(upper - window, 0)
+    rolling_fuel = fuel_prefix[upper] - fuel_prefix[lower]
+    rolling_distance = distance_prefix[upper] - distance_prefix[lower]
+
+    return {
+        'end': end,
+        'fuel': segment_fuel,
+        'distance': segment_distance,
+        'cost': segment_cost,
+        'efficiency': segment_fuel / segment_distance * 100,
+        'rolling_efficiency': rolling_fuel / rolling_distance * 100,
+        'cost_per_km': segment_cost / segment_distance,
+    }
+
+
+def _log_arrays(logs: List[FuelLog]):
+    mileage = np.fromiter((log.mileage for log in logs), dtype=np.int64, count=len(logs))
+    fuel = np.fromiter((log.fuel_amount for log in logs), dtype=float, count=len(logs))
+    cost = np.fromiter((log.cost for log in logs), dtype=np.int64, count=len(logs))
+    full = np.fromiter((log.is_full_tank for log in logs), dtype=bool, count=len(logs))
+    return mileage, fuel, cost, full
+
+
+def _empty_totals(fills_count: int = 0) -> Dict:
+    return {
+        'fills_count': fills_count, 'last_mileage': None, 'last_full_mileage': None,
+        'pending_fuel': 0.0, 'pending_cost': 0,
+        'total_fuel': 0.0, 'total_cost': 0, 'total_distance': 0,
+        'recent_segments': [], 'last_efficiency': None,
+    }
+
+
+def _derive(totals: Dict) -> None:
+    """Recompute the averages from the running totals."""
+    totals['average_efficiency'] = round(totals['total_fuel'] / totals['total_distance'] * 100, 2) if totals['total_distance'] else None
+    totals['cost_per_km'] = round(totals['total_cost'] / totals['total_distance'], 2) if totals['total_distance'] else None
+    recent_distance = sum(segment[1] for segment in totals['recent_segments'])
+    recent_fuel = sum(segment[0] for segment in totals['recent_segments'])
+    totals['rolling_efficiency'] = round(recent_fuel / recent_distance * 100, 2) if recent_distance else None
+
+
+def aggregate_fills(mileage: np.ndarray, fuel: np.ndarray, cost: np.ndarray, full: np.ndarray, window: int) -> Dict:
+    """
+    Compute the running fuel aggregates of a whole log in one vectorized pass.
+
+    Args:
+        mileage (np.ndarray): Odometer readings, sorted ascending
+        fuel (np.ndarray): Liters added at each fill-up
+        cost (np.ndarray): Cost of each fill-up
+        full (np.ndarray): Whether each fill-up filled the tank
+        window (int): Number of segments in the rolling average
+
+    Returns:
+        Dict: Values of the FuelStats aggregate fields
+    """
+    totals = _empty_totals(len(mileage))
+    if not len(mileage):
+        _derive(totals)
+        return totals
+
+    segments = compute_segments(mileage, fuel, cost, full, window)
+    totals['last_mileage'] = int(mileage[-1])
+
+    full_index = np.flatnonzero(full)
+    if len(full_index):
+        last_full = full_index[-1]
+        totals['last_full_mileage'] = int(mileage[last_full])
+        totals['pending_fuel'] = float(fuel[last_full + 1:].sum())
+        totals['pending_cost'] = int(cost[last_full + 1:].sum())
+
+    if len(segments['end']):
+        totals['total_fuel'] = float(segments['fuel'].sum())
+        totals['total_cost'] = int(segments['cost'].sum())
+        totals['total_distance'] = int(segments['distance'].sum())
+        totals['last_efficiency'] = round(float(segments['efficiency'][-1]), 2)
+        totals['recent_segments'] = [
+            [float(f), float(d), float(c)]
+            for f, d, c in zip(segments['fuel'][-window:], segments['distance'][-window:], segments['cost'][-window:])
+        ]
+
+    _derive(totals)
+    return totals
+
+
+def fold_fill(totals: Dict, mileage: int, fuel_amount: float, cost: int, is_full_tank: bool, window: int) -> None:
+    """
+    Fold one fill-up with a mileage above every previous one into running aggregates.
+
+    Args:
+        totals (Dict): Values of the FuelStats aggregate fields, updated in place
+        mileage (int): Odometer reading of the fill-up
+        fuel_amount (float): Liters added
+        cost (int): Cost of the fill-up
+        is_full_tank (bool): Whether the fill-up filled the tank
+        window (int): Number of segments in the rolling average
+    """
+    totals['fills_count'] += 1
+    totals['last_mileage'] = mileage
+
+    if totals['last_full_mileage'] is None:
+        # Nothing can be measured until the first full tank
+        if is_full_tank:
+            totals['last_full_mileage'] = mileage
+        _derive(totals)
+        return
+
+    totals['pending_fuel'] += fuel_amount
+    totals['pending_cost'] += cost
+    if is_full_tank:
+        distance = mileage - totals['last_full_mileage']
+        # A segment without distance is dropped, as compute_segments does
+        if distance > 0:
+            totals['total_fuel'] += totals['pending_fuel']
+            totals['total_cost'] += totals['pending_cost']
+            totals['total_distance'] += distance
+            totals['last_efficiency'] = round(totals['pending_fuel'] / distance * 100, 2)
+            segment = [totals['pending_fuel'], float(distance), float(totals['pending_cost'])]
+            totals['recent_segments'] = (totals['recent_segments'] + [segment])[-window:]
+        totals['last_full_mileage'] = mileage
+        totals['pending_fuel'] = 0.0
+        totals['pending_cost'] = 0
+
+    _derive(totals)
+
+
+def build_stats(vehicle_id: str, logs: List[FuelLog], window: Optional[int] = None) -> FuelStats:
+    """
+    Build running fuel aggregates from a vehicle's whole log.
+
+    Args:
+        vehicle_id (str): Vehicle ID
+        logs (List[FuelLog]): Fill-ups sorted by mileage
+        window (int): Number of segments in the rolling average
+
+    Returns:
+        FuelStats: Aggregates (not yet saved)
+    """
+    window = window or _settings.FUEL_ROLLING_WINDOW
+    return FuelStats(vehicle_id=vehicle_id, **aggregate_fills(*_log_arrays(logs), window))
+
+
+def apply_fill(stats: FuelStats, log: FuelLog, window: Optional[int] = None) -> None:
+    """
+    Fold one fill-up with a mileage above every previous one into the running aggregates.
+
+    Args:
+        stats (FuelStats): Aggregates to update in place
+        log (FuelLog): New fill-up
+        window (int): Number of segments in the rolling average
+    """
+    window = window or _settings.FUEL_ROLLING_WINDOW
+    totals = {field: getattr(stats, field) for field in _empty_totals()}
+    fold_fill(totals, log.mileage, log.fuel_amount, log.cost, log.is_full_tank, window)
+    for field, value in totals.items():
+        setattr(stats, field, value)
+    stats.updated_at = datetime.utcnow()
+
+
+async def recompute_vehicle(vehicle_id: str) -> FuelStats:
+    """
+    Rebuild a vehicle's fuel aggregates from its whole log.
+
+    Args:
+        vehicle_id (str): Vehicle ID
+
+    Returns:
+        FuelStats: Saved aggregates
+    """
+    logs = await FuelLog.find(FuelLog.vehicle_id == vehicle_id).sort(+FuelLog.mileage).to_list()
+    stats = build_stats(vehicle_id, logs)
+    fields = stats.dict(exclude={'id', 'revision_id'})
+    await FuelStats.get_motor_collection().update_one(
+        {"vehicle_id": vehicle_id}, {"$set": fields}, upsert=True
+    )
+    return stats
+
+
+async def record_fill(log: FuelLog) -> FuelStats:
+    """
+    Update a vehicle's aggregates for a newly inserted fill-up.
+
+    Appending in mileage order is O(1); an out-of-order fill-up or a
+    concurrent update falls back to a full recompute.
+
+    Args:
+        log (FuelLog): Inserted fill-up
+
+    Returns:
+        FuelStats: Updated aggregates
+    """
+    stats = await FuelStats.find_one(FuelStats.vehicle_id == log.vehicle_id)
+    if stats is None or (stats.last_mileage is not None and log.mileage <= stats.last_mileage):
+        return await recompute_vehicle(log.vehicle_id)
+
+    previous_count = stats.fills_count
+    apply_fill(stats, log)
+    fields = stats.dict(exclude={'id', 'revision_id'})
+
+    # fills_count acts as a version so concurrent fill-ups cannot overwrite each other
+    result = await FuelStats.get_motor_collection().update_one(
+        {"vehicle_id": log.vehicle_id, "fills_count": previous_count}, {"$set": fields}
+    )
+    if result.modified_count == 0:
+        return await recompute_vehicle(log.vehicle_id)
+    return stats
+
+
+async def get_efficiency_series(vehicle_id: str) -> List[Dict]:
+    """
+    Get every fill-up of a vehicle with its computed efficiency.
+
+    Args:
+        vehicle_id (str): Vehicle ID
+
+    Returns:
+        List[Dict]: Fill-ups in mileage order with efficiency, rolling_efficiency and cost_per_km
+    """
+    logs = await FuelLog.find(FuelLog.vehicle_id == vehicle_id).sort(+FuelLog.mileage).to_list()
+    if not logs:
+        return []
+
+    mileage, fuel, cost, full = _log_arrays(logs)
+    segments = compute_segments(mileage, fuel, cost, full, _settings.FUEL_ROLLING_WINDOW)
+
+    efficiency = np.full(len(logs), np.nan)
+    rolling = np.full(len(logs), np.nan)
+    cost_per_km = np.full(len(logs), np.nan)
+    end = segments['end'].astype(int)
+    efficiency[end] = segments['efficiency']
+    rolling[end] = segments['rolling_efficiency']
+    cost_per_km[end] = segments['cost_per_km']
+
+    def _value(array, index):
+        return None if np.isnan(array[index]) else round(float(array[index]), 2)
+
+    return [
+        {
+            'log': log,
+            'efficiency': _value(efficiency, index),
+            'rolling_efficiency': _value(rolling, index),
+            'cost_per_km': _value(cost_per_km, index),
+        }
+        for index, log in enumerate(logs)
+    ]
@@ -0,0 +1,117 @@
+"""
+History ingestion for FastAPI MashinMan project.
+
+A new history record, the completion of its service and the vehicle's
+mileage are written as targeted updates instead of full document saves.
+On a replica set the three writes share one transaction; on a standalone
+server the record is inserted first and the two updates are sent
+concurrently once it is stored. The derived writes (odometer reading,
+garage spend, next service and monthly expense summary) follow in one
+concurrent round.
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Awaitable, List
+
+from bson import ObjectId
+
+from .models import ServiceHistory
+from .analytics import refresh_month, summary_key
+from core.database import supports_transactions
+from services.state import ServiceTransitionError, transition_service
+from vehicles.garage import record_spend, sync_next_service
+from vehicles.mileage import record_mileage
+from vehicles.models import Vehicle
+
+logger = logging.getLogger('mashinman')
+
+
+async def bump_vehicle_mileage(vehicle_id: str, mileage: int, session=None) -> bool:
+    """
+    Raise a vehicle's current mileage, leaving it untouched if not higher.
+
+    Args:
+        vehicle_id (str): Vehicle ID
+        mileage (int): Newly observed mileage
+        session (AsyncIOMotorClientSession): Session of an enclosing transaction
+
+    Returns:
+        bool: Whether the mileage increased
+    """
+    # The filter misses when the mileage did not increase, so nothing is written
+    result = await Vehicle.get_motor_collection().update_one(
+        {"_id": ObjectId(vehicle_id), "current_mileage": {"$lt": mileage}},
+        {"$max": {"current_mileage": mileage}, "$set": {"updated_at": datetime.utcnow()}},
+        session=session,
+    )
+    return result.modified_count > 0
+
+
+async def _complete_service(history: ServiceHistory, session=None) -> None:
+    if not history.service_id:
+        return
+    try:
+        await transition_service(
+            history.service_id, history.user_id, 'completed',
+            {'actual_date': history.actual_date, 'actual_mileage': history.actual_mileage},
+            session=session,
+        )
+    except ServiceTransitionError as exc:
+        # The record is kept for services completed or cancelled before
+        logger.info("History for service %s left it %s", history.service_id, exc.current_status)
+
+
+async def _sync_next_service(history: ServiceHistory) -> None:
+    if history.service_id:
+        await sync_next_service(history.user_id, history.service_id)
+
+
+def _derived_writes(history: ServiceHistory) -> List[Awaitable]:
+    # Kept out of the transaction, time-series collections cannot be written in one
+    return [
+        record_mileage(history.vehicle_id, history.actual_mileage, 'history', history.actual_date),
+        record_spend(history.user_id, history.actual_date, history.total_cost),
+        refresh_month(*summary_key(history)),
+    ]
+
+
+async def ingest_history(history: ServiceHistory) -> ServiceHistory:
+    """
+    Insert a history record and apply its side effects.
+
+    Nothing but the insert is written if the insert fails.
+
+    Args:
+        history (ServiceHistory): New history record
+
+    Returns:
+        ServiceHistory: The inserted record
+    """
+    client = ServiceHistory.get_motor_collection().database.client
+
+    if await supports_transactions(client):
+        async def write(session):
+            # Operations of one session cannot run concurrently
+            await history.insert(session=session)
+            await _complete_service(history, session)
+            await bump_vehicle_mileage(history.vehicle_id, history.actual_mileage, session)
+
+        async with await client.start_session() as session:
+            await session.with_transaction(write)
+        await asyncio.gather(_sync_next_service(history), *_derived_writes(history))
+    else:
+        await history.insert()
+
+        async def complete():
+            # The next service is recomputed once this one is no longer open
+            await _complete_service(history)
+            await _sync_next_service(history)
+
+        await asyncio.gather(
+            complete(),
+            bump_vehicle_mileage(history.vehicle_id, history.actual_mileage),
+            *_derived_writes(history),
+        )
+    return history
@@ -2,13 +2,14 @@
 History models for FastAPI MashinMan project using Beanie ODM.
 """
 
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime, date
 from beanie import Document
+from pymongo import IndexModel
 from pydantic import BaseModel, Field, validator
 import jdatetime
 from core.jalali import gregorian_to_jalali, jalali_to_gregorian
-from core.utils import format_persian_number
+from core.plates import plate_key
 
 
 class ServicePart(BaseModel):
@@ -27,7 +28,7 @@ class ServiceHistory(Document):
     """
     
     # References
-    service_id: str = Field(..., description="شناسه سرویس")
+    service_id: Optional[str] = Field(None, description="شناسه سرویس")
     vehicle_id: str = Field(..., description="شناسه خودرو")
     user_id: str = Field(..., description="شناسه کاربر")
     
@@ -38,6 +39,7 @@ class ServiceHistory(Document):
     
     # Vehicle information at time of service
     vehicle_license_plate: str = Field(..., description="شماره پلاک خودرو")
+    plate_key: Optional[str] = Field(None, description="کلید یکسان‌شده پلاک")
     vehicle_brand: str = Field(..., description="برند خودرو")
     vehicle_model: str = Field(..., description="مدل خودرو")
     vehicle_manufacture_year: int = Field(..., description="سال تولید خودرو")
@@ -67,6 +69,199 @@ class ServiceHistory(Document):
     
     class Settings:
         name = "service_histories"
+        indexes = [
+            [("vehicle_id", 1), ("actual_date", -1)],
+            [("user_id", 1), ("actual_date", -1)],
+            [("user_id", 1), ("updated_at", -1)],
+            "updated_at",
+            "plate_key",
+        ]
+    
+    @validator('plate_key', always=True)
+    def set_plate_key(cls, v, values):
+        return plate_key(values.get('vehicle_license_plate'))
+
+
+class VehicleExpenseSummary(Document):
+    """
+    Materialized expense summary of one vehicle for one Jalali month.
+    """
+    
+    # References
+    vehicle_id: str = Field(..., description="شناسه خودرو")
+    user_id: str = Field(..., description="شناسه کاربر")
+    
+    # Period (Jalali)
+    year: int = Field(..., description="سال")
+    month: int = Field(..., description="ماه")
+    
+    # Expenses
+    total_expenses: int = Field(default=0, description="هزینه کل (ریال)")
+    parts_expenses: int = Field(default=0, description="هزینه قطعات (ریال)")
+    labor_expenses: int = Field(default=0, description="هزینه دست‌مزد (ریال)")
+    services_count: int = Field(default=0, description="تعداد سرویس‌ها")
+    expense_breakdown: Dict[str, int] = Field(default={}, description="هزینه به تفکیک نوع سرویس")
+    
+    # Mileage
+    start_mileage: Optional[int] = Field(None, description="کیلومتر ابتدای دوره")
+    end_mileage: Optional[int] = Field(None, description="کیلومتر انتهای دوره")
+    distance_driven: int = Field(default=0, description="مسافت طی شده")
+    cost_per_km: Optional[float] = Field(None, description="هزینه به ازای هر کیلومتر")
+    
+    # Metadata
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "vehicle_expense_summaries"
+        indexes = [
+            IndexModel([("vehicle_id", 1), ("year", 1), ("month", 1)], unique=True),
+            [("user_id", 1), ("year", 1), ("month", 1)],
+        ]
+
+
+class HistoryExportJob(Document):
+    """
+    Background export of service history into a downloadable file.
+    """
+    user_id: str = Field(..., description="شناسه کاربر")
+    vehicle_id: Optional[str] = Field(None, description="شناسه خودرو")
+    format: str = Field(..., description="قالب خروجی")
+    status: str = Field(default="pending", description="وضعیت")
+    rows_count: Optional[int] = Field(None, description="تعداد ردیف‌ها")
+    file_path: Optional[str] = Field(None, description="مسیر فایل")
+    error: Optional[str] = Field(None, description="خطا")
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    completed_at: Optional[datetime] = Field(None, description="تاریخ اتمام")
+    
+    class Settings:
+        name = "history_export_jobs"
+        indexes = [
+            "user_id",
+        ]
+
+
+class PartUsageMonthly(Document):
+    """
+    Materialized consumption of one part across a user's fleet for one Jalali month.
+    """
+    user_id: str = Field(..., description="شناسه کاربر")
+    part_key: str = Field(..., description="نام نرمال‌شده قطعه")
+    part_name: str = Field(..., description="نام قطعه")
+    
+    # Period (Jalali)
+    year: int = Field(..., description="سال")
+    month: int = Field(..., description="ماه")
+    
+    # Consumption
+    quantity: int = Field(default=0, description="تعداد مصرف")
+    services_count: int = Field(default=0, description="تعداد سرویس‌ها")
+    vehicles_count: int = Field(default=0, description="تعداد خودروها")
+    total_spent: int = Field(default=0, description="هزینه کل (ریال)")
+    
+    # Unit prices
+    average_unit_price: Optional[float] = Field(None, description="میانگین قیمت واحد (ریال)")
+    min_unit_price: Optional[int] = Field(None, description="کمترین قیمت واحد (ریال)")
+    max_unit_price: Optional[int] = Field(None, description="بیشترین قیمت واحد (ریال)")
+    
+    # Metadata
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "part_usage_monthly"
+        indexes = [
+            IndexModel([("user_id", 1), ("year", 1), ("month", 1), ("part_key", 1)], unique=True),
+            [("user_id", 1), ("part_key", 1)],
+        ]
+
+
+class PartUsageDirtyMonth(Document):
+    """
+    A Jalali month whose part usage must be recomputed on the next analytics run.
+    
+    Only needed for months a record left (date change or delete); months a
+    record was written into are found from ServiceHistory.updated_at.
+    """
+    user_id: str = Field(..., description="شناسه کاربر")
+    year: int = Field(..., description="سال")
+    month: int = Field(..., description="ماه")
+    
+    class Settings:
+        name = "part_usage_dirty_months"
+        indexes = [
+            IndexModel([("user_id", 1), ("year", 1), ("month", 1)], unique=True),
+        ]
+
+
+class AnalyticsCheckpoint(Document):
+    """
+    Progress marker of an incremental analytics job.
+    """
+    name: str = Field(..., description="نام کار")
+    last_run_at: datetime = Field(..., description="زمان آخرین اجرا")
+    
+    class Settings:
+        name = "analytics_checkpoints"
+        indexes = [
+            IndexModel([("name", 1)], unique=True),
+        ]
+
+
+class FuelLog(Document):
+    """
+    Fuel log model for tracking fill-ups of a vehicle.
+    """
+    
+    # References
+    vehicle_id: str = Field(..., description="شناسه خودرو")
+    user_id: str = Field(..., description="شناسه کاربر")
+    
+    # Fill-up details
+    fill_date: date = Field(..., description="تاریخ سوخت‌گیری")
+    mileage: int = Field(..., description="کیلومتر هنگام سوخت‌گیری")
+    fuel_amount: float = Field(..., description="مقدار سوخت (لیتر)")
+    fuel_price_per_liter: int = Field(..., description="قیمت هر لیتر (ریال)")
+    cost: int = Field(..., description="هزینه کل (ریال)")
+    fuel_type: str = Field(default="gasoline", description="نوع سوخت")
+    is_full_tank: bool = Field(default=True, description="باک پر")
+    
+    # Metadata
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "fuel_logs"
+        indexes = [
+            [("vehicle_id", 1), ("mileage", 1)],
+        ]
+
+
+class FuelStats(Document):
+    """
+    Running fuel aggregates of a vehicle, updated in O(1) per fill-up.
+    
+    A segment is the distance between two full-tank fill-ups together with
+    the fuel and cost added over it.
+    """
+    vehicle_id: str = Field(..., description="شناسه خودرو")
+    fills_count: int = Field(default=0, description="تعداد سوخت‌گیری‌ها")
+    last_mileage: Optional[int] = Field(None, description="کیلومتر آخرین سوخت‌گیری")
+    last_full_mileage: Optional[int] = Field(None, description="کیلومتر آخرین باک پر")
+    pending_fuel: float = Field(default=0, description="سوخت از آخرین باک پر (لیتر)")
+    pending_cost: int = Field(default=0, description="هزینه از آخرین باک پر (ریال)")
+    total_fuel: float = Field(default=0, description="سوخت کل بخش‌های بسته (لیتر)")
+    total_cost: int = Field(default=0, description="هزینه کل بخش‌های بسته (ریال)")
+    total_distance: int = Field(default=0, description="مسافت کل بخش‌های بسته")
+    recent_segments: List[List[float]] = Field(default=[], description="آخرین بخش‌ها [سوخت، مسافت، هزینه]")
+    last_efficiency: Optional[float] = Field(None, description="مصرف آخرین بخش (لیتر در ۱۰۰ کیلومتر)")
+    average_efficiency: Optional[float] = Field(None, description="میانگین مصرف (لیتر در ۱۰۰ کیلومتر)")
+    rolling_efficiency: Optional[float] = Field(None, description="میانگین مصرف اخیر (لیتر در ۱۰۰ کیلومتر)")
+    cost_per_km: Optional[float] = Field(None, description="هزینه سوخت به ازای هر کیلومتر")
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "fuel_stats"
+        indexes = [
+            IndexModel([("vehicle_id", 1)], unique=True),
+        ]
 
 
 # Pydantic models for API
@@ -74,7 +269,7 @@ class ServiceHistoryCreate(BaseModel):
     """
     Schema for creating a new service history record.
     """
-    service_id: str = Field(..., description="شناسه سرویس")
+    service_id: Optional[str] = Field(None, description="شناسه سرویس")
     vehicle_id: str = Field(..., description="شناسه خودرو")
     user_id: str = Field(..., description="شناسه کاربر")
     service_name: str = Field(..., description="نام سرویس")
@@ -131,3 +326,157 @@ class ServiceHistoryOut(ServiceHistoryCreate):
     id: str = Field(..., description="شناسه تاریخچه سرویس")
     created_at: datetime = Field(..., description="تاریخ ایجاد")
     updated_at: datetime = Field(..., description="تاریخ به‌روزرسانی")
+
+
+class ExpenseTrendPoint(BaseModel):
+    """
+    Schema for one month of the expense trend.
+    """
+    year: int = Field(..., description="سال")
+    month: int = Field(..., description="ماه")
+    month_name: str = Field(..., description="نام ماه")
+    total_expenses: int = Field(..., description="هزینه کل (ریال)")
+
+
+class ExpenseStatsOut(BaseModel):
+    """
+    Schema for expense statistics.
+    """
+    total_expenses: int = Field(..., description="هزینه کل (ریال)")
+    monthly_expenses: int = Field(..., description="هزینه ماه جاری (ریال)")
+    yearly_expenses: int = Field(..., description="هزینه سال جاری (ریال)")
+    average_monthly_cost: float = Field(..., description="میانگین هزینه ماهانه (ریال)")
+    cost_per_km: Optional[float] = Field(None, description="هزینه به ازای هر کیلومتر")
+    expense_breakdown: Dict[str, int] = Field(default={}, description="هزینه به تفکیک نوع سرویس")
+    monthly_trend: List[ExpenseTrendPoint] = Field(default=[], description="روند ماهانه هزینه")
+    top_expense_categories: List[str] = Field(default=[], description="پرهزینه‌ترین انواع سرویس")
+
+
+class VehicleExpenseSummaryOut(BaseModel):
+    """
+    Schema for a monthly vehicle expense summary.
+    """
+    vehicle_id: str = Field(..., description="شناسه خودرو")
+    year: int = Field(..., description="سال")
+    month: int = Field(..., description="ماه")
+    total_expenses: int = Field(..., description="هزینه کل (ریال)")
+    parts_expenses: int = Field(..., description="هزینه قطعات (ریال)")
+    labor_expenses: int = Field(..., description="هزینه دست‌مزد (ریال)")
+    services_count: int = Field(..., description="تعداد سرویس‌ها")
+    expense_breakdown: Dict[str, int] = Field(default={}, description="هزینه به تفکیک نوع سرویس")
+    start_mileage: Optional[int] = Field(None, description="کیلومتر ابتدای دوره")
+    end_mileage: Optional[int] = Field(None, description="کیلومتر انتهای دوره")
+    distance_driven: int = Field(..., description="مسافت طی شده")
+    cost_per_km: Optional[float] = Field(None, description="هزینه به ازای هر کیلومتر")
+    updated_at: datetime = Field(..., description="تاریخ به‌روزرسانی")
+
+
+class HistoryExportJobOut(BaseModel):
+    """
+    Schema for history export job output.
+    """
+    id: str = Field(..., description="شناسه خروجی")
+    vehicle_id: Optional[str] = Field(None, description="شناسه خودرو")
+    format: str = Field(..., description="قالب خروجی")
+    status: str = Field(..., description="وضعیت")
+    rows_count: Optional[int] = Field(None, description="تعداد ردیف‌ها")
+    error: Optional[str] = Field(None, description="خطا")
+    created_at: datetime = Field(..., description="تاریخ ایجاد")
+    completed_at: Optional[datetime] = Field(None, description="تاریخ اتمام")
+
+
+class HistorySearchResult(BaseModel):
+    """
+    Schema for a ranked history search result.
+    """
+    id: str = Field(..., description="شناسه سابقه")
+    vehicle_id: str = Field(..., description="شناسه خودرو")
+    service_name: str = Field(..., description="نام سرویس")
+    service_type: str = Field(..., description="نوع سرویس")
+    actual_date: str = Field(..., description="تاریخ انجام (شمسی)")
+    total_cost: int = Field(..., description="هزینه کل (ریال)")
+    score: float = Field(..., description="امتیاز تطابق")
+
+
+class PartUsagePoint(BaseModel):
+    """
+    Schema for one month of a part's consumption and price series.
+    """
+    year: int = Field(..., description="سال")
+    month: int = Field(..., description="ماه")
+    month_name: str = Field(..., description="نام ماه")
+    quantity: int = Field(..., description="تعداد مصرف")
+    total_spent: int = Field(..., description="هزینه کل (ریال)")
+    average_unit_price: Optional[float] = Field(None, description="میانگین قیمت واحد (ریال)")
+    min_unit_price: Optional[int] = Field(None, description="کمترین قیمت واحد (ریال)")
+    max_unit_price: Optional[int] = Field(None, description="بیشترین قیمت واحد (ریال)")
+
+
+class PartUsageOut(BaseModel):
+    """
+    Schema for a part's consumption across the fleet.
+    """
+    part_key: str = Field(..., description="نام نرمال‌شده قطعه")
+    part_name: str = Field(..., description="نام قطعه")
+    quantity: int = Field(..., description="تعداد مصرف")
+    services_count: int = Field(..., description="تعداد سرویس‌ها")
+    total_spent: int = Field(..., description="هزینه کل (ریال)")
+    average_unit_price: Optional[float] = Field(None, description="میانگین قیمت واحد (ریال)")
+    series: List[PartUsagePoint] = Field(default=[], description="سری ماهانه")
+
+
+class FuelLogCreate(BaseModel):
+    """
+    Schema for creating a new fuel log.
+    """
+    vehicle_id: str = Field(..., description="شناسه خودرو")
+    fill_date: date = Field(..., description="تاریخ سوخت‌گیری")
+    mileage: int = Field(..., description="کیلومتر هنگام سوخت‌گیری")
+    fuel_amount: float = Field(..., description="مقدار سوخت (لیتر)")
+    fuel_price_per_liter: int = Field(..., description="قیمت هر لیتر (ریال)")
+    cost: Optional[int] = Field(None, description="هزینه کل (ریال)")
+    fuel_type: str = Field(default="gasoline", description="نوع سوخت")
+    is_full_tank: bool = Field(default=True, description="باک پر")
+    
+    @validator('fuel_amount')
+    def validate_fuel_amount(cls, v):
+        if v <= 0:
+            raise ValueError("مقدار سوخت باید بیشتر از صفر باشد.")
+        return v
+    
+    @validator('fuel_price_per_liter')
+    def validate_fuel_price_per_liter(cls, v):
+        if v <= 0:
+            raise ValueError("قیمت سوخت باید بیشتر از صفر باشد.")
+        return v
+
+
+class FuelLogOut(BaseModel):
+    """
+    Schema for a fuel log with its computed efficiency.
+    """
+    id: str = Field(..., description="شناسه سوخت‌گیری")
+    vehicle_id: str = Field(..., description="شناسه خودرو")
+    fill_date: str = Field(..., description="تاریخ سوخت‌گیری (شمسی)")
+    mileage: int = Field(..., description="کیلومتر هنگام سوخت‌گیری")
+    fuel_amount: float = Field(..., description="مقدار سوخت (لیتر)")
+    cost: int = Field(..., description="هزینه کل (ریال)")
+    is_full_tank: bool = Field(..., description="باک پر")
+    efficiency: Optional[float] = Field(None, description="مصرف (لیتر در ۱۰۰ کیلومتر)")
+    rolling_efficiency: Optional[float] = Field(None, description="میانگین مصرف اخیر (لیتر در ۱۰۰ کیلومتر)")
+    cost_per_km: Optional[float] = Field(None, description="هزینه سوخت به ازای هر کیلومتر")
+
+
+class FuelStatsOut(BaseModel):
+    """
+    Schema for fuel statistics of a vehicle.
+    """
+    vehicle_id: str = Field(..., description="شناسه خودرو")
+    fills_count: int = Field(..., description="تعداد سوخت‌گیری‌ها")
+    total_fuel: float = Field(..., description="سوخت کل (لیتر)")
+    total_cost: int = Field(..., description="هزینه کل (ریال)")
+    total_distance: int = Field(..., description="مسافت کل")
+    last_efficiency: Optional[float] = Field(None, description="مصرف آخرین بخش (لیتر در ۱۰۰ کیلومتر)")
+    average_efficiency: Optional[float] = Field(None, description="میانگین مصرف (لیتر در ۱۰۰ کیلومتر)")
+    rolling_efficiency: Optional[float] = Field(None, description="میانگین مصرف اخیر (لیتر در ۱۰۰ کیلومتر)")
+    cost_per_km: Optional[float] = Field(None, description="هزینه سوخت به ازای هر کیلومتر")
@@ -0,0 +1,262 @@
+"""
+Parts usage analytics for FastAPI MashinMan project.
+
+The parts embedded in service history are unwound with an aggregation
+pipeline and rolled up into one PartUsageMonthly document per user, part
+and Jalali month. Each run only recomputes the months touched since the
+previous run: months records were written into are found through
+ServiceHistory.updated_at, months records left are queued as
+PartUsageDirtyMonth by the history write paths. Archived records of a
+month are read back from their bundles, so recomputing a month never
+drops the parts of records that were moved to the archive.
+"""
+
+import logging
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from pymongo import DeleteMany, UpdateOne
+
+from .models import ServiceHistory, PartUsageMonthly, PartUsageDirtyMonth, AnalyticsCheckpoint
+from archive.archiver import load_archived_records
+from core.config import get_settings
+from core.jobs import PeriodicJob
+from core.jalali import jalali_month_range, jalali_now, jalali_year_month, get_jalali_month_name
+from core.persian import normalize_persian
+
+logger = logging.getLogger('mashinman')
+_settings = get_settings()
+
+CHECKPOINT_NAME = 'parts_usage'
+
+# (user_id, jalali year, jalali month)
+PartsMonthKey = Tuple[str, int, int]
+
+
+def parts_month_key(history: ServiceHistory) -> PartsMonthKey:
+    """Get the parts usage month a history record contributes to."""
+    year, month = jalali_year_month(history.actual_date)
+    return history.user_id, year, month
+
+
+async def mark_months_dirty(keys: Iterable[PartsMonthKey]) -> None:
+    """Queue months for recomputation on the next run."""
+    operations = [
+        UpdateOne(
+            {"user_id": user_id, "year": year, "month": month},
+            {"$set": {"user_id": user_id, "year": year, "month": month}},
+            upsert=True,
+        )
+        for user_id, year, month in set(keys)
+    ]
+    if operations:
+        await PartUsageDirtyMonth.get_motor_collection().bulk_write(operations, ordered=False)
+
+
+def _merge_part(merged: Dict[str, Dict], name: str, quantity: int, total_spent: int,
+                min_unit_price: Optional[int], max_unit_price: Optional[int],
+                services: Iterable, vehicles: Iterable) -> None:
+    # Spellings that only differ in Arabic/Persian characters, digits or ZWNJ are the same part
+    part_key = normalize_persian(name or "")
+    if not part_key:
+        return
+    part = merged.setdefault(part_key, {
+        "names": Counter(), "quantity": 0, "total_spent": 0,
+        "min_unit_price": None, "max_unit_price": None,
+        "services": set(), "vehicles": set(),
+    })
+    part["names"][name] += quantity
+    part["quantity"] += quantity
+    part["total_spent"] += total_spent
+    if min_unit_price is not None:
+        part["min_unit_price"] = min_unit_price if part["min_unit_price"] is None else min(part["min_unit_price"], min_unit_price)
+        part["max_unit_price"] = max_unit_price if part["max_unit_price"] is None else max(part["max_unit_price"], max_unit_price)
+    part["services"].update(services)
+    part["vehicles"].update(vehicles)
+
+
+async def refresh_parts_month(user_id: str, year: int, month: int) -> int:
+    """
+    Recompute part usage of one user's fleet for one Jalali month.
+
+    Args:
+        user_id (str): User ID
+        year (int): Jalali year
+        month (int): Jalali month
+
+    Returns:
+        int: Number of distinct parts in the month
+    """
+    key = {"user_id": user_id, "year": year, "month": month}
+    archived = await load_archived_records('service_histories', key)
+
+    start, end = jalali_month_range(year, month)
+    pipeline = [
+        # Records of an interrupted archive run are in both places, their bundle copy is counted
+        {"$match": {
+            "user_id": user_id,
+            "actual_date": {"$gte": start, "$lt": end},
+            "_id": {"$nin": [record["_id"] for record in archived]},
+        }},
+        {"$unwind": "$parts"},
+        {"$group": {
+            "_id": "$parts.name",
+            "quantity": {"$sum": "$parts.quantity"},
+            "total_spent": {"$sum": "$parts.total_price"},
+            "min_unit_price": {"$min": "$parts.unit_price"},
+            "max_unit_price": {"$max": "$parts.unit_price"},
+            "services": {"$addToSet": "$_id"},
+            "vehicles": {"$addToSet": "$vehicle_id"},
+        }},
+    ]
+
+    merged: Dict[str, Dict] = {}
+    async for row in ServiceHistory.aggregate(pipeline):
+        _merge_part(
+            merged, row["_id"], row["quantity"], row["total_spent"],
+            row["min_unit_price"], row["max_unit_price"], row["services"], row["vehicles"],
+        )
+    for record in archived:
+        for item in record.get("parts", []):
+            _merge_part(
+                merged, item["name"], item["quantity"], item["total_price"],
+                item["unit_price"], item["unit_price"], [record["_id"]], [record["vehicle_id"]],
+            )
+
+    now = datetime.utcnow()
+    operations = [
+        UpdateOne(
+            {**key, "part_key": part_key},
+            {"$set": {
+                # Most used spelling is shown
+                "part_name": part["names"].most_common(1)[0][0],
+                "quantity": part["quantity"],
+                "services_count": len(part["services"]),
+                "vehicles_count": len(part["vehicles"]),
+                "total_spent": part["total_spent"],
+                "average_unit_price": round(part["total_spent"] / part["quantity"], 2) if part["quantity"] else None,
+                "min_unit_price": part["min_unit_price"],
+                "max_unit_price": part["max_unit_price"],
+                "updated_at": now,
+            }},
+            upsert=True,
+        )
+        for part_key, part in merged.items()
+    ]
+    # Parts that no longer appear in the month
+    operations.append(DeleteMany({**key, "part_key": {"$nin": list(merged)}}))
+
+    await PartUsageMonthly.get_motor_collection().bulk_write(operations, ordered=False)
+    return len(merged)
+
+
+async def _touched_months(since: Optional[datetime]) -> Set[PartsMonthKey]:
+    query = {"updated_at": {"$gt": since}} if since else {}
+    cursor = ServiceHistory.get_motor_collection().find(
+        query, projection={"user_id": 1, "actual_date": 1, "_id": 0}
+    )
+    keys: Set[PartsMonthKey] = set()
+    async for record in cursor:
+        year, month = jalali_year_month(record["actual_date"])
+        keys.add((record["user_id"], year, month))
+    return keys
+
+
+async def run_parts_usage(full: bool = False) -> Dict[str, int]:
+    """
+    Recompute part usage for every month touched since the previous run.
+
+    Args:
+        full (bool): Recompute every month regardless of the checkpoint
+
+    Returns:
+        Dict[str, int]: Number of months refreshed
+    """
+    started_at = datetime.utcnow()
+    checkpoint = await AnalyticsCheckpoint.find_one(AnalyticsCheckpoint.name == CHECKPOINT_NAME)
+    since = None if full or checkpoint is None else checkpoint.last_run_at
+
+    months = await _touched_months(since)
+    dirty = await PartUsageDirtyMonth.find_all().to_list()
+    months.update((item.user_id, item.year, item.month) for item in dirty)
+    # Dequeue before refreshing so months queued during the run are kept for the next one
+    if dirty:
+        await PartUsageDirtyMonth.get_motor_collection().delete_many({"_id": {"$in": [item.id for item in dirty]}})
+
+    for user_id, year, month in sorted(months):
+        await refresh_parts_month(user_id, year, month)
+    await AnalyticsCheckpoint.get_motor_collection().update_one(
+        {"name": CHECKPOINT_NAME}, {"$set": {"last_run_at": started_at}}, upsert=True
+    )
+
+    logger.info("Refreshed part usage for %d months", len(months))
+    return {"months": len(months)}
+
+
+async def get_parts_usage(user_id: str, part: Optional[str] = None, months: int = 12, limit: int = 20) -> List[Dict]:
+    """
+    Get consumption and price series of the parts a user's fleet used.
+
+    Args:
+        user_id (str): User ID
+        part (str): Restrict to parts whose normalized name contains this text
+        months (int): Number of Jalali months in each series, ending with the current one
+        limit (int): Maximum number of parts, most consumed first
+
+    Returns:
+        List[Dict]: Fields of PartUsageOut
+    """
+    today = jalali_now()
+    periods = []
+    year, month = today.year, today.month
+    for _ in range(months):
+        periods.append((year, month))
+        year, month = (year - 1, 12) if month == 1 else (year, month - 1)
+    periods.reverse()
+    first_year, first_month = periods[0]
+
+    query = {
+        "user_id": user_id,
+        "$or": [{"year": {"$gt": first_year}}, {"year": first_year, "month": {"$gte": first_month}}],
+    }
+    rows = await PartUsageMonthly.get_motor_collection().find(query).to_list(length=None)
+
+    needle = normalize_persian(part) if part else None
+    parts: Dict[str, Dict] = {}
+    for row in rows:
+        if needle and needle not in row["part_key"]:
+            continue
+        item = parts.setdefault(row["part_key"], {
+            "part_key": row["part_key"], "part_name": row["part_name"],
+            "quantity": 0, "services_count": 0, "total_spent": 0, "months": {},
+        })
+        item["quantity"] += row["quantity"]
+        item["services_count"] += row["services_count"]
+        item["total_spent"] += row["total_spent"]
+        item["months"][(row["year"], row["month"])] = row
+
+    result = []
+    for item in sorted(parts.values(), key=lambda value: value["quantity"], reverse=True)[:limit]:
+        series = []
+        for year, month in periods:
+            row = item["months"].get((year, month), {})
+            series.append({
+                "year": year,
+                "month": month,
+                "month_name": get_jalali_month_name(month),
+                "quantity": row.get("quantity", 0),
+                "total_spent": row.get("total_spent", 0),
+                "average_unit_price": row.get("average_unit_price"),
+                "min_unit_price": row.get("min_unit_price"),
+                "max_unit_price": row.get("max_unit_price"),
+            })
+        item.pop("months")
+        item["average_unit_price"] = round(item["total_spent"] / item["quantity"], 2) if item["quantity"] else None
+        item["series"] = series
+        result.append(item)
+    return result
+
+
+# Global parts usage job instance
+parts_usage_job = PeriodicJob("Parts usage job", run_parts_usage, _settings.PARTS_USAGE_INTERVAL_MINUTES * 60)
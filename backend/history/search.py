@@ -0,0 +1,202 @@
+"""
+Service history search for FastAPI MashinMan project.
+
+A MongoDB text index has no Persian analyzer, so each user's history is
+indexed in process instead: text fields are normalized and tokenized with
+core.persian, and an inverted index maps every token to the records that
+contain it. Indexes are kept in a small LRU cache and rebuilt only when the
+user's history changes. Only the hot collection is indexed; records moved
+to the archive are not searchable.
+"""
+
+import asyncio
+import heapq
+import logging
+import math
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .models import ServiceHistory
+from core.config import get_settings
+from core.persian import tokenize_persian
+
+logger = logging.getLogger('mashinman')
+_settings = get_settings()
+
+# (field, weight) pairs; a match in the service name counts more than one in the description
+SEARCH_FIELDS = [
+    ('service_name', 3.0),
+    ('parts', 2.0),
+    ('service_center_name', 1.5),
+    ('technician_name', 1.5),
+    ('service_description', 1.0),
+]
+
+_PROJECTION = {
+    'vehicle_id': 1, 'service_name': 1, 'service_type': 1, 'actual_date': 1, 'total_cost': 1,
+    **{field: 1 for field, _ in SEARCH_FIELDS},
+}
+
+# Sorts after every character that can appear in a token
+_PREFIX_END = '\U0010ffff'
+
+
+class SearchDocument(NamedTuple):
+    id: str
+    vehicle_id: str
+    service_name: str
+    service_type: str
+    actual_date: date
+    total_cost: int
+
+
+def _field_texts(record: Dict, field: str) -> List[str]:
+    if field == 'parts':
+        return [part.get('name') or '' for part in record.get('parts') or []]
+    return [record.get(field) or '']
+
+
+class HistorySearchIndex:
+    """
+    Immutable inverted index over one user's service history.
+    """
+
+    def __init__(self, records: List[Dict]):
+        self.documents: List[SearchDocument] = []
+        # token -> {document position: weighted term frequency}
+        self._postings: Dict[str, Dict[int, float]] = {}
+
+        for position, record in enumerate(records):
+            self.documents.append(SearchDocument(
+                id=str(record['_id']),
+                vehicle_id=record.get('vehicle_id'),
+                service_name=record.get('service_name') or '',
+                service_type=record.get('service_type') or '',
+                actual_date=record.get('actual_date'),
+                total_cost=record.get('total_cost') or 0,
+            ))
+            for field, weight in SEARCH_FIELDS:
+                for text in _field_texts(record, field):
+                    for token in tokenize_persian(text):
+                        postings = self._postings.setdefault(token, {})
+                        postings[position] = postings.get(position, 0.0) + weight
+
+        self._vocabulary = sorted(self._postings)
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def _idf(self, token: str) -> float:
+        return math.log(1 + len(self.documents) / len(self._postings[token]))
+
+    def _expand_prefix(self, prefix: str) -> List[str]:
+        start = bisect_left(self._vocabulary, prefix)
+        end = bisect_left(self._vocabulary, prefix + _PREFIX_END, lo=start)
+        return self._vocabulary[start:end]
+
+    def search(self, query: str, vehicle_id: Optional[str] = None, limit: int = 20) -> List[Tuple[SearchDocument, float]]:
+        """
+        Rank records matching every query token.
+
+        The last token is matched as a prefix so results appear while typing.
+
+        Args:
+            query (str): User-typed query
+            vehicle_id (str): Restrict results to one vehicle
+            limit (int): Maximum number of results
+
+        Returns:
+            List[Tuple[SearchDocument, float]]: Records and scores, best first
+        """
+        tokens = tokenize_persian(query)
+        if not tokens:
+            return []
+
+        scores: Optional[Dict[int, float]] = None
+        for index, token in enumerate(tokens):
+            if index == len(tokens) - 1:
+                expansions = self._expand_prefix(token)
+            else:
+                expansions = [token] if token in self._postings else []
+
+            token_scores: Dict[int, float] = {}
+            for expansion in expansions:
+                idf = self._idf(expansion)
+                for position, frequency in self._postings[expansion].items():
+                    score = idf * frequency
+                    if score > token_scores.get(position, 0.0):
+                        token_scores[position] = score
+
+            # Every token must match
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {position: scores[position] + score for position, score in token_scores.items() if position in scores}
+            if not scores:
+                return []
+
+        if vehicle_id is not None:
+            scores = {position: score for position, score in scores.items() if self.documents[position].vehicle_id == vehicle_id}
+
+        # Ties go to the most recent record
+        best = heapq.nlargest(
+            limit, scores.items(),
+            key=lambda item: (item[1], self.documents[item[0]].actual_date or date.min)
+        )
+        return [(self.documents[position], round(score, 4)) for position, score in best]
+
+
+class HistorySearch:
+    """
+    LRU cache of per-user search indexes.
+    """
+
+    def __init__(self, cache_size: int):
+        self.cache_size = cache_size
+        self._indexes: 'OrderedDict[str, Tuple[Tuple, HistorySearchIndex]]' = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def _fingerprint(self, user_id: str) -> Tuple:
+        # Both reads are served by the (user_id, updated_at) index
+        collection = ServiceHistory.get_motor_collection()
+        count = await collection.count_documents({"user_id": user_id})
+        latest = await collection.find_one(
+            {"user_id": user_id}, projection={"updated_at": 1}, sort=[("updated_at", -1)]
+        )
+        return (count, latest["updated_at"] if latest else None)
+
+    async def get_index(self, user_id: str) -> HistorySearchIndex:
+        """Get the user's index, rebuilding it if the history changed since it was built."""
+        lock = self._locks.setdefault(user_id, asyncio.Lock())
+        async with lock:
+            fingerprint = await self._fingerprint(user_id)
+            cached = self._indexes.get(user_id)
+            if cached is not None and cached[0] == fingerprint:
+                self._indexes.move_to_end(user_id)
+                return cached[1]
+
+            records = await ServiceHistory.get_motor_collection().find(
+                {"user_id": user_id}, projection=_PROJECTION
+            ).to_list(length=None)
+            index = HistorySearchIndex(records)
+            self._indexes[user_id] = (fingerprint, index)
+            self._indexes.move_to_end(user_id)
+            while len(self._indexes) > self.cache_size:
+                evicted, _ = self._indexes.popitem(last=False)
+                self._locks.pop(evicted, None)
+            logger.debug("Built history search index for user %s with %d records", user_id, len(index))
+            return index
+
+    def invalidate(self, user_id: str) -> None:
+        """Drop a user's index after their history was written in this process."""
+        self._indexes.pop(user_id, None)
+
+    async def search(self, user_id: str, query: str, vehicle_id: Optional[str] = None, limit: int = 20) -> List[Tuple[SearchDocument, float]]:
+        index = await self.get_index(user_id)
+        return index.search(query, vehicle_id=vehicle_id, limit=limit)
+
+
+# Global search instance
+history_search = HistorySearch(_settings.HISTORY_SEARCH_CACHE_SIZE)
@@ -1,3 +1,272 @@
-from django.test import TestCase
+"""
+Tests for the history app.
+"""
 
-# Create your tests here.
+import math
+from datetime import date
+
+import numpy as np
+import pytest
+
+from history import search as history_search_module
+from history.analytics import _fold_records
+from history.fuel import aggregate_fills, compute_segments, fold_fill
+from history.search import HistorySearch, HistorySearchIndex
+
+WINDOW = 3
+
+
+def _arrays(fills):
+    mileage = np.array([fill[0] for fill in fills], dtype=np.int64)
+    fuel = np.array([fill[1] for fill in fills], dtype=float)
+    cost = np.array([int(fill[1] * 150000) for fill in fills], dtype=np.int64)
+    full = np.array([fill[2] for fill in fills], dtype=bool)
+    return mileage, fuel, cost, full
+
+
+def _assert_fold_matches_aggregate(fills):
+    # Folding fill-ups one by one must agree with the vectorized rebuild after every step
+    totals = aggregate_fills(*_arrays([]), WINDOW)
+    for count, (mileage, fuel_amount, is_full_tank) in enumerate(fills, start=1):
+        fold_fill(totals, mileage, fuel_amount, int(fuel_amount * 150000), is_full_tank, WINDOW)
+        expected = aggregate_fills(*_arrays(fills[:count]), WINDOW)
+
+        segments, expected_segments = totals.pop('recent_segments'), expected.pop('recent_segments')
+        assert totals == pytest.approx(expected)
+        assert len(segments) == len(expected_segments)
+        for segment, expected_segment in zip(segments, expected_segments):
+            assert segment == pytest.approx(expected_segment)
+        totals['recent_segments'] = segments
+
+
+def test_compute_segments_between_full_tanks():
+    segments = compute_segments(*_arrays([
+        (10000, 40, True),
+        (10300, 20, False),
+        (10500, 15, True),
+        (11000, 45, True),
+    ]), window=1)
+
+    assert segments['end'].tolist() == [2, 3]
+    assert segments['fuel'].tolist() == [35, 45]
+    assert segments['distance'].tolist() == [500, 500]
+    assert segments['efficiency'].tolist() == pytest.approx([7.0, 9.0])
+    assert segments['rolling_efficiency'].tolist() == pytest.approx([7.0, 9.0])
+    assert segments['cost_per_km'].tolist() == pytest.approx([10500, 13500])
+
+
+def test_compute_segments_needs_two_full_tanks():
+    segments = compute_segments(*_arrays([(10000, 40, True), (10300, 20, False)]), window=WINDOW)
+
+    assert all(len(values) == 0 for values in segments.values())
+
+
+def test_aggregate_fills_totals():
+    totals = aggregate_fills(*_arrays([(10000, 40, True), (10500, 35, True), (11000, 45, True), (11200, 10, False)]), window=1)
+
+    assert totals['fills_count'] == 4
+    assert totals['last_mileage'] == 11200
+    assert totals['last_full_mileage'] == 11000
+    assert totals['pending_fuel'] == 10
+    assert totals['total_distance'] == 1000
+    assert totals['total_fuel'] == 80
+    assert totals['last_efficiency'] == 9.0
+    assert totals['average_efficiency'] == 8.0
+    assert totals['rolling_efficiency'] == 9.0
+
+
+def test_aggregate_fills_without_full_tank():
+    totals = aggregate_fills(*_arrays([(10000, 20, False), (10300, 25, False)]), window=WINDOW)
+
+    assert totals['last_full_mileage'] is None
+    assert totals['pending_fuel'] == 0
+    assert totals['average_efficiency'] is None
+    assert totals['recent_segments'] == []
+
+
+def test_fold_fill_matches_aggregate_for_full_tanks():
+    _assert_fold_matches_aggregate([
+        (10000, 40, True),
+        (10500, 35.5, True),
+        (11000, 38, True),
+        (11600, 42.25, True),
+        (12100, 33, True),
+    ])
+
+
+def test_fold_fill_matches_aggregate_with_partial_fills():
+    _assert_fold_matches_aggregate([
+        (20000, 10, False),
+        (20200, 40, True),
+        (20500, 15, False),
+        (20700, 12.5, False),
+        (21000, 20, True),
+        (21300, 18, False),
+    ])
+
+
+def test_fold_fill_matches_aggregate_with_repeated_mileage():
+    _assert_fold_matches_aggregate([
+        (30000, 40, True),
+        (30000, 5, True),
+        (30400, 10, False),
+        (30400, 20, True),
+        (30900, 30, True),
+    ])
+
+
+def test_fold_records_adds_archived_records_to_hot_totals():
+    totals = {
+        "user_id": "u1", "total_expenses": 500, "parts_expenses": 300, "labor_expenses": 200,
+        "services_count": 1, "start_mileage": 12000, "end_mileage": 12000,
+    }
+    breakdown = {"oil_change": 500}
+    _fold_records(totals, breakdown, [
+        {"user_id": "u1", "service_type": "oil_change", "total_cost": 400, "parts_cost": 250,
+         "labor_cost": 150, "actual_mileage": 10000},
+        {"user_id": "u1", "service_type": "brakes", "total_cost": 900, "parts_cost": 600,
+         "labor_cost": 300, "actual_mileage": 15000},
+    ])
+
+    assert totals == {
+        "user_id": "u1", "total_expenses": 1800, "parts_expenses": 1150, "labor_expenses": 650,
+        "services_count": 3, "start_mileage": 10000, "end_mileage": 15000,
+    }
+    assert breakdown == {"oil_change": 900, "brakes": 900}
+
+
+def test_fold_records_builds_totals_of_an_archived_only_month():
+    totals, breakdown = {}, {}
+    _fold_records(totals, breakdown, [
+        {"user_id": "u1", "service_type": "inspection", "total_cost": 100, "parts_cost": 0,
+         "labor_cost": 100, "actual_mileage": None},
+    ])
+
+    assert totals["services_count"] == 1
+    assert totals["user_id"] == "u1"
+    assert "start_mileage" not in totals
+    assert breakdown == {"inspection": 100}
+
+
+def _record(record_id, service_name, actual_date, vehicle_id='v1', **fields):
+    return {
+        '_id': record_id, 'vehicle_id': vehicle_id, 'service_name': service_name,
+        'service_type': 'repair', 'actual_date': actual_date, 'total_cost': 1000, **fields,
+    }
+
+
+def _search_index():
+    return HistorySearchIndex([
+        _record('r1', 'تعویض روغن موتور', date(2024, 1, 10)),
+        _record('r2', 'تعویض لنت ترمز', date(2024, 2, 10), parts=[{'name': 'لنت جلو'}]),
+        _record('r3', 'سرویس دوره‌ای', date(2024, 3, 10), vehicle_id='v2', service_description='تعویض روغن'),
+    ])
+
+
+def test_search_scores_rare_tokens_higher():
+    results = dict((document.id, score) for document, score in _search_index().search('ترمز'))
+
+    # One of three records has the token, matched in the service name
+    assert results == {'r2': round(3.0 * math.log(1 + 3 / 1), 4)}
+    assert _search_index().search('تعویض')[0][1] == round(3.0 * math.log(1 + 3 / 3), 4)
+
+
+def test_search_weights_fields():
+    results = _search_index().search('روغن')
+
+    assert [document.id for document, _ in results] == ['r1', 'r3']
+    assert results[0][1] == round(3.0 * math.log(1 + 3 / 2), 4)
+    assert results[1][1] == round(1.0 * math.log(1 + 3 / 2), 4)
+
+
+def test_search_requires_every_token_and_expands_the_last_one():
+    index = _search_index()
+
+    assert [document.id for document, _ in index.search('تعویض لن')] == ['r2']
+    assert index.search('لن تعویض') == []
+    assert index.search('ترمز روغن') == []
+
+
+def test_search_filters_by_vehicle_and_breaks_ties_by_date():
+    index = _search_index()
+
+    assert [document.id for document, _ in index.search('تعویض', vehicle_id='v1')] == ['r2', 'r1']
+    assert [document.id for document, _ in index.search('تعویض', limit=1)] == ['r2']
+    assert [document.id for document, _ in index.search('تعویض', vehicle_id='v2')] == ['r3']
+
+
+class _Cursor:
+    def __init__(self, records):
+        self.records = records
+
+    async def to_list(self, length=None):
+        return self.records
+
+
+class _Collection:
+    def __init__(self, records):
+        self.records = records
+        self.loads = 0
+
+    def find(self, query, projection=None):
+        self.loads += 1
+        return _Cursor([record for record in self.records if record['user_id'] == query['user_id']])
+
+
+@pytest.fixture
+def history_collection(monkeypatch):
+    collection = _Collection([
+        {**_record('r1', 'تعویض روغن', date(2024, 1, 10)), 'user_id': 'u1'},
+        {**_record('r2', 'تعویض لنت', date(2024, 2, 10)), 'user_id': 'u2'},
+        {**_record('r3', 'تعویض فیلتر', date(2024, 3, 10)), 'user_id': 'u3'},
+    ])
+    fingerprints = {'u1': (1, None), 'u2': (1, None), 'u3': (1, None)}
+
+    async def fingerprint(self, user_id):
+        return fingerprints[user_id]
+
+    monkeypatch.setattr(history_search_module.ServiceHistory, 'get_motor_collection', lambda: collection)
+    monkeypatch.setattr(HistorySearch, '_fingerprint', fingerprint)
+    return collection, fingerprints
+
+
+@pytest.mark.asyncio
+async def test_history_search_reuses_index_until_history_changes(history_collection):
+    collection, fingerprints = history_collection
+    search = HistorySearch(cache_size=2)
+
+    first = await search.get_index('u1')
+    assert await search.get_index('u1') is first
+    assert collection.loads == 1
+
+    fingerprints['u1'] = (2, None)
+    assert await search.get_index('u1') is not first
+    assert collection.loads == 2
+
+
+@pytest.mark.asyncio
+async def test_history_search_invalidate_drops_the_index(history_collection):
+    collection, _ = history_collection
+    search = HistorySearch(cache_size=2)
+
+    first = await search.get_index('u1')
+    search.invalidate('u1')
+    search.invalidate('unknown')
+
+    assert await search.get_index('u1') is not first
+    assert collection.loads == 2
+
+
+@pytest.mark.asyncio
+async def test_history_search_evicts_least_recently_used(history_collection):
+    collection, _ = history_collection
+    search = HistorySearch(cache_size=2)
+
+    await search.get_index('u1')
+    await search.get_index('u2')
+    await search.get_index('u1')
+    await search.get_index('u3')
+
+    assert list(search._indexes) == ['u1', 'u3']
+    await search.get_index('u1')
+    assert collection.loads == 3
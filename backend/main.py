@@ -14,6 +14,19 @@ from history.api import router as history_router
 from pricing.api import router as pricing_router
 from emergency.api import router as emergency_router
 from admin.api import router as admin_router
+from catalog.api import router as catalog_router
+from telemetry.api import router as telemetry_router
+from pricing.alerts import price_alert_engine
+from vehicles.valuation import vehicle_valuation_job
+from catalog.autocomplete import catalog_autocomplete
+from history.export import shutdown_process_pool
+from history.parts import parts_usage_job
+from archive.archiver import archive_job
+from services.due_dates import due_date_job
+from services.reminders import reminder_dispatcher
+from vehicles.garage import garage_summary_job
+from telemetry.buffer import telemetry_buffer
+from admin.vehicle_search import vehicle_facet_cache
 
 # Get settings
 settings = get_settings()
@@ -52,6 +65,8 @@ app.include_router(history_router)
 app.include_router(pricing_router)
 app.include_router(emergency_router)
 app.include_router(admin_router)
+app.include_router(catalog_router)
+app.include_router(telemetry_router)
 
 # Root endpoint
 @app.get("/")
@@ -67,10 +82,32 @@ async def health_check():
 async def startup_event():
     """Initialize database connection on startup"""
     db.connect()
+    await price_alert_engine.load()
+    price_alert_engine.outbox.start()
+    vehicle_valuation_job.start()
+    catalog_autocomplete.start()
+    parts_usage_job.start()
+    archive_job.start()
+    due_date_job.start()
+    reminder_dispatcher.start()
+    garage_summary_job.start()
+    telemetry_buffer.start()
+    vehicle_facet_cache.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Close database connection on shutdown"""
+    await price_alert_engine.outbox.stop()
+    await vehicle_valuation_job.stop()
+    await catalog_autocomplete.stop()
+    await parts_usage_job.stop()
+    await archive_job.stop()
+    await due_date_job.stop()
+    await reminder_dispatcher.stop()
+    await garage_summary_job.stop()
+    await telemetry_buffer.stop()
+    await vehicle_facet_cache.stop()
+    shutdown_process_pool()
     db.close()
 
 if __name__ == "__main__":
@@ -0,0 +1,294 @@
+"""
+Price alert matching engine for FastAPI MashinMan project.
+
+Active alerts are kept in memory, grouped per (brand, model, year) into
+sorted threshold lists. A price write only has to bisect into those lists
+to find the alerts whose threshold lies between the previous and the new
+price, instead of scanning every alert in the collection.
+"""
+
+import asyncio
+import logging
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from datetime import datetime, date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from beanie import PydanticObjectId
+from beanie.operators import In
+
+from .models import CarPricing, PriceAlert, PriceAlertNotification
+from core.config import get_settings
+from core.jobs import PeriodicJob
+
+logger = logging.getLogger('mashinman')
+_settings = get_settings()
+
+CarKey = Tuple[str, str, int]
+
+
+def _as_date(value) -> Optional[date]:
+    """Normalize a stored price date (BSON returns datetimes) to a date."""
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+class ThresholdBook:
+    """
+    Alert thresholds for one car and one direction, kept sorted by price.
+    """
+
+    def __init__(self):
+        self.thresholds: List[int] = []
+        self.alert_ids: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.thresholds)
+
+    def add(self, threshold: int, alert_id: str) -> None:
+        index = bisect_right(self.thresholds, threshold)
+        self.thresholds.insert(index, threshold)
+        self.alert_ids.insert(index, alert_id)
+
+    def remove(self, threshold: int, alert_id: str) -> None:
+        lo = bisect_left(self.thresholds, threshold)
+        hi = bisect_right(self.thresholds, threshold)
+        for index in range(lo, hi):
+            if self.alert_ids[index] == alert_id:
+                del self.thresholds[index]
+                del self.alert_ids[index]
+                return
+
+    def slice(self, lo: int, hi: int) -> List[Tuple[int, str]]:
+        return list(zip(self.thresholds[lo:hi], self.alert_ids[lo:hi]))
+
+    def crossed_downwards(self, previous: Optional[int], price: int) -> List[Tuple[int, str]]:
+        """Thresholds t with price <= t < previous (all t >= price if previous is unknown)."""
+        lo = bisect_left(self.thresholds, price)
+        if previous is None:
+            return self.slice(lo, len(self.thresholds))
+        if price >= previous:
+            return []
+        return self.slice(lo, bisect_left(self.thresholds, previous))
+
+    def crossed_upwards(self, previous: Optional[int], price: int) -> List[Tuple[int, str]]:
+        """Thresholds t with previous < t <= price (all t <= price if previous is unknown)."""
+        hi = bisect_right(self.thresholds, price)
+        if previous is None:
+            return self.slice(0, hi)
+        if price <= previous:
+            return []
+        return self.slice(bisect_right(self.thresholds, previous), hi)
+
+
+class PriceAlertIndex:
+    """
+    In-memory index of active price alerts per (brand, model, year).
+    """
+
+    def __init__(self):
+        self._books: Dict[CarKey, Dict[str, ThresholdBook]] = {}
+        self._alerts: Dict[str, Tuple[PriceAlert, List[tuple]]] = {}
+        self._last_prices: Dict[CarKey, Tuple[Optional[date], int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._alerts)
+
+    def add(self, alert: PriceAlert) -> None:
+        alert_id = str(alert.id)
+        self.remove(alert_id)
+        if not alert.is_active:
+            return
+
+        key = (alert.brand, alert.model, alert.year)
+        thresholds = alert.thresholds()
+        books = self._books.setdefault(key, {'below': ThresholdBook(), 'above': ThresholdBook()})
+        for direction, threshold in thresholds:
+            books[direction].add(threshold, alert_id)
+        self._alerts[alert_id] = (alert, thresholds)
+
+    def remove(self, alert_id: str) -> None:
+        entry = self._alerts.pop(alert_id, None)
+        if entry is None:
+            return
+
+        alert, thresholds = entry
+        key = (alert.brand, alert.model, alert.year)
+        books = self._books.get(key)
+        if books is None:
+            return
+        for direction, threshold in thresholds:
+            books[direction].remove(threshold, alert_id)
+        if not books['below'] and not books['above']:
+            del self._books[key]
+
+    def last_price(self, key: CarKey) -> Optional[int]:
+        entry = self._last_prices.get(key)
+        return entry[1] if entry else None
+
+    def observe(self, key: CarKey, price_date: Optional[date], price: int) -> Tuple[bool, Optional[int]]:
+        """
+        Record a price write for a car.
+
+        Returns:
+            Tuple[bool, Optional[int]]: whether the write is the newest price
+            for the car, and the price it replaces
+        """
+        price_date = _as_date(price_date)
+        current = self._last_prices.get(key)
+        if current is not None and current[0] and price_date and price_date < current[0]:
+            return False, current[1]
+        self._last_prices[key] = (price_date, price)
+        return True, current[1] if current else None
+
+    def match(self, key: CarKey, previous: Optional[int], price: int) -> List[Tuple[PriceAlert, str, int]]:
+        """
+        Find alerts whose threshold was crossed by a move from previous to price.
+
+        Returns:
+            List[Tuple[PriceAlert, str, int]]: (alert, direction, threshold) triples
+        """
+        books = self._books.get(key)
+        if not books:
+            return []
+
+        matches = []
+        for threshold, alert_id in books['below'].crossed_downwards(previous, price):
+            matches.append((self._alerts[alert_id][0], 'below', threshold))
+        for threshold, alert_id in books['above'].crossed_upwards(previous, price):
+            matches.append((self._alerts[alert_id][0], 'above', threshold))
+        return matches
+
+
+class NotificationOutbox:
+    """
+    Buffers triggered alert notifications and writes them in batches.
+    """
+
+    def __init__(self, batch_size: int, flush_seconds: float):
+        self.batch_size = batch_size
+        self._pending: List[PriceAlertNotification] = []
+        self._lock = asyncio.Lock()
+        self._job = PeriodicJob("Price alert outbox flush", self.flush, flush_seconds)
+
+    def add(self, notification: PriceAlertNotification) -> None:
+        self._pending.append(notification)
+
+    async def maybe_flush(self) -> None:
+        if len(self._pending) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self) -> int:
+        """Write all pending notifications and bump the trigger counters of their alerts."""
+        async with self._lock:
+            batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+
+            try:
+                await PriceAlertNotification.insert_many(batch)
+            except Exception:
+                logger.exception("Failed to flush price alert outbox, retrying on next flush")
+                self._pending = batch + self._pending
+                return 0
+
+            # One update per distinct trigger count rather than one per alert
+            now = datetime.utcnow()
+            counts = Counter(notification.alert_id for notification in batch)
+            by_count: Dict[int, List[PydanticObjectId]] = {}
+            for alert_id, count in counts.items():
+                by_count.setdefault(count, []).append(PydanticObjectId(alert_id))
+            for count, alert_ids in by_count.items():
+                await PriceAlert.find(In(PriceAlert.id, alert_ids)).update(
+                    {"$set": {"last_triggered": now}, "$inc": {"trigger_count": count}}
+                )
+
+            return len(batch)
+
+    def start(self) -> None:
+        self._job.start()
+
+    async def stop(self) -> None:
+        await self._job.stop()
+        await self.flush()
+
+
+class PriceAlertEngine:
+    """
+    Evaluates price alerts against incoming car prices.
+    """
+
+    def __init__(self):
+        self.index = PriceAlertIndex()
+        self.outbox = NotificationOutbox(
+            batch_size=_settings.PRICE_ALERT_OUTBOX_BATCH_SIZE,
+            flush_seconds=_settings.PRICE_ALERT_OUTBOX_FLUSH_SECONDS,
+        )
+
+    async def load(self) -> None:
+        """Build the index from active alerts and seed the latest known prices."""
+        async for alert in PriceAlert.find(PriceAlert.is_active == True):
+            self.index.add(alert)
+
+        pipeline = [
+            {"$sort": {"price_date": -1, "updated_at": -1}},
+            {"$group": {
+                "_id": {"brand": "$brand", "model": "$model", "year": "$year"},
+                "price": {"$first": "$price"},
+                "price_date": {"$first": "$price_date"},
+            }},
+        ]
+        async for row in CarPricing.aggregate(pipeline):
+            key = (row["_id"]["brand"], row["_id"]["model"], row["_id"]["year"])
+            self.index.observe(key, row["price_date"], row["price"])
+
+        logger.info("Loaded %d active price alerts", len(self.index))
+
+    def register(self, alert: PriceAlert) -> None:
+        self.index.add(alert)
+
+    def unregister(self, alert_id: str) -> None:
+        self.index.remove(alert_id)
+
+    def latest_price(self, brand: str, model: str, year: int) -> Optional[int]:
+        return self.index.last_price((brand, model, year))
+
+    def _evaluate(self, pricing: CarPricing) -> int:
+        key = (pricing.brand, pricing.model, pricing.year)
+        is_current, previous = self.index.observe(key, pricing.price_date, pricing.price)
+        if not is_current:
+            return 0
+
+        matches = self.index.match(key, previous, pricing.price)
+        for alert, direction, threshold in matches:
+            self.outbox.add(PriceAlertNotification(
+                alert_id=str(alert.id),
+                user_id=alert.user_id,
+                brand=alert.brand,
+                model=alert.model,
+                year=alert.year,
+                direction=direction,
+                threshold=threshold,
+                previous_price=previous,
+                price=pricing.price,
+                notification_methods=alert.notification_methods,
+            ))
+        return len(matches)
+
+    async def on_price(self, pricing: CarPricing) -> int:
+        """Evaluate alerts for a single price write. Returns the number of triggered alerts."""
+        triggered = self._evaluate(pricing)
+        await self.outbox.maybe_flush()
+        return triggered
+
+    async def on_prices(self, pricings: Iterable[CarPricing]) -> int:
+        """Evaluate alerts for a batch of price writes in price-date order."""
+        ordered = sorted(pricings, key=lambda p: _as_date(p.price_date) or date.min)
+        triggered = sum(self._evaluate(pricing) for pricing in ordered)
+        await self.outbox.maybe_flush()
+        return triggered
+
+
+# Global price alert engine instance
+price_alert_engine = PriceAlertEngine()
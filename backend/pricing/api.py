@@ -6,7 +6,14 @@ from datetime import datetime
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status
 
-from .models import CarPricing, CarPricingCreate, CarPricingUpdate, CarPricingOut
+from .models import (
+    CarPricing, CarPricingCreate, CarPricingUpdate, CarPricingOut,
+    PriceAlert, PriceAlertCreate, PriceAlertOut,
+    ServiceCostEstimateRequest, ServiceCostEstimateOut
+)
+from .alerts import price_alert_engine
+from .estimator import service_cost_estimator
+from vehicles.models import Vehicle
 from users.models import User
 from users.dependencies import get_current_active_user
 from core.jalali import gregorian_to_jalali
@@ -51,6 +58,9 @@ async def create_pricing_record(
     # Save pricing to database
     await pricing.insert()
     
+    # Evaluate price alerts crossed by this price
+    await price_alert_engine.on_price(pricing)
+    
     # Convert to output model
     pricing_out = CarPricingOut(**pricing.dict())
     
@@ -149,6 +159,134 @@ async def compare_models(
     return pricing_records
 
 
+@router.post("/alerts", response_model=PriceAlertOut, status_code=status.HTTP_201_CREATED)
+async def create_price_alert(
+    alert_data: PriceAlertCreate,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Create a price alert for a car"""
+    if alert_data.alert_type == 'target_price' and not alert_data.target_price:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="target_price is required for target price alerts"
+        )
+    
+    if alert_data.alert_type == 'target_price' and alert_data.direction == 'both':
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Target price alerts must be either 'below' or 'above'"
+        )
+    
+    if alert_data.alert_type == 'percentage_change' and not alert_data.percentage_threshold:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="percentage_threshold is required for percentage change alerts"
+        )
+    
+    # Percentage alerts are relative to the latest known price
+    reference_price = None
+    if alert_data.alert_type == 'percentage_change':
+        reference_price = price_alert_engine.latest_price(
+            alert_data.brand, alert_data.model, alert_data.year
+        )
+        if reference_price is None:
+            latest = await CarPricing.find(
+                CarPricing.brand == alert_data.brand,
+                CarPricing.model == alert_data.model,
+                CarPricing.year == alert_data.year
+            ).sort(-CarPricing.price_date).first_or_none()
+            if not latest:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="No pricing record exists for this brand/model/year"
+                )
+            reference_price = latest.price
+    
+    alert = PriceAlert(
+        user_id=str(current_user.id),
+        reference_price=reference_price,
+        created_at=datetime.utcnow(),
+        updated_at=datetime.utcnow(),
+        **alert_data.dict(),
+    )
+    
+    await alert.insert()
+    price_alert_engine.register(alert)
+    
+    return PriceAlertOut(**alert.dict())
+
+
+@router.get("/alerts", response_model=List[PriceAlertOut])
+async def list_price_alerts(
+    skip: int = 0,
+    limit: int = 100,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get list of price alerts for current user"""
+    alerts = await PriceAlert.find(
+        PriceAlert.user_id == str(current_user.id)
+    ).sort(-PriceAlert.created_at).skip(skip).limit(limit).to_list()
+    
+    return [PriceAlertOut(**alert.dict()) for alert in alerts]
+
+
+@router.delete("/alerts/{alert_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_price_alert(
+    alert_id: str,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Delete a price alert"""
+    alert = await PriceAlert.get(alert_id)
+    if not alert:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Price alert not found"
+        )
+    
+    if alert.user_id != str(current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to delete this price alert"
+        )
+    
+    price_alert_engine.unregister(str(alert.id))
+    await alert.delete()
+    
+    return None
+
+
+@router.post("/services/estimate", response_model=ServiceCostEstimateOut)
+async def estimate_service_costs(
+    estimate_request: ServiceCostEstimateRequest,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Estimate the cost of a maintenance plan for a vehicle"""
+    brand = estimate_request.brand
+    model = estimate_request.model
+    
+    # Resolve brand/model from the vehicle if one is given
+    if estimate_request.vehicle_id:
+        vehicle = await Vehicle.get(estimate_request.vehicle_id)
+        if not vehicle:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Vehicle not found"
+            )
+        
+        if vehicle.user_id != current_user.id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not authorized to access this vehicle"
+            )
+        
+        brand = vehicle.brand
+        model = vehicle.model
+    
+    estimate = await service_cost_estimator.estimate(estimate_request.service_types, brand, model)
+    
+    return ServiceCostEstimateOut(brand=brand, model=model, **estimate)
+
+
 @router.get("/{pricing_id}", response_model=CarPricingOut)
 async def get_pricing_record(
     pricing_id: str,
@@ -199,6 +337,10 @@ async def update_pricing_record(
     # Save updated pricing
     await pricing.save()
     
+    # Re-evaluate price alerts if the price moved
+    if 'price' in update_data or 'price_date' in update_data:
+        await price_alert_engine.on_price(pricing)
+    
     # Convert to output model
     pricing_out = CarPricingOut(**pricing.dict())
     
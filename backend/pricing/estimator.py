@@ -0,0 +1,181 @@
+"""
+Service cost estimator for FastAPI MashinMan project.
+
+Currently valid ServicePricing rows are compiled into a dict keyed by
+(service_type, brand, model) with wildcard levels for rows that apply to
+every brand or model. The table is only recompiled when the pricing
+collection changes or a validity window opens or closes.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, date
+from typing import Dict, List, Optional, Tuple
+
+from .models import ServicePricing
+from core.config import get_settings
+
+logger = logging.getLogger('mashinman')
+_settings = get_settings()
+
+PriceKey = Tuple[str, Optional[str], Optional[str]]
+
+# Lookup order from the most to the least specific match
+MATCH_LEVELS = [
+    ('brand_model', True, True),
+    ('model', False, True),
+    ('brand', True, False),
+    ('default', False, False),
+]
+
+
+def _as_date(value) -> Optional[date]:
+    """Normalize a stored date (BSON returns datetimes) to a date."""
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+class CompiledPriceTable:
+    """
+    Immutable lookup table over the service pricings valid on one day.
+    """
+
+    def __init__(self, pricings: List[ServicePricing], valid_on: date):
+        self.valid_on = valid_on
+        self._table: Dict[PriceKey, ServicePricing] = {}
+        # First day on which the set of valid rows differs from valid_on
+        self.expires_on: Optional[date] = None
+
+        for pricing in pricings:
+            valid_from = _as_date(pricing.valid_from)
+            valid_until = _as_date(pricing.valid_until)
+
+            if valid_from > valid_on:
+                self._track_boundary(valid_from)
+                continue
+            if valid_until is not None and valid_until < valid_on:
+                continue
+            if valid_until is not None:
+                self._track_boundary(date.fromordinal(valid_until.toordinal() + 1))
+
+            brands = pricing.compatible_brands or [None]
+            models = pricing.compatible_models or [None]
+            for brand in brands:
+                for model in models:
+                    self._store((pricing.service_type, brand, model), pricing)
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def _track_boundary(self, boundary: date) -> None:
+        if self.expires_on is None or boundary < self.expires_on:
+            self.expires_on = boundary
+
+    def _store(self, key: PriceKey, pricing: ServicePricing) -> None:
+        # Overlapping rows: the most recently started pricing wins
+        current = self._table.get(key)
+        if current is None or _as_date(pricing.valid_from) >= _as_date(current.valid_from):
+            self._table[key] = pricing
+
+    def lookup(self, service_type: str, brand: Optional[str], model: Optional[str]) -> Tuple[Optional[ServicePricing], Optional[str]]:
+        """
+        Find the most specific pricing for a service on a vehicle.
+
+        Returns:
+            Tuple[Optional[ServicePricing], Optional[str]]: Pricing and the level it matched on
+        """
+        for level, use_brand, use_model in MATCH_LEVELS:
+            key = (service_type, brand if use_brand else None, model if use_model else None)
+            pricing = self._table.get(key)
+            if pricing is not None:
+                return pricing, level
+        return None, None
+
+
+class ServiceCostEstimator:
+    """
+    Estimates service costs from the compiled pricing table.
+    """
+
+    def __init__(self, check_interval_seconds: float):
+        self.check_interval_seconds = check_interval_seconds
+        self.table = CompiledPriceTable([], date.min)
+        self._fingerprint = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def _current_fingerprint(self) -> Tuple:
+        pipeline = [
+            {"$group": {"_id": None, "count": {"$sum": 1}, "updated_at": {"$max": "$updated_at"}}},
+        ]
+        rows = await ServicePricing.aggregate(pipeline).to_list()
+        if not rows:
+            return (0, None)
+        return (rows[0]["count"], rows[0]["updated_at"])
+
+    def _table_is_current(self, today: date) -> bool:
+        if self.table.valid_on == date.min:
+            return False
+        return self.table.expires_on is None or today < self.table.expires_on
+
+    async def ensure_fresh(self) -> CompiledPriceTable:
+        """Recompile the table if pricing rows changed or a validity window rolled over."""
+        today = date.today()
+        if self._table_is_current(today) and time.monotonic() - self._checked_at < self.check_interval_seconds:
+            return self.table
+
+        async with self._lock:
+            fingerprint = await self._current_fingerprint()
+            self._checked_at = time.monotonic()
+            if fingerprint != self._fingerprint or not self._table_is_current(today):
+                pricings = await ServicePricing.find_all().to_list()
+                self.table = CompiledPriceTable(pricings, today)
+                self._fingerprint = fingerprint
+                logger.info("Compiled service price table with %d entries", len(self.table))
+        return self.table
+
+    async def estimate(self, service_types: List[str], brand: Optional[str], model: Optional[str]) -> Dict:
+        """
+        Estimate cost and duration of a list of services for one vehicle.
+
+        Args:
+            service_types (List[str]): Service types in the maintenance plan
+            brand (str): Vehicle brand
+            model (str): Vehicle model
+
+        Returns:
+            Dict: Per-service items, totals and the service types without a price
+        """
+        table = await self.ensure_fresh()
+
+        items = []
+        missing = []
+        total_price = 0
+        total_duration = 0
+        for service_type in service_types:
+            pricing, level = table.lookup(service_type, brand, model)
+            if pricing is None:
+                missing.append(service_type)
+                continue
+            items.append({
+                "service_type": service_type,
+                "service_name": pricing.service_name,
+                "base_price": pricing.base_price,
+                "estimated_duration": pricing.estimated_duration,
+                "matched_on": level,
+            })
+            total_price += pricing.base_price
+            total_duration += pricing.estimated_duration
+
+        return {
+            "items": items,
+            "total_price": total_price,
+            "total_duration": total_duration,
+            "missing_service_types": missing,
+        }
+
+
+# Global estimator instance
+service_cost_estimator = ServiceCostEstimator(_settings.SERVICE_PRICING_CHECK_SECONDS)
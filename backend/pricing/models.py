@@ -41,6 +41,9 @@ class CarPricing(Document):
     
     class Settings:
         name = "car_pricings"
+        indexes = [
+            [("brand", 1), ("model", 1), ("year", 1), ("price_date", -1)],
+        ]
     
     @validator('brand')
     def validate_brand(cls, v):
@@ -77,6 +80,122 @@ class ServicePricing(Document):
     
     class Settings:
         name = "service_pricings"
+        indexes = [
+            [("service_type", 1), ("valid_from", -1)],
+        ]
+
+
+# Price alert types
+PRICE_ALERT_TYPE_CHOICES = [
+    'target_price',       # Fire when the price crosses a fixed target
+    'percentage_change',  # Fire when the price moves by a percentage of the reference price
+]
+
+# Price alert directions
+PRICE_ALERT_DIRECTION_CHOICES = [
+    'below',  # Price drops to or under the threshold
+    'above',  # Price rises to or over the threshold
+    'both',   # Either direction (percentage alerts only)
+]
+
+
+class PriceAlert(Document):
+    """
+    Price alert model for notifying users about car price movements.
+    """
+    
+    # Ownership
+    user_id: str = Field(..., description="شناسه کاربر")
+    
+    # Watched vehicle
+    brand: str = Field(..., description="برند")
+    model: str = Field(..., description="مدل")
+    year: int = Field(..., description="سال ساخت")
+    
+    # Alert rule
+    alert_type: str = Field(..., description="نوع هشدار")
+    direction: str = Field(default="below", description="جهت تغییر قیمت")
+    target_price: Optional[int] = Field(None, description="قیمت هدف (ریال)")
+    percentage_threshold: Optional[float] = Field(None, description="آستانه درصدی")
+    reference_price: Optional[int] = Field(None, description="قیمت مرجع (ریال)")
+    notification_methods: List[str] = Field(default=["push"], description="روش‌های اطلاع‌رسانی")
+    
+    # Status
+    is_active: bool = Field(default=True, description="وضعیت فعال بودن")
+    last_triggered: Optional[datetime] = Field(None, description="آخرین زمان فعال شدن")
+    trigger_count: int = Field(default=0, description="تعداد دفعات فعال شدن")
+    
+    # Metadata
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "price_alerts"
+        indexes = [
+            "user_id",
+            [("brand", 1), ("model", 1), ("year", 1), ("is_active", 1)],
+        ]
+    
+    @validator('alert_type')
+    def validate_alert_type(cls, v):
+        if v not in PRICE_ALERT_TYPE_CHOICES:
+            raise ValueError("نوع هشدار نامعتبر است")
+        return v
+    
+    @validator('direction')
+    def validate_direction(cls, v):
+        if v not in PRICE_ALERT_DIRECTION_CHOICES:
+            raise ValueError("جهت هشدار نامعتبر است")
+        return v
+    
+    def thresholds(self) -> List[tuple]:
+        """
+        Resolve the alert rule into absolute (direction, price) thresholds.
+        
+        Returns:
+            List[tuple]: ('below' | 'above', threshold price) pairs
+        """
+        if self.alert_type == 'target_price':
+            if self.target_price is None:
+                return []
+            # 'both' is rejected for new target alerts; older ones fire on either crossing
+            directions = ('below', 'above') if self.direction == 'both' else (self.direction,)
+            return [(direction, self.target_price) for direction in directions]
+        
+        if self.percentage_threshold is None or not self.reference_price:
+            return []
+        
+        delta = self.reference_price * self.percentage_threshold / 100
+        result = []
+        if self.direction in ('below', 'both'):
+            result.append(('below', int(self.reference_price - delta)))
+        if self.direction in ('above', 'both'):
+            result.append(('above', int(self.reference_price + delta)))
+        return result
+
+
+class PriceAlertNotification(Document):
+    """
+    Outbox entry for a triggered price alert, picked up by the notification sender.
+    """
+    alert_id: str = Field(..., description="شناسه هشدار")
+    user_id: str = Field(..., description="شناسه کاربر")
+    brand: str = Field(..., description="برند")
+    model: str = Field(..., description="مدل")
+    year: int = Field(..., description="سال ساخت")
+    direction: str = Field(..., description="جهت تغییر قیمت")
+    threshold: int = Field(..., description="آستانه عبور شده (ریال)")
+    previous_price: Optional[int] = Field(None, description="قیمت قبلی (ریال)")
+    price: int = Field(..., description="قیمت جدید (ریال)")
+    notification_methods: List[str] = Field(default=[], description="روش‌های اطلاع‌رسانی")
+    is_sent: bool = Field(default=False, description="وضعیت ارسال")
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "price_alert_notifications"
+        indexes = [
+            [("is_sent", 1), ("created_at", 1)],
+        ]
 
 
 # Pydantic models for API
@@ -138,3 +257,100 @@ class CarPricingOut(CarPricingCreate):
     id: str = Field(..., description="شناسه قیمت خودرو")
     created_at: datetime = Field(..., description="تاریخ ایجاد")
     updated_at: datetime = Field(..., description="تاریخ به‌روزرسانی")
+
+
+class PriceAlertCreate(BaseModel):
+    """
+    Schema for creating a new price alert.
+    """
+    brand: str = Field(..., description="برند")
+    model: str = Field(..., description="مدل")
+    year: int = Field(..., description="سال ساخت")
+    alert_type: str = Field(..., description="نوع هشدار")
+    direction: str = Field(default="below", description="جهت تغییر قیمت")
+    target_price: Optional[int] = Field(None, description="قیمت هدف (ریال)")
+    percentage_threshold: Optional[float] = Field(None, description="آستانه درصدی")
+    notification_methods: List[str] = Field(default=["push"], description="روش‌های اطلاع‌رسانی")
+    
+    @validator('alert_type')
+    def validate_alert_type(cls, v):
+        if v not in PRICE_ALERT_TYPE_CHOICES:
+            raise ValueError("نوع هشدار نامعتبر است")
+        return v
+    
+    @validator('direction')
+    def validate_direction(cls, v):
+        if v not in PRICE_ALERT_DIRECTION_CHOICES:
+            raise ValueError("جهت هشدار نامعتبر است")
+        return v
+    
+    @validator('target_price')
+    def validate_target_price(cls, v):
+        if v is not None and v <= 0:
+            raise ValueError("قیمت هدف باید بیشتر از صفر باشد.")
+        return v
+    
+    @validator('percentage_threshold')
+    def validate_percentage_threshold(cls, v):
+        if v is not None and v <= 0:
+            raise ValueError("آستانه درصدی باید بیشتر از صفر باشد.")
+        return v
+    
+    @validator('notification_methods')
+    def validate_notification_methods(cls, v):
+        if not v:
+            raise ValueError("حداقل یک روش اطلاع‌رسانی باید انتخاب شود.")
+        return v
+
+
+class PriceAlertOut(PriceAlertCreate):
+    """
+    Schema for price alert output with additional fields.
+    """
+    id: str = Field(..., description="شناسه هشدار")
+    user_id: str = Field(..., description="شناسه کاربر")
+    reference_price: Optional[int] = Field(None, description="قیمت مرجع (ریال)")
+    is_active: bool = Field(..., description="وضعیت فعال بودن")
+    last_triggered: Optional[datetime] = Field(None, description="آخرین زمان فعال شدن")
+    trigger_count: int = Field(..., description="تعداد دفعات فعال شدن")
+    created_at: datetime = Field(..., description="تاریخ ایجاد")
+    updated_at: datetime = Field(..., description="تاریخ به‌روزرسانی")
+
+
+class ServiceCostEstimateRequest(BaseModel):
+    """
+    Schema for estimating the cost of a maintenance plan.
+    """
+    service_types: List[str] = Field(..., description="انواع سرویس برنامه نگهداری")
+    vehicle_id: Optional[str] = Field(None, description="شناسه خودرو")
+    brand: Optional[str] = Field(None, description="برند")
+    model: Optional[str] = Field(None, description="مدل")
+    
+    @validator('service_types')
+    def validate_service_types(cls, v):
+        if not v:
+            raise ValueError("حداقل یک نوع سرویس باید مشخص شود.")
+        return v
+
+
+class ServiceCostEstimateItem(BaseModel):
+    """
+    Schema for the estimated cost of a single service.
+    """
+    service_type: str = Field(..., description="نوع سرویس")
+    service_name: str = Field(..., description="نام سرویس")
+    base_price: int = Field(..., description="قیمت پایه (ریال)")
+    estimated_duration: int = Field(..., description="مدت زمان تخمینی (دقیقه)")
+    matched_on: str = Field(..., description="سطح تطبیق قیمت")
+
+
+class ServiceCostEstimateOut(BaseModel):
+    """
+    Schema for the estimated cost of a maintenance plan.
+    """
+    brand: Optional[str] = Field(None, description="برند")
+    model: Optional[str] = Field(None, description="مدل")
+    items: List[ServiceCostEstimateItem] = Field(default=[], description="هزینه هر سرویس")
+    total_price: int = Field(..., description="هزینه کل (ریال)")
+    total_duration: int = Field(..., description="مدت زمان کل (دقیقه)")
+    missing_service_types: List[str] = Field(default=[], description="سرویس‌های بدون قیمت")
@@ -4,13 +4,28 @@ Service API router for FastAPI MashinMan project.
 
 from datetime import datetime, timedelta
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 
-from .models import Service, ServiceCreate, ServiceUpdate, ServiceOut
+from .models import (
+    Service, ServiceCreate, ServiceUpdate, ServiceOut, MaintenanceDue, MaintenanceDueOut,
+    MaintenancePlan, MaintenancePlanCreate, MaintenancePlanOut, PlanOccurrenceOut, ServiceStatusUpdate,
+    ServiceCenter, ServiceCenterOut, DayAvailabilityOut, ServiceBooking, ServiceBookingCreate, ServiceBookingOut,
+    BulkServiceCreate, BulkServiceOut, BulkServiceResultOut
+)
+from .plans import (
+    default_interval_mileage, get_plan_occurrences, is_plannable, materialize_occurrence, resolve_occurrence
+)
+from .bulk import schedule_services
+from .centers import SlotUnavailableError, book_slot, cancel_booking, get_availability, search_centers
+from .state import ServiceTransitionError, transition_service, update_service_fields
+from vehicles.garage import refresh_next_service, sync_next_service
 from vehicles.models import Vehicle
 from users.models import User
 from users.dependencies import get_current_active_user
-from core.jalali import gregorian_to_jalali, jalali_to_gregorian, parse_jalali_date
+from core.config import get_settings
+from core.jalali import format_jalali_dates, gregorian_to_jalali, jalali_to_gregorian, parse_jalali_date
+
+_settings = get_settings()
 
 router = APIRouter(prefix="/services", tags=["services"])
 
@@ -76,6 +91,7 @@ async def create_service(
     
     # Save service to database
     await service.insert()
+    await sync_next_service(str(current_user.id), str(service.id), service)
     
     # Convert dates to Jalali for response
     service_out = ServiceOut(**service.dict())
@@ -90,6 +106,49 @@ async def create_service(
     return service_out
 
 
+@router.post("/bulk", response_model=BulkServiceOut, status_code=status.HTTP_201_CREATED)
+async def bulk_schedule_services(
+    bulk_data: BulkServiceCreate,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Schedule the same service for many of the user's vehicles at once"""
+    if len(bulk_data.vehicle_ids) > _settings.SERVICE_BULK_MAX_VEHICLES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {_settings.SERVICE_BULK_MAX_VEHICLES} vehicles can be scheduled at once"
+        )
+    
+    scheduled_date = None
+    if bulk_data.scheduled_date:
+        try:
+            scheduled_date = jalali_to_gregorian(parse_jalali_date(bulk_data.scheduled_date))
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+    
+    # Ownership is checked per vehicle and reported in the results
+    results = await schedule_services(
+        str(current_user.id),
+        bulk_data.vehicle_ids,
+        bulk_data.service_type,
+        description=bulk_data.description,
+        priority=bulk_data.priority,
+        scheduled_date=scheduled_date,
+        mileage_interval=bulk_data.mileage_interval,
+    )
+    created = sum(1 for result in results if result['status'] == 'created')
+    if created:
+        await refresh_next_service(str(current_user.id))
+    
+    return BulkServiceOut(
+        created=created,
+        skipped=len(results) - created,
+        results=[BulkServiceResultOut(**result) for result in results],
+    )
+
+
 @router.get("/", response_model=List[ServiceOut])
 async def list_services(
     vehicle_id: Optional[str] = None,
@@ -175,122 +234,363 @@ async def get_upcoming_services(
     return services_out
 
 
-@router.get("/{service_id}", response_model=ServiceOut)
-async def get_service(
-    service_id: str,
+def _plan_out(plan: MaintenancePlan) -> MaintenancePlanOut:
+    return MaintenancePlanOut(
+        **{**plan.dict(), 'id': str(plan.id), 'start_date': format_jalali_dates([plan.start_date])[0]}
+    )
+
+
+def _occurrences_out(occurrences: List[dict]) -> List[PlanOccurrenceOut]:
+    jalali_dates = format_jalali_dates(item['due_date'] for item in occurrences)
+    return [
+        PlanOccurrenceOut(**{**item, 'due_date': jalali_date})
+        for item, jalali_date in zip(occurrences, jalali_dates)
+    ]
+
+
+@router.post("/plans", response_model=MaintenancePlanOut, status_code=status.HTTP_201_CREATED)
+async def create_maintenance_plan(
+    plan_data: MaintenancePlanCreate,
     current_user: User = Depends(get_current_active_user)
 ):
-    """Get service by ID"""
-    service = await Service.get(service_id)
-    if not service:
+    """Create a recurring maintenance plan for a vehicle"""
+    # Check if user owns the vehicle
+    vehicle = await Vehicle.get(plan_data.vehicle_id)
+    if not vehicle or vehicle.user_id != current_user.id:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Service not found"
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to create plans for this vehicle"
         )
     
-    # Check if user owns the vehicle for this service
-    vehicle = await Vehicle.get(service.vehicle_id)
-    if not vehicle or vehicle.user_id != current_user.id:
+    if not is_plannable(plan_data.service_type):
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not authorized to access this service"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid service type"
         )
     
-    # Convert dates to Jalali for response
-    service_out = ServiceOut(**service.dict())
-    if service.last_service_date:
-        jalali_date = gregorian_to_jalali(service.last_service_date)
-        service_out.last_service_date = jalali_date.strftime("%Y/%m/%d")
+    interval_mileage = plan_data.interval_mileage
+    if interval_mileage is None and plan_data.interval_days is None:
+        interval_mileage = default_interval_mileage(plan_data.service_type)
+        if interval_mileage is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="This service type has no standard interval, interval_mileage or interval_days is required"
+            )
     
-    if service.next_service_date:
-        jalali_date = gregorian_to_jalali(service.next_service_date)
-        service_out.next_service_date = jalali_date.strftime("%Y/%m/%d")
+    start_date = datetime.utcnow().date()
+    if plan_data.start_date:
+        try:
+            start_date = jalali_to_gregorian(parse_jalali_date(plan_data.start_date))
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
     
-    return service_out
+    if await MaintenancePlan.find_one(
+        (MaintenancePlan.vehicle_id == plan_data.vehicle_id) & (MaintenancePlan.service_type == plan_data.service_type)
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A plan for this service type already exists for this vehicle"
+        )
+    
+    plan = MaintenancePlan(
+        vehicle_id=plan_data.vehicle_id,
+        user_id=str(current_user.id),
+        service_type=plan_data.service_type,
+        interval_mileage=interval_mileage,
+        interval_days=plan_data.interval_days,
+        start_date=start_date,
+        start_mileage=plan_data.start_mileage if plan_data.start_mileage is not None else vehicle.current_mileage,
+    )
+    await plan.insert()
+    
+    return _plan_out(plan)
 
 
-@router.put("/{service_id}", response_model=ServiceOut)
-async def update_service(
-    service_id: str,
-    service_update: ServiceUpdate,
+@router.get("/plans", response_model=List[MaintenancePlanOut])
+async def list_maintenance_plans(
+    vehicle_id: Optional[str] = None,
     current_user: User = Depends(get_current_active_user)
 ):
-    """Update service information"""
-    service = await Service.get(service_id)
-    if not service:
+    """Get the user's recurring maintenance plans"""
+    query = MaintenancePlan.user_id == str(current_user.id)
+    if vehicle_id:
+        query = query & (MaintenancePlan.vehicle_id == vehicle_id)
+    
+    plans = await MaintenancePlan.find(query).to_list()
+    
+    return [_plan_out(plan) for plan in plans]
+
+
+@router.delete("/plans/{plan_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_maintenance_plan(
+    plan_id: str,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Delete a recurring maintenance plan (services already created from it are kept)"""
+    plan = await MaintenancePlan.get(plan_id)
+    if not plan or plan.user_id != str(current_user.id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Service not found"
+            detail="Maintenance plan not found"
         )
     
-    # Check if user owns the vehicle for this service
-    vehicle = await Vehicle.get(service.vehicle_id)
-    if not vehicle or vehicle.user_id != current_user.id:
+    await plan.delete()
+    
+    return None
+
+
+@router.post("/plans/{plan_id}/occurrences/{occurrence}", response_model=ServiceOut, status_code=status.HTTP_201_CREATED)
+async def materialize_plan_occurrence(
+    plan_id: str,
+    occurrence: int,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Create the service of a planned occurrence so it can be scheduled and completed"""
+    plan = await MaintenancePlan.get(plan_id)
+    if not plan or plan.user_id != str(current_user.id):
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not authorized to update this service"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Maintenance plan not found"
+        )
+    
+    if occurrence < 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Occurrence numbers start at 1"
         )
     
-    # Update service fields
-    update_data = service_update.dict(exclude_unset=True)
+    vehicle = await Vehicle.get(plan.vehicle_id)
+    item = await resolve_occurrence(plan, occurrence, vehicle.current_mileage if vehicle else plan.start_mileage)
+    service = await materialize_occurrence(plan, occurrence, item.due_date, item.due_mileage)
+    await sync_next_service(str(current_user.id), str(service.id), service)
     
-    # Handle Jalali date conversion if provided
-    if 'last_service_date' in update_data and update_data['last_service_date']:
-        try:
-            jalali_date = parse_jalali_date(update_data['last_service_date'])
-            gregorian_date = jalali_to_gregorian(jalali_date)
-            update_data['last_service_date'] = gregorian_date
-        except ValueError as e:
+    return ServiceOut(**{**service.dict(), 'id': str(service.id)})
+
+
+@router.get("/calendar", response_model=List[PlanOccurrenceOut])
+async def get_maintenance_calendar(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    vehicle_id: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get planned maintenance occurrences between two Jalali dates (default: the next 90 days)"""
+    try:
+        start_date = jalali_to_gregorian(parse_jalali_date(start)) if start else datetime.utcnow().date()
+        end_date = jalali_to_gregorian(parse_jalali_date(end)) if end else start_date + timedelta(days=90)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    if (end_date - start_date).days > 366:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Calendar range cannot exceed one year"
+        )
+    
+    if vehicle_id:
+        # Check if user owns this vehicle
+        vehicle = await Vehicle.get(vehicle_id)
+        if not vehicle or vehicle.user_id != current_user.id:
             raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=str(e)
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not authorized to access services for this vehicle"
+            )
+        vehicles = [vehicle]
+    else:
+        vehicles = await Vehicle.find(Vehicle.user_id == current_user.id).to_list()
+    
+    occurrences = await get_plan_occurrences(vehicles, start_date, end_date)
+    
+    return _occurrences_out(occurrences)
+
+
+@router.get("/upcoming/planned", response_model=List[PlanOccurrenceOut])
+async def get_upcoming_planned_services(
+    days: int = 30,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get planned maintenance occurrences due within specified days"""
+    today = datetime.utcnow().date()
+    vehicles = await Vehicle.find(Vehicle.user_id == current_user.id).to_list()
+    occurrences = await get_plan_occurrences(vehicles, today, today + timedelta(days=max(0, min(days, 366))))
+    
+    return _occurrences_out(occurrences)
+
+
+@router.get("/due", response_model=List[MaintenanceDueOut])
+async def list_maintenance_due(
+    vehicle_id: Optional[str] = None,
+    overdue_only: bool = False,
+    days: Optional[int] = None,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get precomputed due mileage and dates of standard services, soonest first"""
+    if vehicle_id:
+        # Check if user owns this vehicle
+        vehicle = await Vehicle.get(vehicle_id)
+        if not vehicle or vehicle.user_id != current_user.id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not authorized to access services for this vehicle"
             )
+        query = MaintenanceDue.vehicle_id == vehicle_id
+    else:
+        query = MaintenanceDue.user_id == str(current_user.id)
+    
+    if overdue_only:
+        query = query & (MaintenanceDue.is_overdue == True)
+    elif days is not None:
+        query = query & (MaintenanceDue.days_until_due <= days)
+    
+    entries = await MaintenanceDue.find(query).sort(+MaintenanceDue.due_date).to_list()
+    jalali_dates = format_jalali_dates(entry.due_date for entry in entries)
+    
+    return [
+        MaintenanceDueOut(**{**entry.dict(), 'due_date': jalali_date})
+        for entry, jalali_date in zip(entries, jalali_dates)
+    ]
+
+
+def _center_out(center: dict) -> ServiceCenterOut:
+    return ServiceCenterOut(**{**center, 'id': str(center['_id'])})
+
+
+def _booking_out(booking: ServiceBooking) -> ServiceBookingOut:
+    return ServiceBookingOut(
+        **{**booking.dict(), 'id': str(booking.id), 'date': format_jalali_dates([booking.day])[0]}
+    )
+
+
+@router.get("/centers", response_model=List[ServiceCenterOut])
+async def search_service_centers(
+    latitude: float = Query(..., ge=-90, le=90),
+    longitude: float = Query(..., ge=-180, le=180),
+    service_type: Optional[str] = None,
+    radius_km: Optional[float] = Query(None, gt=0, le=200),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Find nearby service centers, verified centers offering the service first"""
+    centers = await search_centers(latitude, longitude, service_type, radius_km, limit)
     
-    if 'next_service_date' in update_data and update_data['next_service_date']:
+    return [_center_out(center) for center in centers]
+
+
+@router.get("/centers/{center_id}/availability", response_model=List[DayAvailabilityOut])
+async def get_service_center_availability(
+    center_id: str,
+    start_date: Optional[str] = None,
+    days: int = Query(7, ge=1, le=31),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get the free capacity of a service center's time slots"""
+    center = await ServiceCenter.get(center_id)
+    if not center:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Service center not found"
+        )
+    
+    start = datetime.utcnow().date()
+    if start_date:
         try:
-            jalali_date = parse_jalali_date(update_data['next_service_date'])
-            gregorian_date = jalali_to_gregorian(jalali_date)
-            update_data['next_service_date'] = gregorian_date
+            start = jalali_to_gregorian(parse_jalali_date(start_date))
         except ValueError as e:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=str(e)
             )
     
-    # Remove the Jalali date fields as they're for API only
-    update_data.pop('last_service_date', None)
-    update_data.pop('next_service_date', None)
+    return [DayAvailabilityOut(**day) for day in await get_availability(center, start, days)]
+
+
+@router.post("/centers/{center_id}/bookings", response_model=ServiceBookingOut, status_code=status.HTTP_201_CREATED)
+async def book_service_center(
+    center_id: str,
+    booking_data: ServiceBookingCreate,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Book a time slot at a service center"""
+    center = await ServiceCenter.get(center_id)
+    if not center:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Service center not found"
+        )
     
-    # Update timestamps
-    update_data['updated_at'] = datetime.utcnow()
+    # Check if user owns this vehicle
+    vehicle = await Vehicle.get(booking_data.vehicle_id)
+    if not vehicle or vehicle.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to book for this vehicle"
+        )
     
-    # Apply updates
-    for key, value in update_data.items():
-        if hasattr(service, key) and value is not None:
-            setattr(service, key, value)
+    try:
+        day = jalali_to_gregorian(parse_jalali_date(booking_data.date))
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     
-    # Save updated service
-    await service.save()
+    try:
+        booking = await book_slot(
+            center, day, booking_data.slot, str(current_user.id), booking_data.vehicle_id,
+            service_id=booking_data.service_id, service_type=booking_data.service_type
+        )
+    except SlotUnavailableError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
     
-    # Convert dates to Jalali for response
-    service_out = ServiceOut(**service.dict())
-    if service.last_service_date:
-        jalali_date = gregorian_to_jalali(service.last_service_date)
-        service_out.last_service_date = jalali_date.strftime("%Y/%m/%d")
+    return _booking_out(booking)
+
+
+@router.get("/bookings", response_model=List[ServiceBookingOut])
+async def list_service_bookings(
+    include_past: bool = False,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get the user's service center bookings"""
+    query = ServiceBooking.user_id == str(current_user.id)
+    if not include_past:
+        query = query & (ServiceBooking.day >= datetime.combine(datetime.utcnow().date(), datetime.min.time()))
     
-    if service.next_service_date:
-        jalali_date = gregorian_to_jalali(service.next_service_date)
-        service_out.next_service_date = jalali_date.strftime("%Y/%m/%d")
+    bookings = await ServiceBooking.find(query).sort(+ServiceBooking.day, +ServiceBooking.slot).to_list()
     
-    return service_out
+    return [_booking_out(booking) for booking in bookings]
 
 
-@router.put("/{service_id}/complete", response_model=ServiceOut)
-async def complete_service(
+@router.delete("/bookings/{booking_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def cancel_service_booking(
+    booking_id: str,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Cancel a booking and free its slot"""
+    booking = await cancel_booking(booking_id, str(current_user.id))
+    if not booking:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Booking not found"
+        )
+    
+    return None
+
+
+@router.get("/{service_id}", response_model=ServiceOut)
+async def get_service(
     service_id: str,
     current_user: User = Depends(get_current_active_user)
 ):
-    """Mark service as completed"""
+    """Get service by ID"""
     service = await Service.get(service_id)
     if not service:
         raise HTTPException(
@@ -303,14 +603,9 @@ async def complete_service(
     if not vehicle or vehicle.user_id != current_user.id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not authorized to update this service"
+            detail="Not authorized to access this service"
         )
     
-    # Mark as completed
-    service.is_completed = True
-    service.updated_at = datetime.utcnow()
-    await service.save()
-    
     # Convert dates to Jalali for response
     service_out = ServiceOut(**service.dict())
     if service.last_service_date:
@@ -324,6 +619,89 @@ async def complete_service(
     return service_out
 
 
+def _transition_failed(exc: ServiceTransitionError) -> HTTPException:
+    if exc.current_status is None:
+        return HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Service not found"
+        )
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=f"Service is {exc.current_status} and cannot be moved to {exc.target}"
+    )
+
+
+@router.put("/{service_id}", response_model=ServiceOut)
+async def update_service(
+    service_id: str,
+    service_update: ServiceUpdate,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Update service information"""
+    # Explicit nulls are ignored, as before; they must not unset required fields
+    update_data = {key: value for key, value in service_update.dict(exclude_unset=True).items() if value is not None}
+    # The owner is part of the update filter and cannot be changed here
+    update_data.pop('user_id', None)
+    target = update_data.pop('status', None)
+    
+    if target is not None:
+        # Status changes go through the state machine along with the other fields
+        try:
+            service = await transition_service(service_id, str(current_user.id), target, update_data)
+        except ServiceTransitionError as exc:
+            raise _transition_failed(exc)
+    else:
+        service = await update_service_fields(service_id, str(current_user.id), update_data)
+        if not service:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Service not found"
+            )
+    
+    await sync_next_service(str(current_user.id), str(service.id), service)
+    
+    return ServiceOut(**{**service.dict(), 'id': str(service.id)})
+
+
+@router.put("/{service_id}/complete", response_model=ServiceOut)
+async def complete_service(
+    service_id: str,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Mark service as completed"""
+    try:
+        service = await transition_service(
+            service_id, str(current_user.id), 'completed',
+            {'actual_date': datetime.utcnow().date()}
+        )
+    except ServiceTransitionError as exc:
+        raise _transition_failed(exc)
+    
+    await sync_next_service(str(current_user.id), str(service.id), service)
+    
+    return ServiceOut(**{**service.dict(), 'id': str(service.id)})
+
+
+@router.put("/{service_id}/status", response_model=ServiceOut)
+async def change_service_status(
+    service_id: str,
+    status_update: ServiceStatusUpdate,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Move a service to another status (409 if not allowed from its current status)"""
+    try:
+        service = await transition_service(
+            service_id, str(current_user.id), status_update.status,
+            expected_status=status_update.expected_status
+        )
+    except ServiceTransitionError as exc:
+        raise _transition_failed(exc)
+    
+    await sync_next_service(str(current_user.id), str(service.id), service)
+    
+    return ServiceOut(**{**service.dict(), 'id': str(service.id)})
+
+
 @router.delete("/{service_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_service(
     service_id: str,
@@ -347,5 +725,6 @@ async def delete_service(
     
     # Delete service
     await service.delete()
+    await sync_next_service(str(current_user.id), service_id)
     
     return None
\ No newline at end of file
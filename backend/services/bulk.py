@@ -0,0 +1,105 @@
+"""
+Bulk fleet service scheduling for FastAPI MashinMan project.
+
+Ownership of every vehicle is checked with one $in query, open services of
+the same type are found with another, and the new Service documents are
+inserted with unordered insert_many in chunks. A failed insert only fails
+its own vehicle.
+"""
+
+import logging
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from .models import Service, OPEN_SERVICE_STATUSES
+from vehicles.models import Vehicle
+from core.config import get_settings
+
+logger = logging.getLogger('mashinman')
+_settings = get_settings()
+
+
+async def schedule_services(
+    user_id: str,
+    vehicle_ids: List[str],
+    service_type: str,
+    description: Optional[str] = None,
+    priority: str = 'medium',
+    scheduled_date: Optional[date] = None,
+    mileage_interval: Optional[int] = None,
+) -> List[Dict]:
+    """
+    Schedule the same service for many vehicles.
+
+    Args:
+        user_id (str): Owner of the vehicles
+        vehicle_ids (List[str]): Vehicle IDs
+        service_type (str): Service type
+        description (str): Service description
+        priority (str): Service priority
+        scheduled_date (date): Scheduled date
+        mileage_interval (int): Schedule at each vehicle's current mileage plus this
+
+    Returns:
+        List[Dict]: Fields of BulkServiceResultOut, in the order of vehicle_ids
+    """
+    vehicle_ids = list(dict.fromkeys(vehicle_ids))
+    object_ids = [ObjectId(vehicle_id) for vehicle_id in vehicle_ids if ObjectId.is_valid(vehicle_id)]
+
+    vehicles = {}
+    async for vehicle in Vehicle.get_motor_collection().find(
+        {"_id": {"$in": object_ids}}, projection={"user_id": 1, "current_mileage": 1}
+    ):
+        vehicles[str(vehicle["_id"])] = vehicle
+
+    owned = [vehicle_id for vehicle_id, vehicle in vehicles.items() if vehicle.get("user_id") == user_id]
+    open_services = {}
+    async for service in Service.get_motor_collection().find(
+        {"vehicle_id": {"$in": owned}, "service_type": service_type, "status": {"$in": OPEN_SERVICE_STATUSES}},
+        projection={"vehicle_id": 1},
+    ):
+        open_services[service["vehicle_id"]] = str(service["_id"])
+
+    now = datetime.utcnow()
+    results: Dict[str, Dict] = {}
+    services: List[Service] = []
+    for vehicle_id in vehicle_ids:
+        vehicle = vehicles.get(vehicle_id)
+        if vehicle is None:
+            results[vehicle_id] = {"vehicle_id": vehicle_id, "status": "not_found"}
+        elif vehicle.get("user_id") != user_id:
+            results[vehicle_id] = {"vehicle_id": vehicle_id, "status": "forbidden"}
+        elif vehicle_id in open_services:
+            results[vehicle_id] = {"vehicle_id": vehicle_id, "status": "exists", "service_id": open_services[vehicle_id]}
+        else:
+            # IDs are assigned up front so results can be reported per vehicle
+            service = Service(
+                id=ObjectId(),
+                vehicle_id=vehicle_id,
+                user_id=user_id,
+                service_type=service_type,
+                description=description,
+                priority=priority,
+                scheduled_date=scheduled_date,
+                scheduled_mileage=(vehicle.get("current_mileage") or 0) + mileage_interval if mileage_interval else None,
+                created_at=now,
+                updated_at=now,
+            )
+            services.append(service)
+            results[vehicle_id] = {"vehicle_id": vehicle_id, "status": "created", "service_id": str(service.id)}
+
+    chunk_size = _settings.SERVICE_BULK_CHUNK_SIZE
+    for start in range(0, len(services), chunk_size):
+        chunk = services[start:start + chunk_size]
+        try:
+            await Service.insert_many(chunk, ordered=False)
+        except BulkWriteError as exc:
+            for error in exc.details.get("writeErrors", []):
+                vehicle_id = chunk[error["index"]].vehicle_id
+                results[vehicle_id] = {"vehicle_id": vehicle_id, "status": "failed", "detail": error.get("errmsg")}
+            logger.warning("Bulk scheduling failed for %d services", len(exc.details.get("writeErrors", [])))
+
+    return [results[vehicle_id] for vehicle_id in vehicle_ids]
@@ -0,0 +1,231 @@
+"""
+Service center discovery and slot booking for FastAPI MashinMan project.
+
+Centers are ranked with one $geoNear aggregation: road distance is
+approximated by the spherical distance, and unverified centers or centers
+not offering the requested service are pushed back by a fixed number of
+kilometers. Booked counts are kept per center, day and time slot in
+ServiceCenterSlot documents, claimed with a conditional $inc so a slot is
+never booked past its capacity.
+"""
+
+import logging
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+import jdatetime
+from pymongo.errors import DuplicateKeyError
+
+from .models import ServiceBooking, ServiceCenter, ServiceCenterSlot
+from core.config import get_settings
+from core.jalali import format_jalali_dates, get_jalali_weekday_name
+
+logger = logging.getLogger('mashinman')
+_settings = get_settings()
+
+
+class SlotUnavailableError(Exception):
+    """Raised when a time slot does not exist, is in the past or is fully booked."""
+
+
+def center_location(latitude: float, longitude: float) -> Dict:
+    """GeoJSON point of a coordinate pair."""
+    return {"type": "Point", "coordinates": [longitude, latitude]}
+
+
+def _midnight(day: date) -> datetime:
+    return datetime.combine(day, datetime.min.time())
+
+
+def is_closed(center: ServiceCenter, day: date) -> bool:
+    # jdatetime weekdays start at 0 for Saturday
+    return jdatetime.date.fromgregorian(date=day).weekday() in center.closed_weekdays
+
+
+def center_slots(center: ServiceCenter) -> List[str]:
+    """Start times of a center's daily slots as HH:MM."""
+    slots = []
+    minute = center.opening_hour * 60
+    while minute + center.slot_minutes <= center.closing_hour * 60:
+        slots.append(f"{minute // 60:02d}:{minute % 60:02d}")
+        minute += center.slot_minutes
+    return slots
+
+
+async def search_centers(
+    latitude: float,
+    longitude: float,
+    service_type: Optional[str] = None,
+    radius_km: Optional[float] = None,
+    limit: int = 20,
+) -> List[Dict]:
+    """
+    Find the best service centers around a point.
+
+    Args:
+        latitude (float): Latitude of the user
+        longitude (float): Longitude of the user
+        service_type (str): Service type the user needs
+        radius_km (float): Search radius
+        limit (int): Maximum number of centers
+
+    Returns:
+        List[Dict]: Center documents with 'distance_km' and 'offers_service', best first
+    """
+    radius_km = radius_km or _settings.SERVICE_CENTER_SEARCH_RADIUS_KM
+    offers_service = {"$in": [service_type, "$services_offered"]} if service_type else True
+    pipeline = [
+        {"$geoNear": {
+            "near": center_location(latitude, longitude),
+            "key": "location",
+            "distanceField": "distance",
+            "maxDistance": radius_km * 1000,
+            "spherical": True,
+        }},
+        {"$addFields": {
+            "distance_km": {"$round": [{"$divide": ["$distance", 1000]}, 2]},
+            "offers_service": offers_service,
+        }},
+        {"$addFields": {
+            "rank": {"$add": [
+                "$distance_km",
+                {"$cond": ["$is_verified", 0, _settings.SERVICE_CENTER_UNVERIFIED_PENALTY_KM]},
+                {"$cond": ["$offers_service", 0, _settings.SERVICE_CENTER_MISSING_SERVICE_PENALTY_KM]},
+            ]},
+        }},
+        {"$sort": {"rank": 1}},
+        {"$limit": limit},
+    ]
+    return await ServiceCenter.get_motor_collection().aggregate(pipeline).to_list(length=None)
+
+
+async def get_availability(center: ServiceCenter, start: date, days: int = 7) -> List[Dict]:
+    """
+    Get the free capacity of a center's slots over some days.
+
+    Args:
+        center (ServiceCenter): Service center
+        start (date): First day
+        days (int): Number of days
+
+    Returns:
+        List[Dict]: Fields of DayAvailabilityOut, one per day
+    """
+    # One range read over the (center_id, day, slot) index covers every day
+    rows = await ServiceCenterSlot.get_motor_collection().find(
+        {"center_id": str(center.id), "day": {"$gte": _midnight(start), "$lt": _midnight(start + timedelta(days=days))}},
+        projection={"day": 1, "slot": 1, "booked": 1, "_id": 0},
+    ).to_list(length=None)
+    booked = {(row["day"].date(), row["slot"]): row["booked"] for row in rows}
+
+    slots = center_slots(center)
+    day_list = [start + timedelta(days=offset) for offset in range(days)]
+    result = []
+    for day, jalali_date in zip(day_list, format_jalali_dates(day_list)):
+        closed = is_closed(center, day)
+        result.append({
+            "date": jalali_date,
+            "weekday": get_jalali_weekday_name(jdatetime.date.fromgregorian(date=day).weekday()),
+            "is_closed": closed,
+            "slots": [] if closed else [
+                {
+                    "slot": slot,
+                    "capacity": center.slot_capacity,
+                    "remaining": max(center.slot_capacity - booked.get((day, slot), 0), 0),
+                }
+                for slot in slots
+            ],
+        })
+    return result
+
+
+async def book_slot(
+    center: ServiceCenter,
+    day: date,
+    slot: str,
+    user_id: str,
+    vehicle_id: str,
+    service_id: Optional[str] = None,
+    service_type: Optional[str] = None,
+) -> ServiceBooking:
+    """
+    Book one place in a center's time slot.
+
+    Args:
+        center (ServiceCenter): Service center
+        day (date): Day of the booking
+        slot (str): Start time of the slot (HH:MM)
+        user_id (str): User ID
+        vehicle_id (str): Vehicle ID
+        service_id (str): Service the booking is for
+        service_type (str): Service type the booking is for
+
+    Returns:
+        ServiceBooking: The booking
+
+    Raises:
+        SlotUnavailableError: If the slot cannot be booked
+    """
+    today = datetime.utcnow().date()
+    if not today <= day <= today + timedelta(days=_settings.SERVICE_CENTER_BOOKING_DAYS_AHEAD):
+        raise SlotUnavailableError("Bookings are only accepted for the coming days")
+    if is_closed(center, day) or slot not in center_slots(center):
+        raise SlotUnavailableError("The center has no such slot on this day")
+
+    key = {"center_id": str(center.id), "day": _midnight(day), "slot": slot}
+    collection = ServiceCenterSlot.get_motor_collection()
+    try:
+        # Missing slot documents are upserted with the claim; a full slot makes
+        # the filter miss and the upsert collide with the existing document
+        await collection.update_one(
+            {**key, "booked": {"$lt": center.slot_capacity}},
+            {"$inc": {"booked": 1}, "$set": {"capacity": center.slot_capacity, "updated_at": datetime.utcnow()}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        raise SlotUnavailableError("This slot is fully booked")
+
+    booking = ServiceBooking(
+        center_id=str(center.id),
+        user_id=user_id,
+        vehicle_id=vehicle_id,
+        service_id=service_id,
+        service_type=service_type,
+        day=_midnight(day),
+        slot=slot,
+    )
+    try:
+        await booking.insert()
+    except Exception:
+        await collection.update_one({**key, "booked": {"$gt": 0}}, {"$inc": {"booked": -1}})
+        raise
+    return booking
+
+
+async def cancel_booking(booking_id: str, user_id: str) -> Optional[ServiceBooking]:
+    """
+    Cancel a booking and release its place.
+
+    Args:
+        booking_id (str): Booking ID
+        user_id (str): Owner of the booking
+
+    Returns:
+        Optional[ServiceBooking]: The cancelled booking, or None if there was no active one
+    """
+    booking = await ServiceBooking.get(booking_id)
+    if not booking or booking.user_id != user_id:
+        return None
+    # Only the request that flips the status releases the place
+    result = await ServiceBooking.get_motor_collection().update_one(
+        {"_id": booking.id, "status": "booked"},
+        {"$set": {"status": "cancelled", "updated_at": datetime.utcnow()}},
+    )
+    if not result.modified_count:
+        return None
+    await ServiceCenterSlot.get_motor_collection().update_one(
+        {"center_id": booking.center_id, "day": booking.day, "slot": booking.slot, "booked": {"$gt": 0}},
+        {"$inc": {"booked": -1}},
+    )
+    booking.status = "cancelled"
+    return booking
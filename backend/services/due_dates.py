@@ -0,0 +1,228 @@
+"""
+Fleet maintenance due-date engine for FastAPI MashinMan project.
+
+Vehicles' current mileage, the mileage of their last service of every
+standard service type and their estimated daily mileage are loaded into
+NumPy arrays, and due mileage, days until due and overdue flags for the
+whole fleet are computed in one vectorized pass. Results are stored as
+MaintenanceDue documents so reads never recompute them.
+"""
+
+import logging
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from .models import MaintenanceDue
+from history.models import ServiceHistory
+from vehicles.mileage import estimate_daily_rates
+from vehicles.models import Vehicle
+from core.config import get_settings
+from core.jobs import PeriodicJob
+from core.utils import get_standard_service_intervals
+
+logger = logging.getLogger('mashinman')
+_settings = get_settings()
+
+# History service types recorded under a different name than their standard interval
+SERVICE_TYPE_ALIASES = {
+    'air_filter_replacement': 'air_filter',
+    'oil_filter_replacement': 'oil_filter',
+    'coolant_change': 'coolant',
+    'transmission_service': 'transmission_fluid',
+}
+
+
+def compute_due(
+    current_mileage: np.ndarray,
+    last_service_mileage: np.ndarray,
+    intervals: np.ndarray,
+    daily_rate: np.ndarray,
+    fallback_mileage: Optional[np.ndarray] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Compute due mileage and days until due for every vehicle and service type.
+
+    Args:
+        current_mileage (np.ndarray): Shape (vehicles,)
+        last_service_mileage (np.ndarray): Shape (vehicles, types), NaN where never serviced
+        intervals (np.ndarray): Shape (types,), service interval in km
+        daily_rate (np.ndarray): Shape (vehicles,), estimated km per day
+        fallback_mileage (np.ndarray): Shape (vehicles,), mileage counted from where a
+            type was never serviced, e.g. the vehicle's last service of any type (0 if None)
+
+    Returns:
+        Dict[str, np.ndarray]: 'base_mileage', 'due_mileage', 'mileage_until_due',
+        'days_until_due' and 'is_overdue', each of shape (vehicles, types)
+    """
+    current = current_mileage[:, None].astype(float)
+    # A type never serviced is counted from the fallback, so a neglected vehicle shows as overdue
+    if fallback_mileage is None:
+        fallback_mileage = np.zeros(len(current_mileage))
+    base = np.where(np.isnan(last_service_mileage), fallback_mileage[:, None].astype(float), last_service_mileage)
+
+    due_mileage = base + intervals
+    mileage_until_due = due_mileage - current
+    days_until_due = np.floor(mileage_until_due / daily_rate[:, None])
+
+    return {
+        'base_mileage': base,
+        'due_mileage': due_mileage.astype(np.int64),
+        'mileage_until_due': mileage_until_due.astype(np.int64),
+        'days_until_due': days_until_due.astype(np.int64),
+        'is_overdue': mileage_until_due <= 0,
+    }
+
+
+async def _load_last_services(vehicle_ids: List[str], service_types: List[str]) -> Dict:
+    # History types that count as each standard type
+    history_types = service_types + [alias for alias, target in SERVICE_TYPE_ALIASES.items() if target in service_types]
+    pipeline = [
+        {"$match": {"vehicle_id": {"$in": vehicle_ids}, "service_type": {"$in": history_types}}},
+        {"$group": {
+            "_id": {"vehicle_id": "$vehicle_id", "service_type": "$service_type"},
+            "mileage": {"$max": "$actual_mileage"},
+            "date": {"$max": "$actual_date"},
+        }},
+    ]
+    last_services = {}
+    async for row in ServiceHistory.aggregate(pipeline):
+        service_type = SERVICE_TYPE_ALIASES.get(row["_id"]["service_type"], row["_id"]["service_type"])
+        key = (row["_id"]["vehicle_id"], service_type)
+        current = last_services.get(key)
+        if current is None or row["mileage"] > current["mileage"]:
+            last_services[key] = row
+    return last_services
+
+
+async def _load_daily_rates(vehicle_ids: List[str], since: datetime) -> Dict[str, float]:
+    pipeline = [
+        {"$match": {"vehicle_id": {"$in": vehicle_ids}, "actual_date": {"$gte": since}}},
+        {"$group": {
+            "_id": "$vehicle_id",
+            "first_date": {"$min": "$actual_date"},
+            "last_date": {"$max": "$actual_date"},
+            "first_mileage": {"$min": "$actual_mileage"},
+            "last_mileage": {"$max": "$actual_mileage"},
+        }},
+    ]
+    rates = {}
+    async for row in ServiceHistory.aggregate(pipeline):
+        days = (row["last_date"] - row["first_date"]).days
+        distance = row["last_mileage"] - row["first_mileage"]
+        if days >= _settings.DUE_DATE_MIN_RATE_DAYS and distance > 0:
+            rates[row["_id"]] = distance / days
+    return rates
+
+
+async def _compute_batch(vehicles: List[Dict], service_types: List[str], intervals: np.ndarray, today: date) -> int:
+    vehicle_ids = [str(vehicle["_id"]) for vehicle in vehicles]
+    since = datetime.combine(today, datetime.min.time()) - timedelta(days=_settings.DUE_DATE_RATE_WINDOW_DAYS)
+    last_services = await _load_last_services(vehicle_ids, service_types)
+    # Odometer readings are denser than service history; history covers vehicles without enough of them
+    rates = await estimate_daily_rates(vehicle_ids, since)
+    missing = [vehicle_id for vehicle_id in vehicle_ids if vehicle_id not in rates]
+    if missing:
+        rates.update(await _load_daily_rates(missing, since))
+
+    current_mileage = np.fromiter((vehicle.get("current_mileage") or 0 for vehicle in vehicles), dtype=float, count=len(vehicles))
+    fallback_mileage = np.fromiter((vehicle.get("last_service_mileage") or 0 for vehicle in vehicles), dtype=float, count=len(vehicles))
+    daily_rate = np.fromiter(
+        (rates.get(vehicle_id, _settings.DUE_DATE_DEFAULT_DAILY_MILEAGE) for vehicle_id in vehicle_ids),
+        dtype=float, count=len(vehicles)
+    )
+    last_service_mileage = np.full((len(vehicles), len(service_types)), np.nan)
+    for row, vehicle_id in enumerate(vehicle_ids):
+        for column, service_type in enumerate(service_types):
+            last = last_services.get((vehicle_id, service_type))
+            if last is not None:
+                last_service_mileage[row, column] = last["mileage"]
+
+    result = compute_due(current_mileage, last_service_mileage, intervals, daily_rate, fallback_mileage)
+    # Stored as midnight datetimes, BSON has no date type
+    due_dates = (np.datetime64(today, 'D') + result['days_until_due'].astype('timedelta64[D]')).astype('datetime64[ms]')
+
+    now = datetime.utcnow()
+    # Denormalized onto the vehicle so admin search can filter on it
+    overdue = result['is_overdue'].any(axis=1)
+    await Vehicle.get_motor_collection().bulk_write([
+        UpdateOne({"_id": vehicle["_id"], "is_overdue": {"$ne": bool(overdue[row])}}, {"$set": {"is_overdue": bool(overdue[row])}})
+        for row, vehicle in enumerate(vehicles)
+    ], ordered=False)
+
+    operations = []
+    for row, vehicle in enumerate(vehicles):
+        for column, service_type in enumerate(service_types):
+            last = last_services.get((vehicle_ids[row], service_type))
+            operations.append(UpdateOne(
+                {"vehicle_id": vehicle_ids[row], "service_type": service_type},
+                {"$set": {
+                    "user_id": vehicle.get("user_id"),
+                    "interval_mileage": int(intervals[column]),
+                    "current_mileage": int(current_mileage[row]),
+                    "last_service_mileage": last["mileage"] if last else None,
+                    "last_service_date": last["date"] if last else None,
+                    "daily_mileage_rate": round(float(daily_rate[row]), 2),
+                    "due_mileage": int(result['due_mileage'][row, column]),
+                    "mileage_until_due": int(result['mileage_until_due'][row, column]),
+                    "days_until_due": int(result['days_until_due'][row, column]),
+                    "due_date": due_dates[row, column].astype(datetime),
+                    "is_overdue": bool(result['is_overdue'][row, column]),
+                    "computed_at": now,
+                }},
+                upsert=True,
+            ))
+    if operations:
+        await MaintenanceDue.get_motor_collection().bulk_write(operations, ordered=False)
+    return len(operations)
+
+
+async def run_due_dates(vehicle_ids: Optional[List[str]] = None) -> Dict[str, int]:
+    """
+    Recompute maintenance due dates for the fleet or for some vehicles.
+
+    Args:
+        vehicle_ids (List[str]): Restrict to these vehicles (all vehicles if None)
+
+    Returns:
+        Dict[str, int]: Number of vehicles scanned and due entries written
+    """
+    standard_intervals = get_standard_service_intervals()
+    service_types = list(standard_intervals)
+    intervals = np.array([standard_intervals[service_type] for service_type in service_types], dtype=float)
+    today = datetime.utcnow().date()
+    started_at = datetime.utcnow()
+
+    query = {}
+    if vehicle_ids is not None:
+        query = {"_id": {"$in": [ObjectId(vehicle_id) for vehicle_id in vehicle_ids]}}
+    cursor = Vehicle.get_motor_collection().find(
+        query, projection={"user_id": 1, "current_mileage": 1, "last_service_mileage": 1}
+    ).batch_size(_settings.DUE_DATE_BATCH_SIZE)
+
+    scanned = 0
+    written = 0
+    batch = []
+    async for vehicle in cursor:
+        batch.append(vehicle)
+        if len(batch) >= _settings.DUE_DATE_BATCH_SIZE:
+            written += await _compute_batch(batch, service_types, intervals, today)
+            scanned += len(batch)
+            batch = []
+    if batch:
+        written += await _compute_batch(batch, service_types, intervals, today)
+        scanned += len(batch)
+
+    # Entries of deleted vehicles were not refreshed by a full run
+    if vehicle_ids is None:
+        await MaintenanceDue.get_motor_collection().delete_many({"computed_at": {"$lt": started_at}})
+
+    logger.info("Computed maintenance due dates for %d vehicles", scanned)
+    return {"scanned": scanned, "written": written}
+
+
+# Global due-date job instance
+due_date_job = PeriodicJob("Due-date job", run_due_dates, _settings.DUE_DATE_INTERVAL_HOURS * 3600)
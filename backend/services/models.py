@@ -60,13 +60,12 @@ Service models for FastAPI MashinMan project using Beanie ODM with Jalali calend
 from typing import Optional, List
 from datetime import datetime, date
 from beanie import Document
+from pymongo import IndexModel
 from pydantic import BaseModel, Field, validator
 import jdatetime
 from core.jalali import gregorian_to_jalali, jalali_to_gregorian, jalali_now
 from core.utils import (
     get_service_types,
-    calculate_next_service_mileage,
-    format_persian_number,
     validate_mileage
 )
 from core.exceptions import InvalidMileageException
@@ -88,6 +87,12 @@ SERVICE_PRIORITY_CHOICES = [
     'critical', # Emergency service
 ]
 
+# Services that still have to be done
+OPEN_SERVICE_STATUSES = ['pending', 'in_progress', 'delayed']
+
+# Priorities that make an open service urgent
+URGENT_SERVICE_PRIORITIES = ['high', 'critical']
+
 
 class ServiceType(Document):
     """
@@ -131,12 +136,23 @@ class Service(Document):
     parts_cost: Optional[int] = Field(None, description="هزینه قطعات (ریال)")
     labor_cost: Optional[int] = Field(None, description="هزینه دست‌مزد (ریال)")
     
+    # Maintenance plan occurrence this service was created from
+    plan_id: Optional[str] = Field(None, description="شناسه برنامه نگهداری")
+    plan_occurrence: Optional[int] = Field(None, description="شماره نوبت در برنامه")
+    
     # Metadata
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     
     class Settings:
         name = "services"
+        indexes = [
+            IndexModel(
+                [("plan_id", 1), ("plan_occurrence", 1)],
+                unique=True,
+                partialFilterExpression={"plan_id": {"$type": "string"}},
+            ),
+        ]
     
     @validator('service_type')
     def validate_service_type(cls, v):
@@ -164,6 +180,38 @@ class Service(Document):
         return v
 
 
+class MaintenancePlan(Document):
+    """
+    Recurring maintenance rule of one service type for one vehicle.
+    
+    Occurrences are not stored; they are computed for the requested window
+    and only persisted as a Service once one is acted on.
+    """
+    vehicle_id: str = Field(..., description="شناسه خودرو")
+    user_id: str = Field(..., description="شناسه کاربر")
+    service_type: str = Field(..., description="نوع سرویس")
+    
+    # Rule: occurrence n is due at start + n intervals, whichever interval comes first
+    interval_mileage: Optional[int] = Field(None, description="فاصله سرویس (کیلومتر)")
+    interval_days: Optional[int] = Field(None, description="فاصله سرویس (روز)")
+    start_date: date = Field(..., description="تاریخ شروع")
+    start_mileage: int = Field(..., description="کیلومتر شروع")
+    
+    # Status
+    is_active: bool = Field(default=True, description="وضعیت فعال بودن")
+    
+    # Metadata
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "maintenance_plans"
+        indexes = [
+            IndexModel([("vehicle_id", 1), ("service_type", 1)], unique=True),
+            "user_id",
+        ]
+
+
 class ServiceReminder(Document):
     """
     Service reminder model for scheduling future services.
@@ -180,6 +228,8 @@ class ServiceReminder(Document):
     # Status
     is_active: bool = Field(default=True, description="وضعیت فعال بودن")
     is_sent: bool = Field(default=False, description="وضعیت ارسال")
+    sent_at: Optional[datetime] = Field(None, description="زمان ارسال")
+    dispatch_id: Optional[str] = Field(None, description="شناسه دسته ارسال")
     
     # Metadata
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -187,6 +237,144 @@ class ServiceReminder(Document):
     
     class Settings:
         name = "service_reminders"
+        indexes = [
+            [("is_active", 1), ("is_sent", 1), ("reminder_date", 1), ("_id", 1)],
+        ]
+
+
+class ReminderNotification(Document):
+    """
+    Outbox entry for a due service reminder, picked up by the notification sender.
+    """
+    reminder_id: str = Field(..., description="شناسه یادآوری")
+    service_id: str = Field(..., description="شناسه سرویس")
+    user_id: str = Field(..., description="شناسه کاربر")
+    vehicle_id: str = Field(..., description="شناسه خودرو")
+    reminder_type: str = Field(..., description="نوع یادآوری")
+    reminder_date: date = Field(..., description="تاریخ یادآوری")
+    reminder_mileage: Optional[int] = Field(None, description="کیلومتر یادآوری")
+    is_sent: bool = Field(default=False, description="وضعیت ارسال")
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "reminder_notifications"
+        indexes = [
+            [("is_sent", 1), ("created_at", 1)],
+            # At most one notification per reminder
+            IndexModel([("reminder_id", 1)], unique=True),
+        ]
+
+
+class ServiceTransitionEvent(Document):
+    """
+    Record of a service status change.
+    """
+    service_id: str = Field(..., description="شناسه سرویس")
+    user_id: str = Field(..., description="شناسه کاربر")
+    vehicle_id: str = Field(..., description="شناسه خودرو")
+    from_status: str = Field(..., description="وضعیت قبلی")
+    to_status: str = Field(..., description="وضعیت جدید")
+    changed_fields: List[str] = Field(default=[], description="فیلدهای تغییر یافته")
+    actor_id: Optional[str] = Field(None, description="شناسه کاربر انجام‌دهنده")
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "service_transitions"
+        indexes = [
+            [("service_id", 1), ("created_at", 1)],
+        ]
+
+
+class ServiceCenterCreate(BaseModel):
+    """
+    Schema for registering a service center.
+    """
+    name: str = Field(..., description="نام مرکز سرویس")
+    address: str = Field(..., description="آدرس مرکز سرویس")
+    phone: str = Field(..., description="شماره تماس مرکز سرویس")
+    latitude: float = Field(..., ge=-90, le=90, description="عرض جغرافیایی")
+    longitude: float = Field(..., ge=-180, le=180, description="طول جغرافیایی")
+    services_offered: List[str] = Field(default=[], description="سرویس‌های ارائه شده")
+    is_verified: bool = Field(default=False, description="وضعیت تأیید")
+    opening_hour: int = Field(default=8, ge=0, le=23, description="ساعت شروع کار")
+    closing_hour: int = Field(default=18, ge=1, le=24, description="ساعت پایان کار")
+    slot_minutes: int = Field(default=60, gt=0, description="مدت هر نوبت (دقیقه)")
+    slot_capacity: int = Field(default=2, gt=0, description="ظرفیت هر نوبت")
+    closed_weekdays: List[int] = Field(default=[6], description="روزهای تعطیل (۰ = شنبه)")
+
+
+class ServiceCenterOut(BaseModel):
+    """
+    Schema for a service center in search results.
+    """
+    id: str = Field(..., description="شناسه مرکز سرویس")
+    name: str = Field(..., description="نام مرکز سرویس")
+    address: str = Field(..., description="آدرس مرکز سرویس")
+    phone: str = Field(..., description="شماره تماس مرکز سرویس")
+    latitude: Optional[float] = Field(None, description="عرض جغرافیایی")
+    longitude: Optional[float] = Field(None, description="طول جغرافیایی")
+    services_offered: List[str] = Field(default=[], description="سرویس‌های ارائه شده")
+    is_verified: bool = Field(..., description="وضعیت تأیید")
+    distance_km: Optional[float] = Field(None, description="فاصله (کیلومتر)")
+    offers_service: Optional[bool] = Field(None, description="ارائه سرویس درخواستی")
+
+
+class SlotAvailabilityOut(BaseModel):
+    """
+    Schema for the availability of one time slot.
+    """
+    slot: str = Field(..., description="ساعت شروع نوبت")
+    capacity: int = Field(..., description="ظرفیت نوبت")
+    remaining: int = Field(..., description="ظرفیت باقی‌مانده")
+
+
+class DayAvailabilityOut(BaseModel):
+    """
+    Schema for the availability of a service center on one day.
+    """
+    date: str = Field(..., description="تاریخ (شمسی)")
+    weekday: str = Field(..., description="روز هفته")
+    is_closed: bool = Field(..., description="تعطیل")
+    slots: List[SlotAvailabilityOut] = Field(default=[], description="نوبت‌ها")
+
+
+class ServiceBookingCreate(BaseModel):
+    """
+    Schema for booking a service center time slot.
+    """
+    vehicle_id: str = Field(..., description="شناسه خودرو")
+    date: str = Field(..., description="تاریخ نوبت (شمسی)")
+    slot: str = Field(..., description="ساعت شروع نوبت")
+    service_id: Optional[str] = Field(None, description="شناسه سرویس")
+    service_type: Optional[str] = Field(None, description="نوع سرویس")
+
+
+class ServiceBookingOut(BaseModel):
+    """
+    Schema for a service center booking.
+    """
+    id: str = Field(..., description="شناسه رزرو")
+    center_id: str = Field(..., description="شناسه مرکز سرویس")
+    vehicle_id: str = Field(..., description="شناسه خودرو")
+    service_id: Optional[str] = Field(None, description="شناسه سرویس")
+    service_type: Optional[str] = Field(None, description="نوع سرویس")
+    date: str = Field(..., description="تاریخ نوبت (شمسی)")
+    slot: str = Field(..., description="ساعت شروع نوبت")
+    status: str = Field(..., description="وضعیت رزرو")
+
+
+class ServiceStatusUpdate(BaseModel):
+    """
+    Schema for moving a service to another status.
+    """
+    status: str = Field(..., description="وضعیت جدید")
+    expected_status: Optional[str] = Field(None, description="وضعیت فعلی مورد انتظار")
+
+    @validator('status', 'expected_status')
+    def validate_status(cls, v):
+        if v is not None and v not in SERVICE_STATUS_CHOICES:
+            raise ValueError("وضعیت سرویس نامعتبر است")
+        return v
 
 
 class ServiceCenter(Document):
@@ -198,17 +386,105 @@ class ServiceCenter(Document):
     phone: str = Field(..., description="شماره تماس مرکز سرویس")
     latitude: Optional[float] = Field(None, description="عرض جغرافیایی")
     longitude: Optional[float] = Field(None, description="طول جغرافیایی")
+    # GeoJSON point of latitude/longitude, used for distance queries
+    location: Optional[dict] = Field(None, description="موقعیت جغرافیایی (GeoJSON)")
     
     # Service capabilities
     services_offered: List[str] = Field(default=[], description="سرویس‌های ارائه شده")
     is_verified: bool = Field(default=False, description="وضعیت تأیید")
     
+    # Booking capacity
+    opening_hour: int = Field(default=8, description="ساعت شروع کار")
+    closing_hour: int = Field(default=18, description="ساعت پایان کار")
+    slot_minutes: int = Field(default=60, description="مدت هر نوبت (دقیقه)")
+    slot_capacity: int = Field(default=2, description="ظرفیت هر نوبت")
+    closed_weekdays: List[int] = Field(default=[6], description="روزهای تعطیل (۰ = شنبه)")
+    
     # Metadata
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     
     class Settings:
         name = "service_centers"
+        indexes = [
+            IndexModel([("location", "2dsphere")]),
+        ]
+
+
+class ServiceCenterSlot(Document):
+    """
+    Booked count of one time slot of a service center on one day.
+    
+    Created by the first booking of the slot; slots without a document are
+    fully available.
+    """
+    center_id: str = Field(..., description="شناسه مرکز سرویس")
+    day: datetime = Field(..., description="روز نوبت")
+    slot: str = Field(..., description="ساعت شروع نوبت")
+    booked: int = Field(default=0, description="تعداد رزرو شده")
+    capacity: int = Field(..., description="ظرفیت نوبت")
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "service_center_slots"
+        indexes = [
+            IndexModel([("center_id", 1), ("day", 1), ("slot", 1)], unique=True),
+        ]
+
+
+class ServiceBooking(Document):
+    """
+    A vehicle's booking of a service center time slot.
+    """
+    center_id: str = Field(..., description="شناسه مرکز سرویس")
+    user_id: str = Field(..., description="شناسه کاربر")
+    vehicle_id: str = Field(..., description="شناسه خودرو")
+    service_id: Optional[str] = Field(None, description="شناسه سرویس")
+    service_type: Optional[str] = Field(None, description="نوع سرویس")
+    day: datetime = Field(..., description="روز نوبت")
+    slot: str = Field(..., description="ساعت شروع نوبت")
+    status: str = Field(default="booked", description="وضعیت رزرو")
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "service_bookings"
+        indexes = [
+            [("user_id", 1), ("day", 1)],
+        ]
+
+
+class MaintenanceDue(Document):
+    """
+    Precomputed due mileage and due date of one service type for one vehicle.
+    """
+    vehicle_id: str = Field(..., description="شناسه خودرو")
+    user_id: str = Field(..., description="شناسه کاربر")
+    service_type: str = Field(..., description="نوع سرویس")
+    
+    # Inputs
+    interval_mileage: int = Field(..., description="فاصله سرویس (کیلومتر)")
+    current_mileage: int = Field(..., description="کیلومتر فعلی")
+    last_service_mileage: Optional[int] = Field(None, description="کیلومتر آخرین سرویس")
+    last_service_date: Optional[date] = Field(None, description="تاریخ آخرین سرویس")
+    daily_mileage_rate: float = Field(..., description="میانگین کیلومتر روزانه")
+    
+    # Results
+    due_mileage: int = Field(..., description="کیلومتر سررسید")
+    mileage_until_due: int = Field(..., description="کیلومتر باقی‌مانده تا سررسید")
+    days_until_due: int = Field(..., description="روز باقی‌مانده تا سررسید")
+    due_date: date = Field(..., description="تاریخ تخمینی سررسید")
+    is_overdue: bool = Field(default=False, description="سررسید گذشته")
+    
+    # Metadata
+    computed_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "maintenance_due"
+        indexes = [
+            IndexModel([("vehicle_id", 1), ("service_type", 1)], unique=True),
+            [("user_id", 1), ("due_date", 1)],
+        ]
 
 
 # Pydantic models for API
@@ -310,3 +586,108 @@ class ServiceOut(ServiceCreate):
     id: str = Field(..., description="شناسه سرویس")
     created_at: datetime = Field(..., description="تاریخ ایجاد")
     updated_at: datetime = Field(..., description="تاریخ به‌روزرسانی")
+
+
+class BulkServiceCreate(BaseModel):
+    """
+    Schema for scheduling the same service for many vehicles.
+    """
+    vehicle_ids: List[str] = Field(..., min_length=1, description="شناسه خودروها")
+    service_type: str = Field(..., description="نوع سرویس")
+    description: Optional[str] = Field(None, description="توضیحات سرویس")
+    priority: str = Field(default="medium", description="اولویت سرویس")
+    scheduled_date: Optional[str] = Field(None, description="تاریخ برنامه‌ریزی شده (شمسی)")
+    mileage_interval: Optional[int] = Field(None, gt=0, description="کیلومتر سرویس پس از کیلومتر فعلی هر خودرو")
+    
+    @validator('service_type')
+    def validate_service_type(cls, v):
+        if v not in get_service_types():
+            raise ValueError("نوع سرویس نامعتبر است")
+        return v
+    
+    @validator('priority')
+    def validate_priority(cls, v):
+        if v not in SERVICE_PRIORITY_CHOICES:
+            raise ValueError("اولویت سرویس نامعتبر است")
+        return v
+
+
+class BulkServiceResultOut(BaseModel):
+    """
+    Schema for the scheduling result of one vehicle.
+    """
+    vehicle_id: str = Field(..., description="شناسه خودرو")
+    status: str = Field(..., description="نتیجه (created, exists, not_found, forbidden, failed)")
+    service_id: Optional[str] = Field(None, description="شناسه سرویس")
+    detail: Optional[str] = Field(None, description="توضیح خطا")
+
+
+class BulkServiceOut(BaseModel):
+    """
+    Schema for the result of bulk service scheduling.
+    """
+    created: int = Field(..., description="تعداد سرویس‌های ایجاد شده")
+    skipped: int = Field(..., description="تعداد خودروهای بدون سرویس جدید")
+    results: List[BulkServiceResultOut] = Field(default=[], description="نتیجه هر خودرو")
+
+
+class MaintenanceDueOut(BaseModel):
+    """
+    Schema for a vehicle's upcoming maintenance of one service type.
+    """
+    vehicle_id: str = Field(..., description="شناسه خودرو")
+    service_type: str = Field(..., description="نوع سرویس")
+    interval_mileage: int = Field(..., description="فاصله سرویس (کیلومتر)")
+    last_service_mileage: Optional[int] = Field(None, description="کیلومتر آخرین سرویس")
+    due_mileage: int = Field(..., description="کیلومتر سررسید")
+    mileage_until_due: int = Field(..., description="کیلومتر باقی‌مانده تا سررسید")
+    days_until_due: int = Field(..., description="روز باقی‌مانده تا سررسید")
+    due_date: str = Field(..., description="تاریخ تخمینی سررسید (شمسی)")
+    is_overdue: bool = Field(..., description="سررسید گذشته")
+    daily_mileage_rate: float = Field(..., description="میانگین کیلومتر روزانه")
+
+
+class MaintenancePlanCreate(BaseModel):
+    """
+    Schema for creating a recurring maintenance plan.
+    """
+    vehicle_id: str = Field(..., description="شناسه خودرو")
+    service_type: str = Field(..., description="نوع سرویس")
+    interval_mileage: Optional[int] = Field(None, description="فاصله سرویس (کیلومتر)")
+    interval_days: Optional[int] = Field(None, description="فاصله سرویس (روز)")
+    start_date: Optional[str] = Field(None, description="تاریخ شروع (شمسی)")
+    start_mileage: Optional[int] = Field(None, description="کیلومتر شروع")
+    
+    @validator('interval_mileage', 'interval_days')
+    def validate_interval(cls, v):
+        if v is not None and v <= 0:
+            raise ValueError("فاصله سرویس باید بیشتر از صفر باشد")
+        return v
+
+
+class MaintenancePlanOut(BaseModel):
+    """
+    Schema for a recurring maintenance plan.
+    """
+    id: str = Field(..., description="شناسه برنامه")
+    vehicle_id: str = Field(..., description="شناسه خودرو")
+    service_type: str = Field(..., description="نوع سرویس")
+    interval_mileage: Optional[int] = Field(None, description="فاصله سرویس (کیلومتر)")
+    interval_days: Optional[int] = Field(None, description="فاصله سرویس (روز)")
+    start_date: str = Field(..., description="تاریخ شروع (شمسی)")
+    start_mileage: int = Field(..., description="کیلومتر شروع")
+    is_active: bool = Field(..., description="وضعیت فعال بودن")
+
+
+class PlanOccurrenceOut(BaseModel):
+    """
+    Schema for one occurrence of a maintenance plan.
+    """
+    plan_id: str = Field(..., description="شناسه برنامه")
+    occurrence: int = Field(..., description="شماره نوبت")
+    vehicle_id: str = Field(..., description="شناسه خودرو")
+    service_type: str = Field(..., description="نوع سرویس")
+    due_date: str = Field(..., description="تاریخ سررسید (شمسی)")
+    due_mileage: Optional[int] = Field(None, description="کیلومتر سررسید")
+    service_id: Optional[str] = Field(None, description="شناسه سرویس ثبت‌شده")
+    status: str = Field(..., description="وضعیت (planned یا وضعیت سرویس)")
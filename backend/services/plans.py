@@ -0,0 +1,221 @@
+"""
+Recurring maintenance plans for FastAPI MashinMan project.
+
+A MaintenancePlan stores only its rule. Occurrences inside a requested
+date window are computed on read, overlaid with the services already
+created from the plan, and an occurrence becomes a Service document only
+when it is acted on.
+"""
+
+import logging
+import math
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+from pymongo import ReturnDocument
+
+from .models import MaintenancePlan, MaintenanceDue, Service
+from .due_dates import SERVICE_TYPE_ALIASES
+from core.config import get_settings
+from core.utils import get_service_types, get_standard_service_intervals
+
+logger = logging.getLogger('mashinman')
+_settings = get_settings()
+
+# Standard interval names mapped to the service type a Service is created with
+_INTERVAL_SERVICE_TYPES = {target: alias for alias, target in SERVICE_TYPE_ALIASES.items()}
+
+
+class PlanOccurrence(NamedTuple):
+    plan: MaintenancePlan
+    occurrence: int
+    due_date: date
+    due_mileage: Optional[int]
+
+
+def default_interval_mileage(service_type: str) -> Optional[int]:
+    """Standard mileage interval of a service type, if it has one."""
+    intervals = get_standard_service_intervals()
+    return intervals.get(service_type) or intervals.get(SERVICE_TYPE_ALIASES.get(service_type))
+
+
+def is_plannable(service_type: str) -> bool:
+    return service_type in get_service_types() or service_type in get_standard_service_intervals()
+
+
+def service_type_for(plan: MaintenancePlan) -> str:
+    """Service type of the Service created from a plan occurrence."""
+    if plan.service_type in get_service_types():
+        return plan.service_type
+    return _INTERVAL_SERVICE_TYPES.get(plan.service_type, plan.service_type)
+
+
+def _due_date(plan: MaintenancePlan, occurrence: int, today: date, current_mileage: int, daily_rate: float) -> date:
+    candidates = []
+    if plan.interval_days:
+        candidates.append(plan.start_date + timedelta(days=occurrence * plan.interval_days))
+    if plan.interval_mileage:
+        due_mileage = plan.start_mileage + occurrence * plan.interval_mileage
+        candidates.append(today + timedelta(days=math.floor((due_mileage - current_mileage) / daily_rate)))
+    return min(candidates)
+
+
+def _first_occurrence(plan: MaintenancePlan, start: date, today: date, current_mileage: int, daily_rate: float) -> int:
+    # An occurrence is inside the window only once both interval estimates are; due dates grow with the number
+    bounds = []
+    if plan.interval_days:
+        bounds.append(math.ceil((start - plan.start_date).days / plan.interval_days))
+    if plan.interval_mileage:
+        mileage_at_start = current_mileage + (start - today).days * daily_rate
+        bounds.append(math.floor((mileage_at_start - plan.start_mileage) / plan.interval_mileage))
+    return max(bounds + [1])
+
+
+def expand_plan(
+    plan: MaintenancePlan,
+    start: date,
+    end: date,
+    current_mileage: int,
+    daily_rate: float,
+    today: Optional[date] = None,
+) -> Iterator[PlanOccurrence]:
+    """
+    Generate the occurrences of a plan due within [start, end].
+
+    Args:
+        plan (MaintenancePlan): Plan rule
+        start (date): First day of the window
+        end (date): Last day of the window
+        current_mileage (int): Vehicle's current mileage
+        daily_rate (float): Estimated km driven per day
+        today (date): Reference day for mileage based estimates
+
+    Yields:
+        PlanOccurrence: Occurrences in due order
+    """
+    today = today or datetime.utcnow().date()
+    occurrence = _first_occurrence(plan, start, today, current_mileage, daily_rate)
+    for _ in range(_settings.MAINTENANCE_PLAN_MAX_OCCURRENCES):
+        due_date = _due_date(plan, occurrence, today, current_mileage, daily_rate)
+        if due_date > end:
+            return
+        if due_date >= start:
+            due_mileage = plan.start_mileage + occurrence * plan.interval_mileage if plan.interval_mileage else None
+            yield PlanOccurrence(plan, occurrence, due_date, due_mileage)
+        occurrence += 1
+
+
+async def get_plan_occurrences(vehicles: List, start: date, end: date) -> List[Dict]:
+    """
+    Compute the plan occurrences of some vehicles within a date window.
+
+    Args:
+        vehicles (List[Vehicle]): Vehicles whose plans are expanded
+        start (date): First day of the window
+        end (date): Last day of the window
+
+    Returns:
+        List[Dict]: Fields of PlanOccurrenceOut (due_date as a date), in due order
+    """
+    vehicle_ids = [str(vehicle.id) for vehicle in vehicles]
+    plans = await MaintenancePlan.find(
+        {"vehicle_id": {"$in": vehicle_ids}, "is_active": True}
+    ).to_list()
+    if not plans:
+        return []
+
+    # Daily mileage rates estimated by the due-date engine
+    rates: Dict[str, float] = {}
+    async for due in MaintenanceDue.get_motor_collection().find(
+        {"vehicle_id": {"$in": vehicle_ids}}, projection={"vehicle_id": 1, "daily_mileage_rate": 1}
+    ):
+        rates[due["vehicle_id"]] = due["daily_mileage_rate"]
+    mileage = {str(vehicle.id): vehicle.current_mileage for vehicle in vehicles}
+
+    occurrences = []
+    for plan in plans:
+        occurrences.extend(expand_plan(
+            plan, start, end,
+            current_mileage=mileage.get(plan.vehicle_id, plan.start_mileage),
+            daily_rate=rates.get(plan.vehicle_id) or _settings.DUE_DATE_DEFAULT_DAILY_MILEAGE,
+        ))
+    if not occurrences:
+        return []
+
+    # Overlay the occurrences that were already acted on
+    materialized = {}
+    async for service in Service.get_motor_collection().find(
+        {"plan_id": {"$in": [str(plan.id) for plan in plans]}},
+        projection={"plan_id": 1, "plan_occurrence": 1, "status": 1},
+    ):
+        materialized[(service["plan_id"], service["plan_occurrence"])] = service
+
+    result = []
+    for item in sorted(occurrences, key=lambda item: item.due_date):
+        service = materialized.get((str(item.plan.id), item.occurrence))
+        result.append({
+            "plan_id": str(item.plan.id),
+            "occurrence": item.occurrence,
+            "vehicle_id": item.plan.vehicle_id,
+            "service_type": item.plan.service_type,
+            "due_date": item.due_date,
+            "due_mileage": item.due_mileage,
+            "service_id": str(service["_id"]) if service else None,
+            "status": service["status"] if service else "planned",
+        })
+    return result
+
+
+async def resolve_occurrence(plan: MaintenancePlan, occurrence: int, current_mileage: int) -> PlanOccurrence:
+    """
+    Compute the due date and mileage of one occurrence of a plan.
+
+    Args:
+        plan (MaintenancePlan): Plan
+        occurrence (int): Occurrence number (1 is the first after the plan start)
+        current_mileage (int): Vehicle's current mileage
+
+    Returns:
+        PlanOccurrence: The occurrence
+    """
+    due = await MaintenanceDue.get_motor_collection().find_one(
+        {"vehicle_id": plan.vehicle_id}, projection={"daily_mileage_rate": 1}
+    )
+    daily_rate = (due or {}).get("daily_mileage_rate") or _settings.DUE_DATE_DEFAULT_DAILY_MILEAGE
+    due_date = _due_date(plan, occurrence, datetime.utcnow().date(), current_mileage, daily_rate)
+    due_mileage = plan.start_mileage + occurrence * plan.interval_mileage if plan.interval_mileage else None
+    return PlanOccurrence(plan, occurrence, due_date, due_mileage)
+
+
+async def materialize_occurrence(plan: MaintenancePlan, occurrence: int, due_date: date, due_mileage: Optional[int]) -> Service:
+    """
+    Persist a plan occurrence as a Service, or return the one created before.
+
+    Args:
+        plan (MaintenancePlan): Plan
+        occurrence (int): Occurrence number
+        due_date (date): Due date of the occurrence
+        due_mileage (int): Due mileage of the occurrence
+
+    Returns:
+        Service: The service of this occurrence
+    """
+    now = datetime.utcnow()
+    # Upsert on (plan_id, plan_occurrence) so acting twice never creates two services
+    document = await Service.get_motor_collection().find_one_and_update(
+        {"plan_id": str(plan.id), "plan_occurrence": occurrence},
+        {"$setOnInsert": {
+            "vehicle_id": plan.vehicle_id,
+            "user_id": plan.user_id,
+            "service_type": service_type_for(plan),
+            "status": "pending",
+            "priority": "medium",
+            "scheduled_date": datetime.combine(due_date, datetime.min.time()),
+            "scheduled_mileage": due_mileage,
+            "created_at": now,
+            "updated_at": now,
+        }},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return Service.parse_obj(document)
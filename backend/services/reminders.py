@@ -0,0 +1,191 @@
+"""
+Service reminder dispatcher for FastAPI MashinMan project.
+
+Unsent reminders are paged in from the database in due order and kept in a
+min-heap of (due time, reminder id). The dispatcher sleeps until the
+earliest one is due, then sends every due reminder in batches: one
+update_many claims the reminders still pending, and only the claimed ones
+are written to the notification outbox with one insert_many, so a reminder
+is never sent twice by concurrent dispatchers. Further reminders are only
+read once the loaded ones have been dispatched.
+"""
+
+import asyncio
+import heapq
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional, Set, Tuple
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from .models import ServiceReminder, ReminderNotification
+from core.config import get_settings
+
+logger = logging.getLogger('mashinman')
+_settings = get_settings()
+
+_PENDING_FILTER = {"is_active": True, "is_sent": False}
+
+
+class ReminderDispatcher:
+    """
+    Sends service reminders when they fall due.
+    """
+
+    def __init__(self, page_size: int, batch_size: int, rescan_seconds: float, dispatch_hour: int):
+        self.page_size = page_size
+        self.batch_size = batch_size
+        self.rescan_seconds = rescan_seconds
+        self.dispatch_hour = dispatch_hour
+        self._heap: List[Tuple[datetime, str]] = []
+        self._ids: Set[str] = set()
+        # (reminder_date, _id) of the last reminder paged in
+        self._cursor: Optional[Tuple[datetime, ObjectId]] = None
+        self._exhausted = False
+        self._scanned_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def due_at(self, reminder_date) -> datetime:
+        """Time at which a reminder for reminder_date is sent."""
+        if isinstance(reminder_date, datetime):
+            reminder_date = reminder_date.date()
+        return datetime.combine(reminder_date, datetime.min.time()) + timedelta(hours=self.dispatch_hour)
+
+    def _push(self, due_at: datetime, reminder_id: str) -> None:
+        if reminder_id not in self._ids:
+            self._ids.add(reminder_id)
+            heapq.heappush(self._heap, (due_at, reminder_id))
+
+    def _reset(self) -> None:
+        # Picks up reminders written by other processes or edited since they were loaded
+        self._heap = []
+        self._ids = set()
+        self._cursor = None
+        self._exhausted = False
+        self._scanned_at = time.monotonic()
+
+    async def _page_in(self) -> int:
+        query = dict(_PENDING_FILTER)
+        if self._cursor is not None:
+            last_date, last_id = self._cursor
+            query["$or"] = [
+                {"reminder_date": {"$gt": last_date}},
+                {"reminder_date": last_date, "_id": {"$gt": last_id}},
+            ]
+        page = await ServiceReminder.get_motor_collection().find(
+            query, projection={"reminder_date": 1}
+        ).sort([("reminder_date", 1), ("_id", 1)]).limit(self.page_size).to_list(length=None)
+
+        for reminder in page:
+            self._push(self.due_at(reminder["reminder_date"]), str(reminder["_id"]))
+        if page:
+            self._cursor = (page[-1]["reminder_date"], page[-1]["_id"])
+        self._exhausted = len(page) < self.page_size
+        return len(page)
+
+    async def dispatch(self, reminder_ids: List[str]) -> int:
+        """
+        Send a batch of reminders.
+
+        Args:
+            reminder_ids (List[str]): IDs of due reminders
+
+        Returns:
+            int: Number of reminders sent
+        """
+        # Claim the reminders first; ones deactivated or claimed by another dispatcher are skipped
+        collection = ServiceReminder.get_motor_collection()
+        dispatch_id = str(ObjectId())
+        now = datetime.utcnow()
+        ids = [ObjectId(reminder_id) for reminder_id in reminder_ids]
+        await collection.update_many(
+            {"_id": {"$in": ids}, **_PENDING_FILTER},
+            {"$set": {"is_sent": True, "sent_at": now, "updated_at": now, "dispatch_id": dispatch_id}},
+        )
+        self._ids.difference_update(reminder_ids)
+        # Scoped by _id so the claimed reminders are read through the primary key index
+        reminders = await collection.find({"_id": {"$in": ids}, "dispatch_id": dispatch_id}).to_list(length=None)
+        if not reminders:
+            return 0
+
+        try:
+            await ReminderNotification.insert_many([
+                ReminderNotification(
+                    reminder_id=str(reminder["_id"]),
+                    service_id=reminder["service_id"],
+                    user_id=reminder["user_id"],
+                    vehicle_id=reminder["vehicle_id"],
+                    reminder_type=reminder["reminder_type"],
+                    reminder_date=reminder["reminder_date"],
+                    reminder_mileage=reminder.get("reminder_mileage"),
+                )
+                for reminder in reminders
+            ], ordered=False)
+        except BulkWriteError as exc:
+            # Notifications already in the outbox (unique reminder_id) are fine, anything else is released
+            failed = [error["index"] for error in exc.details.get("writeErrors", []) if error.get("code") != 11000]
+            if failed:
+                await collection.update_many(
+                    {"_id": {"$in": [reminders[index]["_id"] for index in failed]}, "dispatch_id": dispatch_id},
+                    {"$set": {"is_sent": False, "sent_at": None, "dispatch_id": None}},
+                )
+            return len(reminders) - len(failed)
+        except Exception:
+            # Release the claim so the next rescan retries; the unique reminder_id stops duplicates
+            await collection.update_many(
+                {"_id": {"$in": [reminder["_id"] for reminder in reminders]}, "dispatch_id": dispatch_id},
+                {"$set": {"is_sent": False, "sent_at": None, "dispatch_id": None}},
+            )
+            raise
+        return len(reminders)
+
+    async def _run(self) -> None:
+        self._reset()
+        while True:
+            try:
+                if time.monotonic() - self._scanned_at >= self.rescan_seconds:
+                    self._reset()
+
+                if not self._heap and not self._exhausted:
+                    await self._page_in()
+                    continue
+
+                now = datetime.utcnow()
+                if self._heap and self._heap[0][0] <= now:
+                    batch = []
+                    while self._heap and self._heap[0][0] <= now and len(batch) < self.batch_size:
+                        batch.append(heapq.heappop(self._heap)[1])
+                    sent = await self.dispatch(batch)
+                    logger.info("Dispatched %d service reminders", sent)
+                    continue
+
+                timeout = self.rescan_seconds - (time.monotonic() - self._scanned_at)
+                if self._heap:
+                    timeout = min(timeout, (self._heap[0][0] - now).total_seconds())
+                await asyncio.sleep(max(timeout, 0))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Reminder dispatcher failed, rescanning")
+                await asyncio.sleep(self.rescan_seconds)
+                self._reset()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+# Global reminder dispatcher instance
+reminder_dispatcher = ReminderDispatcher(
+    page_size=_settings.REMINDER_PAGE_SIZE,
+    batch_size=_settings.REMINDER_BATCH_SIZE,
+    rescan_seconds=_settings.REMINDER_RESCAN_SECONDS,
+    dispatch_hour=_settings.REMINDER_DISPATCH_HOUR,
+)
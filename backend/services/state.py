@@ -0,0 +1,148 @@
+"""
+Service state machine for FastAPI MashinMan project.
+
+Status changes are applied with one conditional find_one_and_update: the
+filter only matches while the service is still in the status the change
+was allowed from, and only the changed fields are $set. A concurrent
+writer that got there first makes the filter miss instead of being
+overwritten.
+"""
+
+import logging
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from .models import Service, ServiceTransitionEvent
+
+logger = logging.getLogger('mashinman')
+
+# Allowed target statuses of each status
+SERVICE_TRANSITIONS = {
+    'pending': {'in_progress', 'cancelled', 'delayed', 'completed'},
+    'in_progress': {'completed', 'cancelled', 'delayed'},
+    'delayed': {'pending', 'in_progress', 'cancelled', 'completed'},
+    'completed': set(),
+    'cancelled': set(),
+}
+
+
+class ServiceTransitionError(Exception):
+    """
+    Raised when a service cannot be moved to a status.
+
+    current_status is None when the service does not exist (or is not the
+    user's); otherwise the change was illegal from current_status or lost a
+    race against another writer.
+    """
+
+    def __init__(self, target: str, current_status: Optional[str]):
+        self.target = target
+        self.current_status = current_status
+        super().__init__(f"Cannot move service from {current_status} to {target}")
+
+
+def can_transition(source: str, target: str) -> bool:
+    return target in SERVICE_TRANSITIONS.get(source, set())
+
+
+def _sources(target: str) -> List[str]:
+    return [source for source, targets in SERVICE_TRANSITIONS.items() if target in targets]
+
+
+def to_bson_value(value: Any) -> Any:
+    """Dates are stored as midnight datetimes, BSON has no date type."""
+    if isinstance(value, date) and not isinstance(value, datetime):
+        return datetime.combine(value, datetime.min.time())
+    return value
+
+
+async def update_service_fields(service_id: str, user_id: str, fields: Dict[str, Any]) -> Optional[Service]:
+    """
+    Set some non-status fields of a service in one round trip.
+
+    Args:
+        service_id (str): Service ID
+        user_id (str): Owner of the service
+        fields (Dict[str, Any]): Fields to set
+
+    Returns:
+        Optional[Service]: The updated service, or None if not found
+    """
+    if not ObjectId.is_valid(service_id):
+        return None
+    document = await Service.get_motor_collection().find_one_and_update(
+        {"_id": ObjectId(service_id), "user_id": user_id},
+        {"$set": {
+            **{key: to_bson_value(value) for key, value in fields.items()},
+            "updated_at": datetime.utcnow(),
+        }},
+        return_document=ReturnDocument.AFTER,
+    )
+    return Service.parse_obj(document) if document else None
+
+
+async def transition_service(
+    service_id: str,
+    user_id: str,
+    target: str,
+    fields: Optional[Dict[str, Any]] = None,
+    expected_status: Optional[str] = None,
+    session=None,
+) -> Service:
+    """
+    Move a service to another status atomically.
+
+    Args:
+        service_id (str): Service ID
+        user_id (str): Owner of the service, also recorded as the actor
+        target (str): Target status
+        fields (Dict[str, Any]): Other fields changed along with the status
+        expected_status (str): Only apply if the service is in this status
+        session (AsyncIOMotorClientSession): Session of an enclosing transaction
+
+    Returns:
+        Service: The updated service
+
+    Raises:
+        ServiceTransitionError: If the service is missing, the transition is
+            not allowed from its status, or another writer changed it first
+    """
+    sources = _sources(target)
+    if expected_status is not None:
+        sources = [expected_status] if expected_status in sources else []
+    if not ObjectId.is_valid(service_id):
+        raise ServiceTransitionError(target, None)
+
+    collection = Service.get_motor_collection()
+    changes = {key: to_bson_value(value) for key, value in (fields or {}).items()}
+    changes.update({"status": target, "updated_at": datetime.utcnow()})
+
+    before = None
+    if sources:
+        # The previous document is returned so the event knows the status it left
+        before = await collection.find_one_and_update(
+            {"_id": ObjectId(service_id), "user_id": user_id, "status": {"$in": sources}},
+            {"$set": changes},
+            return_document=ReturnDocument.BEFORE,
+            session=session,
+        )
+    if before is None:
+        current = await collection.find_one(
+            {"_id": ObjectId(service_id), "user_id": user_id}, projection={"status": 1}, session=session
+        )
+        raise ServiceTransitionError(target, current["status"] if current else None)
+
+    await ServiceTransitionEvent(
+        service_id=service_id,
+        user_id=user_id,
+        vehicle_id=before["vehicle_id"],
+        from_status=before["status"],
+        to_status=target,
+        changed_fields=sorted(key for key in changes if before.get(key) != changes[key]),
+        actor_id=user_id,
+    ).insert(session=session)
+    logger.info("Service %s moved from %s to %s", service_id, before["status"], target)
+    return Service.parse_obj({**before, **changes})
@@ -1,3 +1,47 @@
-from django.test import TestCase
+"""
+Tests for the services app.
+"""
 
-# Create your tests here.
+import numpy as np
+
+from services.due_dates import compute_due
+
+INTERVALS = np.array([10000.0, 40000.0])
+
+
+def test_compute_due_counts_from_the_last_service_of_each_type():
+    result = compute_due(
+        current_mileage=np.array([25000.0]),
+        last_service_mileage=np.array([[20000.0, 10000.0]]),
+        intervals=INTERVALS,
+        daily_rate=np.array([50.0]),
+    )
+
+    assert result['due_mileage'].tolist() == [[30000, 50000]]
+    assert result['mileage_until_due'].tolist() == [[5000, 25000]]
+    assert result['days_until_due'].tolist() == [[100, 500]]
+    assert result['is_overdue'].tolist() == [[False, False]]
+
+
+def test_compute_due_never_serviced_type_uses_fallback_mileage():
+    result = compute_due(
+        current_mileage=np.array([25000.0, 25000.0]),
+        last_service_mileage=np.full((2, 2), np.nan),
+        intervals=INTERVALS,
+        daily_rate=np.array([50.0, 50.0]),
+        fallback_mileage=np.array([0.0, 18000.0]),
+    )
+
+    assert result['due_mileage'].tolist() == [[10000, 40000], [28000, 58000]]
+    assert result['is_overdue'].tolist() == [[True, False], [False, False]]
+
+
+def test_compute_due_never_serviced_vehicle_without_fallback_can_be_overdue():
+    result = compute_due(
+        current_mileage=np.array([12000.0]),
+        last_service_mileage=np.full((1, 2), np.nan),
+        intervals=INTERVALS,
+        daily_rate=np.array([40.0]),
+    )
+
+    assert result['is_overdue'].tolist() == [[True, False]]
@@ -0,0 +1,97 @@
+"""
+Telemetry API router for FastAPI MashinMan project.
+"""
+
+import math
+from typing import Any, List, Tuple
+
+import msgpack
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from pydantic import ValidationError
+
+from .buffer import telemetry_buffer
+from .models import TelemetryFrame, TelemetryIngestOut
+from users.models import User
+from users.dependencies import get_current_active_user
+from core.config import get_settings
+
+router = APIRouter(prefix="/telemetry", tags=["telemetry"])
+_settings = get_settings()
+
+MSGPACK_CONTENT_TYPES = ('application/msgpack', 'application/x-msgpack')
+
+
+def _unpack_msgpack(body: bytes) -> List[Any]:
+    # A stream of frames, or of arrays of frames
+    items = []
+    unpacker = msgpack.Unpacker(raw=False, timestamp=3)
+    unpacker.feed(body)
+    for item in unpacker:
+        items.extend(item if isinstance(item, list) else [item])
+    return items
+
+
+@router.post("/frames", response_model=TelemetryIngestOut, status_code=status.HTTP_202_ACCEPTED)
+async def ingest_frames(
+    request: Request,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Accept a batch of OBD-II frames as NDJSON or msgpack"""
+    body = await request.body()
+    content_type = request.headers.get('content-type', '').split(';')[0].strip()
+
+    if content_type in MSGPACK_CONTENT_TYPES:
+        try:
+            items = _unpack_msgpack(body)
+        except (ValueError, msgpack.UnpackException) as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"msgpack نامعتبر: {e}"
+            )
+    else:
+        items = [line for line in body.splitlines() if line.strip()]
+
+    if len(items) > _settings.TELEMETRY_MAX_FRAMES_PER_REQUEST:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"حداکثر {_settings.TELEMETRY_MAX_FRAMES_PER_REQUEST} فریم در هر درخواست مجاز است"
+        )
+
+    frames: List[Tuple[int, TelemetryFrame]] = []
+    errors = []
+    for index, item in enumerate(items):
+        try:
+            # NDJSON lines are parsed and validated in one pass
+            if isinstance(item, bytes):
+                frames.append((index, TelemetryFrame.model_validate_json(item)))
+            else:
+                frames.append((index, TelemetryFrame.model_validate(item)))
+        except ValidationError as e:
+            errors.append({"index": index, "error": "; ".join(
+                f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors()
+            )})
+
+    # Check if user owns the vehicles
+    owned = set(await telemetry_buffer.owned(
+        str(current_user.id), list(dict.fromkeys(frame.vehicle_id for _, frame in frames))
+    ))
+    accepted = []
+    for index, frame in frames:
+        if frame.vehicle_id in owned:
+            accepted.append(frame.dict())
+        else:
+            errors.append({"index": index, "error": "خودرو یافت نشد"})
+
+    if not telemetry_buffer.add(accepted):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="صف داده‌های تله‌متری پر است، بعدا تلاش کنید",
+            headers={"Retry-After": str(math.ceil(_settings.TELEMETRY_FLUSH_SECONDS))}
+        )
+
+    return TelemetryIngestOut(
+        accepted=len(accepted),
+        rejected=len(errors),
+        errors=errors,
+        buffered=len(telemetry_buffer),
+    )
@@ -0,0 +1,197 @@
+"""
+Telemetry ingestion buffer for FastAPI MashinMan project.
+
+Accepted OBD-II frames are coalesced per vehicle in memory and written in
+one unordered insert_many into the telemetry_readings time-series
+collection, either when enough frames are buffered or every few seconds.
+The same flush moves each vehicle's current_mileage forward with one
+bulk_write and appends one odometer reading per vehicle. When the buffer is
+full new frames are refused, so devices back off until it has drained.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from .models import TelemetryReading
+from vehicles.models import Vehicle, MileageReading
+from core.config import get_settings
+
+logger = logging.getLogger('mashinman')
+_settings = get_settings()
+
+
+class TelemetryBuffer:
+    """
+    Buffers telemetry frames per vehicle and writes them in batches.
+    """
+
+    def __init__(
+        self,
+        flush_size: int,
+        flush_seconds: float,
+        max_buffered: int,
+        owner_cache_seconds: float,
+        owner_cache_size: int,
+    ):
+        self.flush_size = flush_size
+        self.flush_seconds = flush_seconds
+        self.max_buffered = max_buffered
+        self.owner_cache_seconds = owner_cache_seconds
+        self.owner_cache_size = owner_cache_size
+        self._pending: Dict[str, List[Dict]] = {}
+        self._size = 0
+        # vehicle_id -> (user_id, expiry), in expiry order
+        self._owners: "OrderedDict[str, Tuple[Optional[str], float]]" = OrderedDict()
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return self._size
+
+    async def owned(self, user_id: str, vehicle_ids: List[str]) -> List[str]:
+        """
+        Filter vehicle IDs down to the ones owned by a user.
+
+        Args:
+            user_id (str): User ID
+            vehicle_ids (List[str]): Vehicle IDs
+
+        Returns:
+            List[str]: The vehicle IDs owned by the user
+        """
+        now = time.monotonic()
+        owners: Dict[str, Optional[str]] = {}
+        missing = []
+        for vehicle_id in set(vehicle_ids):
+            cached = self._owners.get(vehicle_id)
+            if cached is not None and cached[1] >= now:
+                owners[vehicle_id] = cached[0]
+            else:
+                missing.append(vehicle_id)
+        if missing:
+            fetched: Dict[str, Optional[str]] = dict.fromkeys(missing)
+            async for vehicle in Vehicle.get_motor_collection().find(
+                {"_id": {"$in": [ObjectId(vehicle_id) for vehicle_id in missing]}}, projection={"user_id": 1}
+            ):
+                fetched[str(vehicle["_id"])] = vehicle.get("user_id")
+            owners.update(fetched)
+            self._cache_owners(fetched, now)
+        return [vehicle_id for vehicle_id in vehicle_ids if owners[vehicle_id] == user_id]
+
+    def _cache_owners(self, owners: Dict[str, Optional[str]], now: float) -> None:
+        expiry = now + self.owner_cache_seconds
+        for vehicle_id, owner in owners.items():
+            self._owners.pop(vehicle_id, None)
+            self._owners[vehicle_id] = (owner, expiry)
+        # Every entry lives equally long, so the expired and the oldest ones are at the front
+        while self._owners and (
+            len(self._owners) > self.owner_cache_size or next(iter(self._owners.values()))[1] < now
+        ):
+            self._owners.popitem(last=False)
+
+    def add(self, frames: List[Dict]) -> bool:
+        """
+        Buffer frames for the next flush.
+
+        Args:
+            frames (List[Dict]): Fields of TelemetryReading
+
+        Returns:
+            bool: False if the buffer has no room for the frames, none are added then
+        """
+        if self._size + len(frames) > self.max_buffered:
+            return False
+        for frame in frames:
+            self._pending.setdefault(frame["vehicle_id"], []).append(frame)
+        self._size += len(frames)
+        if self._size >= self.flush_size:
+            self._wakeup.set()
+        return True
+
+    async def flush(self) -> int:
+        """Write all buffered frames and update the mileage of their vehicles."""
+        async with self._lock:
+            pending, self._pending = self._pending, {}
+            size, self._size = self._size, 0
+            if not size:
+                return 0
+
+            frames = [frame for vehicle_frames in pending.values() for frame in vehicle_frames]
+            try:
+                await TelemetryReading.get_motor_collection().insert_many(frames, ordered=False)
+            except BulkWriteError as exc:
+                # Partly written, retrying would duplicate the written frames
+                logger.warning("Dropped %d telemetry frames", len(exc.details.get("writeErrors", [])))
+            except Exception:
+                logger.exception("Failed to flush telemetry buffer, retrying on next flush")
+                if self._size + size <= self.max_buffered:
+                    for vehicle_id, vehicle_frames in pending.items():
+                        self._pending[vehicle_id] = vehicle_frames + self._pending.get(vehicle_id, [])
+                    self._size += size
+                return 0
+
+            # One mileage update and reading per vehicle rather than one per frame
+            now = datetime.utcnow()
+            updates = []
+            readings = []
+            for vehicle_id, vehicle_frames in pending.items():
+                odometers = [frame for frame in vehicle_frames if frame.get("odometer") is not None]
+                if not odometers:
+                    continue
+                latest = max(odometers, key=lambda frame: frame["odometer"])
+                updates.append(UpdateOne(
+                    {"_id": ObjectId(vehicle_id), "current_mileage": {"$lt": latest["odometer"]}},
+                    {"$max": {"current_mileage": latest["odometer"]}, "$set": {"updated_at": now}},
+                ))
+                readings.append({
+                    "vehicle_id": vehicle_id,
+                    "recorded_at": latest["recorded_at"],
+                    "mileage": latest["odometer"],
+                    "source": "telemetry",
+                })
+            if updates:
+                try:
+                    await Vehicle.get_motor_collection().bulk_write(updates, ordered=False)
+                    await MileageReading.get_motor_collection().insert_many(readings, ordered=False)
+                except Exception:
+                    logger.exception("Failed to update mileage from telemetry")
+
+            return size
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+
+# Global telemetry buffer instance
+telemetry_buffer = TelemetryBuffer(
+    flush_size=_settings.TELEMETRY_FLUSH_SIZE,
+    flush_seconds=_settings.TELEMETRY_FLUSH_SECONDS,
+    max_buffered=_settings.TELEMETRY_MAX_BUFFERED,
+    owner_cache_seconds=_settings.TELEMETRY_OWNER_CACHE_SECONDS,
+    owner_cache_size=_settings.TELEMETRY_OWNER_CACHE_SIZE,
+)
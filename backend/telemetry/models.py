@@ -0,0 +1,76 @@
+"""
+Telemetry models for FastAPI MashinMan project.
+"""
+
+import re
+from typing import List, Optional
+from datetime import datetime, timezone
+from beanie import Document, Granularity, TimeSeriesConfig
+from pydantic import BaseModel, Field, validator
+
+# OBD-II diagnostic trouble code, e.g. P0301
+_DTC_PATTERN = re.compile(r'^[PCBU][0-3][0-9A-F]{3}$')
+
+
+class TelemetryReading(Document):
+    """
+    One OBD-II reading of a vehicle, stored in a time-series collection.
+    """
+    vehicle_id: str = Field(..., description="شناسه خودرو")
+    recorded_at: datetime = Field(..., description="زمان ثبت")
+    device_id: Optional[str] = Field(None, description="شناسه دستگاه")
+    odometer: Optional[int] = Field(None, description="کیلومتر")
+    fuel_level: Optional[float] = Field(None, description="سطح سوخت (درصد)")
+    dtc_codes: List[str] = Field(default=[], description="کدهای خطای موتور")
+    
+    class Settings:
+        name = "telemetry_readings"
+        timeseries = TimeSeriesConfig(
+            time_field="recorded_at",
+            meta_field="vehicle_id",
+            granularity=Granularity.seconds,
+        )
+
+
+class TelemetryFrame(BaseModel):
+    """
+    Schema of one frame pushed by an OBD-II dongle.
+    """
+    vehicle_id: str = Field(..., pattern="^[0-9a-f]{24}$", description="شناسه خودرو")
+    recorded_at: datetime = Field(..., description="زمان ثبت")
+    device_id: Optional[str] = Field(None, max_length=64, description="شناسه دستگاه")
+    odometer: Optional[int] = Field(None, ge=0, le=10_000_000, description="کیلومتر")
+    fuel_level: Optional[float] = Field(None, ge=0, le=100, description="سطح سوخت (درصد)")
+    dtc_codes: List[str] = Field(default=[], max_length=32, description="کدهای خطای موتور")
+    
+    @validator('recorded_at')
+    def to_utc(cls, v):
+        # Stored naive in UTC like every other datetime
+        if v.tzinfo is not None:
+            return v.astimezone(timezone.utc).replace(tzinfo=None)
+        return v
+    
+    @validator('dtc_codes', each_item=True)
+    def validate_dtc_code(cls, v):
+        v = v.strip().upper()
+        if not _DTC_PATTERN.match(v):
+            raise ValueError('کد خطای نامعتبر')
+        return v
+
+
+class TelemetryFrameError(BaseModel):
+    """
+    Schema for a rejected telemetry frame.
+    """
+    index: int = Field(..., description="شماره فریم")
+    error: str = Field(..., description="خطا")
+
+
+class TelemetryIngestOut(BaseModel):
+    """
+    Schema for the result of a telemetry upload.
+    """
+    accepted: int = Field(..., description="تعداد فریم‌های پذیرفته شده")
+    rejected: int = Field(..., description="تعداد فریم‌های رد شده")
+    errors: List[TelemetryFrameError] = Field(default=[], description="خطاهای فریم‌ها")
+    buffered: int = Field(..., description="تعداد فریم‌های در انتظار ذخیره")
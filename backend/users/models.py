@@ -2,11 +2,12 @@
 User models for FastAPI MashinMan project using Beanie ODM.
 """
 
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from beanie import Document
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, validator
 from core.security import get_password_hash, verify_password
+from core.persian import fold_phone, tokenize_persian
 
 
 class User(Document):
@@ -41,14 +42,28 @@ class User(Document):
     emergency_contact_name: Optional[str] = Field(None, max_length=100, description="نام مخاطب اضطراری")
     emergency_contact_phone: Optional[str] = Field(None, max_length=15, description="تلفن مخاطب اضطراری")
     
+    # Admin search keys, derived from name and phone
+    search_names: List[str] = Field(default=[], description="کلمات نرمال‌شده نام")
+    phone_key: Optional[str] = Field(None, description="کلید یکسان‌شده شماره تلفن")
+    
     class Settings:
         name = "users"
         indexes = [
             "phone",
             "email",
             "created_at",
+            "search_names",
+            "phone_key",
         ]
     
+    @validator('search_names', always=True)
+    def set_search_names(cls, v, values):
+        return tokenize_persian(values.get('name') or '')
+    
+    @validator('phone_key', always=True)
+    def set_phone_key(cls, v, values):
+        return fold_phone(values.get('phone') or '') or None
+    
     def check_password(self, password: str) -> bool:
         """Check if provided password matches the hashed password"""
         return verify_password(password, self.password)
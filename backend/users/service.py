@@ -3,6 +3,7 @@ User service for FastAPI MashinMan project.
 Handles user-related business logic.
 """
 
+from datetime import datetime
 from typing import Optional
 from fastapi import HTTPException, status
 from beanie import PydanticObjectId
@@ -10,6 +11,7 @@ from beanie import PydanticObjectId
 from .models import User, UserCreate
 from core.security import get_password_hash
 from core.config import get_settings
+from core.persian import fold_phone, tokenize_persian
 
 _settings = get_settings()
 
@@ -79,6 +81,8 @@ class UserService:
             if hasattr(user, key) and value is not None:
                 setattr(user, key, value)
         
+        user.search_names = tokenize_persian(user.name)
+        user.phone_key = fold_phone(user.phone) or None
         user.updated_at = datetime.utcnow()
         await user.save()
         return user
\ No newline at end of file
@@ -2,15 +2,25 @@
 Vehicle API router for FastAPI MashinMan project.
 """
 
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
 from beanie import PydanticObjectId
 
-from .models import Vehicle, VehicleCreate, VehicleUpdate, VehicleOut
+from .models import (
+    Vehicle, VehicleCreate, VehicleUpdate, VehicleOut, FleetValueOut, MileagePointOut, VehicleSummaryOut,
+    GarageSummaryOut, NextServiceOut, MileageBucketOut, MileageRateOut
+)
+from .garage import get_garage_summary, record_vehicles
+from .importer import IMPORT_FORMATS, import_vehicles
+from .mileage import MILEAGE_BUCKETS, estimate_daily_rates, get_mileage_series, record_mileage
+from .summary import get_vehicle_summaries
+from .valuation import get_fleet_value
 from users.models import User
 from users.dependencies import get_current_active_user
-from core.jalali import gregorian_to_jalali, jalali_to_gregorian, parse_jalali_date
+from core.plates import plate_data_key
+from core.jalali import format_jalali_dates, gregorian_to_jalali, jalali_to_gregorian, parse_jalali_date
 
 router = APIRouter(prefix="/vehicles", tags=["vehicles"])
 
@@ -48,6 +58,8 @@ async def create_vehicle(
     
     # Save vehicle to database
     await vehicle.insert()
+    await record_vehicles(str(current_user.id), 1)
+    await record_mileage(str(vehicle.id), vehicle.current_mileage, 'vehicle')
     
     # Convert dates to Jalali for response
     vehicle_out = VehicleOut(**vehicle.dict())
@@ -81,6 +93,80 @@ async def list_vehicles(
     return vehicles_out
 
 
+@router.post("/import")
+async def import_fleet_vehicles(
+    request: Request,
+    format: str = "csv",
+    current_user: User = Depends(get_current_active_user)
+):
+    """Import vehicles from a CSV or NDJSON upload, streaming a per-row report"""
+    if format not in IMPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported import format. Expected one of: {', '.join(IMPORT_FORMATS)}"
+        )
+    
+    return StreamingResponse(
+        import_vehicles(str(current_user.id), request.stream(), format),
+        media_type="application/x-ndjson"
+    )
+
+
+@router.get("/fleet/value", response_model=FleetValueOut)
+async def get_fleet_value_total(
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get the total market value of the current user's vehicles"""
+    # Values are precomputed by the valuation job; this only sums them
+    fleet_value = await get_fleet_value(str(current_user.id))
+    
+    return FleetValueOut(**fleet_value)
+
+
+def _summary_out(vehicle: Vehicle, summary: dict) -> VehicleSummaryOut:
+    points = summary['mileage_history']
+    dates = format_jalali_dates(
+        [summary['next_service_date'], summary['last_service_date']] + [point['date'] for point in points]
+    )
+    return VehicleSummaryOut(**{
+        **summary,
+        'current_mileage': vehicle.current_mileage,
+        'next_service_date': dates[0],
+        'last_service_date': dates[1],
+        'mileage_history': [
+            MileagePointOut(date=jalali_date, mileage=point['mileage'])
+            for point, jalali_date in zip(points, dates[2:])
+        ],
+    })
+
+
+@router.get("/garage", response_model=GarageSummaryOut)
+async def get_garage_totals(
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get the dashboard totals of the current user's garage"""
+    summary = await get_garage_summary(str(current_user.id))
+    
+    next_service = None
+    if summary.next_service:
+        next_service = NextServiceOut(
+            **{**summary.next_service.dict(), 'scheduled_date': format_jalali_dates([summary.next_service.scheduled_date])[0]}
+        )
+    
+    return GarageSummaryOut(**{**summary.dict(), 'next_service': next_service})
+
+
+@router.get("/summary", response_model=List[VehicleSummaryOut])
+async def get_vehicle_summaries_for_user(
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get the dashboard summary of every vehicle of the current user"""
+    vehicles = await Vehicle.find(Vehicle.user_id == str(current_user.id)).to_list()
+    summaries = await get_vehicle_summaries([str(vehicle.id) for vehicle in vehicles])
+    
+    return [_summary_out(vehicle, summaries[str(vehicle.id)]) for vehicle in vehicles]
+
+
 @router.get("/{vehicle_id}", response_model=VehicleOut)
 async def get_vehicle(
     vehicle_id: str,
@@ -110,6 +196,102 @@ async def get_vehicle(
     return vehicle_out
 
 
+@router.get("/{vehicle_id}/summary", response_model=VehicleSummaryOut)
+async def get_vehicle_summary(
+    vehicle_id: str,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get service counts, next service and recent mileage of a vehicle"""
+    vehicle = await Vehicle.get(vehicle_id)
+    if not vehicle:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Vehicle not found"
+        )
+    
+    # Check if user owns this vehicle
+    if vehicle.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to access this vehicle"
+        )
+    
+    summaries = await get_vehicle_summaries([vehicle_id])
+    
+    return _summary_out(vehicle, summaries[vehicle_id])
+
+
+@router.get("/{vehicle_id}/mileage", response_model=List[MileageBucketOut])
+async def get_vehicle_mileage_history(
+    vehicle_id: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    bucket: str = 'day',
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get a vehicle's odometer history in daily or Jalali monthly buckets"""
+    vehicle = await Vehicle.get(vehicle_id)
+    if not vehicle or vehicle.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to access this vehicle"
+        )
+    
+    if bucket not in MILEAGE_BUCKETS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"bucket must be one of {', '.join(MILEAGE_BUCKETS)}"
+        )
+    
+    end = datetime.utcnow().date()
+    start = end - timedelta(days=365)
+    try:
+        if start_date:
+            start = jalali_to_gregorian(parse_jalali_date(start_date))
+        if end_date:
+            end = jalali_to_gregorian(parse_jalali_date(end_date))
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    if start > end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start_date must not be after end_date"
+        )
+    
+    series = await get_mileage_series(vehicle_id, start, end, bucket)
+    starts = format_jalali_dates(item['start'] for item in series)
+    
+    return [MileageBucketOut(**{**item, 'start': jalali_start}) for item, jalali_start in zip(series, starts)]
+
+
+@router.get("/{vehicle_id}/mileage/rate", response_model=MileageRateOut)
+async def get_vehicle_mileage_rate(
+    vehicle_id: str,
+    window_days: int = Query(90, ge=7, le=730),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Estimate how many km a vehicle is driven per day"""
+    vehicle = await Vehicle.get(vehicle_id)
+    if not vehicle or vehicle.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to access this vehicle"
+        )
+    
+    rates = await estimate_daily_rates([vehicle_id], datetime.utcnow() - timedelta(days=window_days))
+    rate = rates.get(vehicle_id)
+    
+    return MileageRateOut(
+        vehicle_id=vehicle_id,
+        daily_mileage_rate=round(rate, 2) if rate is not None else None,
+        window_days=window_days,
+    )
+
+
 @router.put("/{vehicle_id}", response_model=VehicleOut)
 async def update_vehicle(
     vehicle_id: str,
@@ -152,13 +334,18 @@ async def update_vehicle(
     # Update timestamps
     update_data['updated_at'] = datetime.utcnow()
     
+    previous_mileage = vehicle.current_mileage
+    
     # Apply updates
     for key, value in update_data.items():
         if hasattr(vehicle, key) and value is not None:
             setattr(vehicle, key, value)
+    vehicle.plate_key = plate_data_key(vehicle.license_plate_data)
     
     # Save updated vehicle
     await vehicle.save()
+    if vehicle.current_mileage != previous_mileage:
+        await record_mileage(vehicle_id, vehicle.current_mileage, 'vehicle')
     
     # Convert dates to Jalali for response
     vehicle_out = VehicleOut(**vehicle.dict())
@@ -191,5 +378,6 @@ async def delete_vehicle(
     
     # Delete vehicle
     await vehicle.delete()
+    await record_vehicles(str(current_user.id), -1)
     
     return None
\ No newline at end of file
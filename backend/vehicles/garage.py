@@ -0,0 +1,229 @@
+"""
+Materialized garage summaries for FastAPI MashinMan project.
+
+One GarageSummary document per user holds the dashboard totals: vehicle
+count, service spend of the current Jalali year, the next scheduled
+service and the number of open emergency requests. Write paths apply
+targeted $inc/$set updates to it; a user without a summary, or whose
+summary is from a previous Jalali year, gets it rebuilt on read. The
+reconciliation job recomputes every summary from the source collections to
+correct any drift.
+"""
+
+import asyncio
+import logging
+from datetime import date, datetime
+from typing import Dict, Optional
+
+from pymongo import UpdateOne
+
+from .models import Vehicle, GarageSummary
+from services.models import Service, OPEN_SERVICE_STATUSES
+from history.models import ServiceHistory
+from emergency.models import EmergencyRequest, CLOSED_EMERGENCY_STATUSES
+from core.config import get_settings
+from core.jobs import PeriodicJob
+from core.jalali import jalali_month_range, jalali_now, jalali_year_month
+
+logger = logging.getLogger('mashinman')
+_settings = get_settings()
+
+
+def _next_service_fields(service: Dict) -> Dict:
+    return {
+        "service_id": str(service["_id"]),
+        "vehicle_id": service["vehicle_id"],
+        "service_type": service["service_type"],
+        "scheduled_date": service["scheduled_date"],
+    }
+
+
+async def _compute_summaries(match: Dict) -> Dict[str, Dict]:
+    year = jalali_now().year
+    year_start = jalali_month_range(year, 1)[0]
+    year_end = jalali_month_range(year + 1, 1)[0]
+
+    pipelines = [
+        (Vehicle, [
+            {"$match": match},
+            {"$group": {"_id": "$user_id", "vehicles_count": {"$sum": 1}}},
+        ]),
+        (ServiceHistory, [
+            {"$match": {**match, "actual_date": {"$gte": year_start, "$lt": year_end}}},
+            {"$group": {"_id": "$user_id", "spend_this_year": {"$sum": "$total_cost"}}},
+        ]),
+        (Service, [
+            {"$match": {**match, "status": {"$in": OPEN_SERVICE_STATUSES}, "scheduled_date": {"$ne": None}}},
+            {"$sort": {"scheduled_date": 1}},
+            {"$group": {"_id": "$user_id", "next_service": {"$first": {
+                "_id": "$_id", "vehicle_id": "$vehicle_id",
+                "service_type": "$service_type", "scheduled_date": "$scheduled_date",
+            }}}},
+        ]),
+        (EmergencyRequest, [
+            {"$match": {**match, "status": {"$nin": CLOSED_EMERGENCY_STATUSES}}},
+            {"$group": {"_id": "$user_id", "open_emergencies": {"$sum": 1}}},
+        ]),
+    ]
+    results = await asyncio.gather(*(
+        document.get_motor_collection().aggregate(pipeline).to_list(length=None)
+        for document, pipeline in pipelines
+    ))
+
+    summaries: Dict[str, Dict] = {}
+    for rows in results:
+        for row in rows:
+            if row["_id"] is None:
+                continue
+            summary = summaries.setdefault(str(row["_id"]), {
+                "vehicles_count": 0, "spend_year": year, "spend_this_year": 0,
+                "next_service": None, "open_emergencies": 0,
+            })
+            row.pop("_id")
+            if "next_service" in row:
+                row["next_service"] = _next_service_fields(row["next_service"])
+            summary.update(row)
+    return summaries
+
+
+async def _write_summaries(summaries: Dict[str, Dict]) -> None:
+    now = datetime.utcnow()
+    operations = [
+        UpdateOne(
+            {"user_id": user_id},
+            {"$set": {**summary, "reconciled_at": now, "updated_at": now}},
+            upsert=True,
+        )
+        for user_id, summary in summaries.items()
+    ]
+    if operations:
+        await GarageSummary.get_motor_collection().bulk_write(operations, ordered=False)
+
+
+async def rebuild_garage_summary(user_id: str) -> GarageSummary:
+    """
+    Recompute one user's garage summary from the source collections.
+
+    Args:
+        user_id (str): User ID
+
+    Returns:
+        GarageSummary: The recomputed summary
+    """
+    summaries = await _compute_summaries({"user_id": user_id})
+    summaries.setdefault(user_id, {
+        "vehicles_count": 0, "spend_year": jalali_now().year, "spend_this_year": 0,
+        "next_service": None, "open_emergencies": 0,
+    })
+    await _write_summaries({user_id: summaries[user_id]})
+    return await GarageSummary.find_one(GarageSummary.user_id == user_id)
+
+
+async def get_garage_summary(user_id: str) -> GarageSummary:
+    """
+    Get a user's garage summary, rebuilding it if missing or from a previous year.
+
+    Args:
+        user_id (str): User ID
+
+    Returns:
+        GarageSummary: The summary
+    """
+    summary = await GarageSummary.find_one(GarageSummary.user_id == user_id)
+    if summary is None or summary.spend_year != jalali_now().year:
+        summary = await rebuild_garage_summary(user_id)
+    return summary
+
+
+async def reconcile_garage_summaries() -> Dict[str, int]:
+    """
+    Recompute the garage summaries of all users.
+
+    Returns:
+        Dict[str, int]: Number of summaries written and removed
+    """
+    started_at = datetime.utcnow()
+    summaries = await _compute_summaries({})
+    await _write_summaries(summaries)
+    # Users without any vehicle, service, history or emergency left
+    removed = await GarageSummary.get_motor_collection().delete_many({"reconciled_at": {"$lt": started_at}})
+
+    logger.info("Reconciled %d garage summaries", len(summaries))
+    return {"reconciled": len(summaries), "removed": removed.deleted_count}
+
+
+async def _inc(user_id: str, changes: Dict[str, int], match: Optional[Dict] = None) -> None:
+    # Missing summaries are left to be rebuilt on read
+    await GarageSummary.get_motor_collection().update_one(
+        {"user_id": user_id, **(match or {})},
+        {"$inc": changes, "$set": {"updated_at": datetime.utcnow()}},
+    )
+
+
+async def record_vehicles(user_id: str, delta: int) -> None:
+    """Count vehicles added (delta > 0) or removed (delta < 0)."""
+    await _inc(user_id, {"vehicles_count": delta})
+
+
+async def record_emergencies(user_id: str, delta: int) -> None:
+    """Count emergency requests opened (delta > 0) or closed (delta < 0)."""
+    await _inc(user_id, {"open_emergencies": delta})
+
+
+async def record_spend(user_id: str, actual_date: date, amount: int) -> None:
+    """Add the cost of a service done on actual_date (negative to remove it)."""
+    year = jalali_year_month(actual_date)[0]
+    # Only the current year is counted; a summary of a previous year is rebuilt on read
+    if amount and year == jalali_now().year:
+        await _inc(user_id, {"spend_this_year": amount}, {"spend_year": year})
+
+
+async def refresh_next_service(user_id: str) -> None:
+    """Recompute the next scheduled service of a user's garage."""
+    service = await Service.get_motor_collection().find_one(
+        {"user_id": user_id, "status": {"$in": OPEN_SERVICE_STATUSES}, "scheduled_date": {"$ne": None}},
+        projection={"vehicle_id": 1, "service_type": 1, "scheduled_date": 1},
+        sort=[("scheduled_date", 1)],
+    )
+    await GarageSummary.get_motor_collection().update_one(
+        {"user_id": user_id},
+        {"$set": {"next_service": _next_service_fields(service) if service else None, "updated_at": datetime.utcnow()}},
+    )
+
+
+async def sync_next_service(user_id: str, service_id: str, service: Optional[Service] = None) -> None:
+    """
+    Update the next scheduled service after one service changed.
+
+    Args:
+        user_id (str): User ID
+        service_id (str): ID of the changed service
+        service (Service): The service after the change, None if it was deleted
+    """
+    summary = await GarageSummary.get_motor_collection().find_one(
+        {"user_id": user_id}, projection={"next_service": 1}
+    )
+    if summary is None:
+        return
+    current = summary.get("next_service")
+
+    scheduled_date = service.scheduled_date if service and service.status in OPEN_SERVICE_STATUSES else None
+    if isinstance(scheduled_date, date) and not isinstance(scheduled_date, datetime):
+        scheduled_date = datetime.combine(scheduled_date, datetime.min.time())
+
+    if scheduled_date and (current is None or scheduled_date <= current["scheduled_date"]):
+        # Earlier than the current next service, it takes its place
+        await GarageSummary.get_motor_collection().update_one(
+            {"user_id": user_id},
+            {"$set": {"next_service": _next_service_fields({
+                "_id": service_id, "vehicle_id": service.vehicle_id,
+                "service_type": service.service_type, "scheduled_date": scheduled_date,
+            }), "updated_at": datetime.utcnow()}},
+        )
+    elif current is not None and current["service_id"] == service_id:
+        # The next service was closed, deleted or moved later
+        await refresh_next_service(user_id)
+
+
+# Global garage summary job instance
+garage_summary_job = PeriodicJob("Garage summary reconciliation", reconcile_garage_summaries, _settings.GARAGE_SUMMARY_RECONCILE_HOURS * 3600)
@@ -0,0 +1,247 @@
+"""
+Fleet vehicle import for FastAPI MashinMan project.
+
+A CSV or NDJSON upload is read from the request stream line by line and
+validated in chunks with the same VehicleCreate schema as POST /vehicles/.
+Plates already registered are found with one indexed $in lookup per chunk,
+the valid rows are inserted with unordered insert_many, and the outcome of
+every row is streamed back as NDJSON while the rest of the file is read.
+"""
+
+import csv
+import json
+import logging
+from collections import deque
+from datetime import datetime
+from typing import AsyncIterator, Deque, Dict, List, Optional, Set, Tuple
+
+from bson import ObjectId
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+
+from .models import Vehicle, VehicleCreate, MileageReading
+from .garage import record_vehicles
+from core.config import get_settings
+from core.exceptions import InvalidMileageException
+from core.jalali import jalali_to_gregorian, parse_jalali_date
+from core.utils import parse_license_plate_string
+
+logger = logging.getLogger('mashinman')
+_settings = get_settings()
+
+IMPORT_FORMATS = ['csv', 'ndjson']
+
+# Columns of a CSV import, in the order of the template
+IMPORT_COLUMNS = [
+    'license_plate', 'brand', 'model', 'manufacture_year',
+    'current_mileage', 'last_service_date', 'last_service_mileage',
+]
+
+def _error_message(exc: Exception) -> str:
+    if isinstance(exc, ValidationError):
+        return "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in exc.errors())
+    return getattr(exc, 'message', None) or str(exc)
+
+
+class _LineFeed:
+    """Line source of a single csv.reader, filled as lines arrive from the request stream."""
+
+    def __init__(self):
+        self.lines: Deque[str] = deque()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if not self.lines:
+            raise StopIteration
+        return self.lines.popleft()
+
+
+async def _iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    pending = b''
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b'\n')
+        for line in lines:
+            yield line.decode('utf-8', errors='replace').strip('\ufeff\r')
+    if pending:
+        yield pending.decode('utf-8', errors='replace').strip('\ufeff\r')
+
+
+async def _iter_records(chunks: AsyncIterator[bytes], format: str) -> AsyncIterator[Tuple[int, Optional[Dict], Optional[str]]]:
+    # Yields (row number, record, parse error)
+    header: Optional[List[str]] = None
+    row = 0
+    feed = _LineFeed()
+    reader = csv.reader(feed)
+    async for line in _iter_lines(chunks):
+        if not line.strip():
+            continue
+        if format == 'csv':
+            feed.lines.append(line)
+            values = [value.strip() for value in next(reader)]
+            if header is None:
+                header = values
+                continue
+            row += 1
+            yield row, {column: value or None for column, value in zip(header, values)}, None
+        else:
+            row += 1
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield row, None, "JSON نامعتبر است"
+                continue
+            if not isinstance(record, dict):
+                yield row, None, "هر سطر باید یک شیء JSON باشد"
+                continue
+            yield row, record, None
+
+
+def _build_vehicle(record: Dict, user_id: str, now: datetime) -> Vehicle:
+    plate = record.get('license_plate_data')
+    if plate is None:
+        plate = parse_license_plate_string(record.get('license_plate') or '')
+
+    last_service_date = record.get('last_service_date')
+    if last_service_date:
+        last_service_date = jalali_to_gregorian(parse_jalali_date(str(last_service_date)))
+
+    vehicle_data = VehicleCreate(
+        license_plate_data=plate,
+        brand=record.get('brand'),
+        model=record.get('model'),
+        manufacture_year=record.get('manufacture_year'),
+        current_mileage=record.get('current_mileage'),
+        last_service_date=last_service_date,
+        last_service_mileage=record.get('last_service_mileage'),
+    )
+    # IDs are assigned up front so results can be reported per row
+    vehicle = Vehicle(id=ObjectId(), **vehicle_data.dict(), user_id=user_id, created_at=now, updated_at=now)
+    if vehicle.plate_key is None:
+        raise ValueError("پلاک خودرو نامعتبر است")
+    return vehicle
+
+
+async def _import_chunk(user_id: str, rows: List[Tuple[int, Vehicle]], seen: Set[str]) -> List[Dict]:
+    results: Dict[int, Dict] = {}
+    existing: Set[str] = set()
+    async for vehicle in Vehicle.get_motor_collection().find(
+        {"plate_key": {"$in": [vehicle.plate_key for _, vehicle in rows]}},
+        projection={"plate_key": 1},
+    ):
+        existing.add(vehicle["plate_key"])
+
+    vehicles: List[Vehicle] = []
+    for row, vehicle in rows:
+        key = vehicle.plate_key
+        if key in existing or key in seen:
+            results[row] = {"row": row, "status": "duplicate", "detail": "پلاک خودرو قبلا ثبت شده است"}
+            continue
+        seen.add(key)
+        vehicles.append(vehicle)
+        results[row] = {"row": row, "status": "created", "vehicle_id": str(vehicle.id)}
+
+    if vehicles:
+        rows_by_id = {str(vehicle.id): row for row, vehicle in rows}
+
+        def fail(failed_vehicles: List[Vehicle], detail: str, saved: bool = False) -> None:
+            for vehicle in failed_vehicles:
+                row = rows_by_id[str(vehicle.id)]
+                results[row] = {"row": row, "status": "failed", "detail": detail}
+                if saved:
+                    results[row]["vehicle_id"] = str(vehicle.id)
+
+        failed: Set[int] = set()
+        try:
+            await Vehicle.insert_many(vehicles, ordered=False)
+        except BulkWriteError as exc:
+            failed = {error["index"] for error in exc.details.get("writeErrors", [])}
+            logger.warning("Vehicle import failed for %d rows", len(failed))
+        except Exception:
+            failed = set(range(len(vehicles)))
+            logger.exception("Vehicle import failed for %d rows", len(failed))
+        fail([vehicles[index] for index in failed], "ذخیره خودرو ناموفق بود")
+
+        # The vehicles below are saved; a failure to record them elsewhere is reported on their rows
+        created = [vehicle for index, vehicle in enumerate(vehicles) if index not in failed]
+        if created:
+            try:
+                await record_vehicles(user_id, len(created))
+            except Exception:
+                logger.exception("Garage summary not updated for %d imported vehicles", len(created))
+                fail(created, "خودرو ذخیره شد اما خلاصه ناوگان به‌روزرسانی نشد", saved=True)
+
+            try:
+                await MileageReading.get_motor_collection().insert_many([
+                    {
+                        "vehicle_id": str(vehicle.id),
+                        "recorded_at": vehicle.created_at,
+                        "mileage": vehicle.current_mileage,
+                        "source": "import",
+                    }
+                    for vehicle in created
+                ], ordered=False)
+            except BulkWriteError as exc:
+                missing = [created[error["index"]] for error in exc.details.get("writeErrors", [])]
+                logger.warning("Mileage readings not recorded for %d imported vehicles", len(missing))
+                fail(missing, "خودرو ذخیره شد اما ثبت کیلومتر ناموفق بود", saved=True)
+            except Exception:
+                logger.exception("Mileage readings not recorded for %d imported vehicles", len(created))
+                fail(created, "خودرو ذخیره شد اما ثبت کیلومتر ناموفق بود", saved=True)
+
+    return [results[row] for row in sorted(results)]
+
+
+async def import_vehicles(user_id: str, chunks: AsyncIterator[bytes], format: str) -> AsyncIterator[bytes]:
+    """
+    Import vehicles from an uploaded file, streaming one NDJSON result per row.
+
+    Args:
+        user_id (str): Owner of the imported vehicles
+        chunks (AsyncIterator[bytes]): The request body
+        format (str): 'csv' or 'ndjson'
+
+    Yields:
+        bytes: NDJSON lines with the row number, status ('created', 'duplicate',
+            'invalid' or 'failed') and vehicle ID or error, then one summary line.
+            A failed row keeps its vehicle ID if the vehicle was saved but its
+            garage summary or mileage reading could not be recorded
+    """
+    counts = {"rows": 0, "created": 0, "duplicate": 0, "invalid": 0, "failed": 0}
+    seen: Set[str] = set()
+    pending: List[Tuple[int, Vehicle]] = []
+    invalid: List[Dict] = []
+    truncated = False
+
+    def emit(results: List[Dict]) -> bytes:
+        for result in results:
+            counts[result["status"]] += 1
+        return ''.join(json.dumps(result, ensure_ascii=False) + '\n' for result in results).encode('utf-8')
+
+    now = datetime.utcnow()
+    async for row, record, error in _iter_records(chunks, format):
+        if row > _settings.VEHICLE_IMPORT_MAX_ROWS:
+            truncated = True
+            break
+        counts["rows"] = row
+        if record is not None:
+            try:
+                pending.append((row, _build_vehicle(record, user_id, now)))
+            except (ValidationError, ValueError, TypeError, InvalidMileageException) as exc:
+                error = _error_message(exc)
+        if error is not None:
+            invalid.append({"row": row, "status": "invalid", "detail": error})
+
+        if len(pending) + len(invalid) >= _settings.VEHICLE_IMPORT_CHUNK_SIZE:
+            results = invalid + (await _import_chunk(user_id, pending, seen) if pending else [])
+            yield emit(sorted(results, key=lambda result: result["row"]))
+            pending, invalid = [], []
+
+    if pending or invalid:
+        results = invalid + (await _import_chunk(user_id, pending, seen) if pending else [])
+        yield emit(sorted(results, key=lambda result: result["row"]))
+
+    logger.info("Imported %d of %d vehicles for user %s", counts["created"], counts["rows"], user_id)
+    yield (json.dumps({"summary": {**counts, "truncated": truncated}}) + '\n').encode('utf-8')
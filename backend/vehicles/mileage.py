@@ -0,0 +1,117 @@
+"""
+Odometer history for FastAPI MashinMan project.
+
+Every mileage a vehicle is seen at is appended to the mileage_readings
+time-series collection, so Vehicle.current_mileage is no longer the only
+record. Range reads are downsampled on the server into day buckets or
+Jalali month buckets, and the daily mileage rate used for due-date
+prediction is estimated from the same readings.
+"""
+
+import logging
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Union
+
+from .models import MileageReading
+from core.config import get_settings
+from core.jalali import jalali_month_boundaries
+
+logger = logging.getLogger('mashinman')
+_settings = get_settings()
+
+MILEAGE_BUCKETS = ['day', 'month']
+
+
+def _as_datetime(value: Union[date, datetime, None]) -> Optional[datetime]:
+    if value is not None and not isinstance(value, datetime):
+        return datetime.combine(value, datetime.min.time())
+    return value
+
+
+async def record_mileage(
+    vehicle_id: str,
+    mileage: int,
+    source: str,
+    recorded_at: Union[date, datetime, None] = None,
+) -> None:
+    """
+    Append one odometer reading of a vehicle.
+
+    Args:
+        vehicle_id (str): Vehicle ID
+        mileage (int): Odometer reading
+        source (str): Write path the reading came from
+        recorded_at (datetime): When the vehicle was at this mileage (now if None)
+    """
+    await MileageReading.get_motor_collection().insert_one({
+        "vehicle_id": vehicle_id,
+        "recorded_at": _as_datetime(recorded_at) or datetime.utcnow(),
+        "mileage": mileage,
+        "source": source,
+    })
+
+
+async def get_mileage_series(vehicle_id: str, start: date, end: date, bucket: str = 'day') -> List[Dict]:
+    """
+    Get a vehicle's odometer readings between two days, downsampled.
+
+    Args:
+        vehicle_id (str): Vehicle ID
+        start (date): First day
+        end (date): Last day
+        bucket (str): 'day' or 'month' (Jalali)
+
+    Returns:
+        List[Dict]: Fields of MileageBucketOut with 'start' as a datetime, oldest first
+    """
+    match = {
+        "vehicle_id": vehicle_id,
+        "recorded_at": {"$gte": _as_datetime(start), "$lt": _as_datetime(end + timedelta(days=1))},
+    }
+    accumulators = {
+        "mileage": {"$max": "$mileage"},
+        "min_mileage": {"$min": "$mileage"},
+        "readings": {"$sum": 1},
+    }
+    if bucket == 'month':
+        grouping = {"$bucket": {
+            "groupBy": "$recorded_at",
+            "boundaries": jalali_month_boundaries(start, end),
+            "output": accumulators,
+        }}
+    else:
+        grouping = {"$group": {"_id": {"$dateTrunc": {"date": "$recorded_at", "unit": "day"}}, **accumulators}}
+
+    pipeline = [{"$match": match}, grouping, {"$sort": {"_id": 1}}]
+    rows = await MileageReading.get_motor_collection().aggregate(pipeline).to_list(length=None)
+    return [{"start": row.pop("_id"), **row} for row in rows]
+
+
+async def estimate_daily_rates(vehicle_ids: List[str], since: datetime) -> Dict[str, float]:
+    """
+    Estimate km driven per day from the odometer readings since a time.
+
+    Args:
+        vehicle_ids (List[str]): Vehicle IDs
+        since (datetime): Start of the estimation window
+
+    Returns:
+        Dict[str, float]: Daily rate of the vehicles with enough readings
+    """
+    pipeline = [
+        {"$match": {"vehicle_id": {"$in": vehicle_ids}, "recorded_at": {"$gte": since}}},
+        {"$group": {
+            "_id": "$vehicle_id",
+            "first_at": {"$min": "$recorded_at"},
+            "last_at": {"$max": "$recorded_at"},
+            "first_mileage": {"$min": "$mileage"},
+            "last_mileage": {"$max": "$mileage"},
+        }},
+    ]
+    rates = {}
+    async for row in MileageReading.get_motor_collection().aggregate(pipeline):
+        days = (row["last_at"] - row["first_at"]).total_seconds() / 86400
+        distance = row["last_mileage"] - row["first_mileage"]
+        if days >= _settings.DUE_DATE_MIN_RATE_DAYS and distance > 0:
+            rates[row["_id"]] = distance / days
+    return rates
@@ -4,7 +4,8 @@ Vehicle models for FastAPI MashinMan project using Beanie ODM with Jalali calend
 
 from typing import Optional, List
 from datetime import datetime, date
-from beanie import Document
+from beanie import Document, Granularity, TimeSeriesConfig
+from pymongo import IndexModel
 from pydantic import BaseModel, Field, validator
 import jdatetime  # For Jalali calendar support
 from core.utils import (
@@ -12,6 +13,7 @@ from core.utils import (
     get_iranian_car_brands
 )
 from core.exceptions import InvalidMileageException
+from core.plates import plate_data_key
 
 
 class LicensePlateData(BaseModel):
@@ -31,6 +33,7 @@ class Vehicle(Document):
     
     # Vehicle identification
     license_plate_data: LicensePlateData = Field(..., description="اطلاعات پلاک خودرو")
+    plate_key: Optional[str] = Field(None, description="کلید یکسان‌شده پلاک")
     brand: str = Field(..., description="برند خودرو")
     model: str = Field(..., description="مدل خودرو")
     manufacture_year: int = Field(..., description="سال تولید")
@@ -43,12 +46,31 @@ class Vehicle(Document):
     # Ownership
     user_id: str = Field(..., description="شناسه کاربر مالک")
     
+    # Market valuation (maintained by the valuation batch job)
+    estimated_value: Optional[int] = Field(None, description="ارزش تخمینی (ریال)")
+    valued_at: Optional[datetime] = Field(None, description="تاریخ ارزش‌گذاری")
+    
+    # Maintenance status (maintained by the due-date job)
+    is_overdue: bool = Field(default=False, description="دارای سرویس سررسید گذشته")
+    
     # Metadata
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     
     class Settings:
         name = "vehicles"
+        indexes = [
+            "user_id",
+            "plate_key",
+            # Faceted admin search filters
+            [("brand", 1), ("model", 1), ("manufacture_year", 1)],
+            [("manufacture_year", 1), ("current_mileage", 1)],
+            [("is_overdue", 1), ("current_mileage", 1)],
+        ]
+    
+    @validator('plate_key', always=True)
+    def set_plate_key(cls, v, values):
+        return plate_data_key(values.get('license_plate_data'))
     
     @validator('current_mileage')
     def validate_current_mileage(cls, v):
@@ -144,5 +166,131 @@ class VehicleOut(VehicleCreate):
     """
     id: str = Field(..., description="شناسه خودرو")
     user_id: str = Field(..., description="شناسه کاربر مالک")
+    estimated_value: Optional[int] = Field(None, description="ارزش تخمینی (ریال)")
+    valued_at: Optional[datetime] = Field(None, description="تاریخ ارزش‌گذاری")
     created_at: datetime = Field(..., description="تاریخ ایجاد")
     updated_at: datetime = Field(..., description="تاریخ به‌روزرسانی")
+
+
+class FleetValueOut(BaseModel):
+    """
+    Schema for the precomputed market value of a user's fleet.
+    """
+    vehicles_count: int = Field(..., description="تعداد خودروها")
+    valued_vehicles_count: int = Field(..., description="تعداد خودروهای ارزش‌گذاری شده")
+    total_value: int = Field(..., description="ارزش کل (ریال)")
+    valued_at: Optional[datetime] = Field(None, description="تاریخ آخرین ارزش‌گذاری")
+
+
+class MileagePointOut(BaseModel):
+    """
+    Schema for one recorded mileage of a vehicle.
+    """
+    date: str = Field(..., description="تاریخ (شمسی)")
+    mileage: int = Field(..., description="کیلومتر")
+
+
+class VehicleSummaryOut(BaseModel):
+    """
+    Schema for the dashboard summary of a vehicle.
+    """
+    vehicle_id: str = Field(..., description="شناسه خودرو")
+    current_mileage: int = Field(..., description="کیلومتر فعلی")
+    services_count: int = Field(..., description="تعداد سرویس‌ها")
+    pending_services_count: int = Field(..., description="تعداد سرویس‌های در انتظار")
+    urgent_services_count: int = Field(..., description="تعداد سرویس‌های فوری")
+    next_service_date: Optional[str] = Field(None, description="تاریخ سرویس بعدی (شمسی)")
+    last_service_date: Optional[str] = Field(None, description="تاریخ آخرین سرویس (شمسی)")
+    mileage_history: List[MileagePointOut] = Field(default=[], description="تاریخچه کیلومتر")
+
+
+class NextServiceInfo(BaseModel):
+    """
+    Earliest scheduled open service of a user's garage.
+    """
+    service_id: str = Field(..., description="شناسه سرویس")
+    vehicle_id: str = Field(..., description="شناسه خودرو")
+    service_type: str = Field(..., description="نوع سرویس")
+    scheduled_date: datetime = Field(..., description="تاریخ برنامه‌ریزی شده")
+
+
+class GarageSummary(Document):
+    """
+    Materialized dashboard totals of one user's garage.
+    
+    Kept current by targeted updates from the write paths and recomputed
+    from scratch by the reconciliation job.
+    """
+    user_id: str = Field(..., description="شناسه کاربر")
+    vehicles_count: int = Field(default=0, description="تعداد خودروها")
+    spend_year: int = Field(..., description="سال شمسی هزینه‌ها")
+    spend_this_year: int = Field(default=0, description="هزینه سرویس‌ها در سال جاری (ریال)")
+    next_service: Optional[NextServiceInfo] = Field(None, description="سرویس بعدی")
+    open_emergencies: int = Field(default=0, description="درخواست‌های اضطراری باز")
+    reconciled_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "garage_summaries"
+        indexes = [
+            IndexModel([("user_id", 1)], unique=True),
+        ]
+
+
+class NextServiceOut(BaseModel):
+    """
+    Schema for the next scheduled service of a garage.
+    """
+    service_id: str = Field(..., description="شناسه سرویس")
+    vehicle_id: str = Field(..., description="شناسه خودرو")
+    service_type: str = Field(..., description="نوع سرویس")
+    scheduled_date: str = Field(..., description="تاریخ برنامه‌ریزی شده (شمسی)")
+
+
+class GarageSummaryOut(BaseModel):
+    """
+    Schema for the dashboard totals of a user's garage.
+    """
+    vehicles_count: int = Field(..., description="تعداد خودروها")
+    spend_year: int = Field(..., description="سال شمسی هزینه‌ها")
+    spend_this_year: int = Field(..., description="هزینه سرویس‌ها در سال جاری (ریال)")
+    next_service: Optional[NextServiceOut] = Field(None, description="سرویس بعدی")
+    open_emergencies: int = Field(..., description="درخواست‌های اضطراری باز")
+    updated_at: datetime = Field(..., description="تاریخ به‌روزرسانی")
+
+
+class MileageReading(Document):
+    """
+    One odometer reading of a vehicle, stored in a time-series collection.
+    """
+    vehicle_id: str = Field(..., description="شناسه خودرو")
+    recorded_at: datetime = Field(default_factory=datetime.utcnow, description="زمان ثبت")
+    mileage: int = Field(..., description="کیلومتر")
+    source: str = Field(..., description="منبع (vehicle, history, fuel)")
+    
+    class Settings:
+        name = "mileage_readings"
+        timeseries = TimeSeriesConfig(
+            time_field="recorded_at",
+            meta_field="vehicle_id",
+            granularity=Granularity.hours,
+        )
+
+
+class MileageBucketOut(BaseModel):
+    """
+    Schema for the odometer readings of a vehicle within one day or month.
+    """
+    start: str = Field(..., description="شروع بازه (شمسی)")
+    mileage: int = Field(..., description="بیشترین کیلومتر")
+    min_mileage: int = Field(..., description="کمترین کیلومتر")
+    readings: int = Field(..., description="تعداد ثبت‌ها")
+
+
+class MileageRateOut(BaseModel):
+    """
+    Schema for the estimated daily mileage of a vehicle.
+    """
+    vehicle_id: str = Field(..., description="شناسه خودرو")
+    daily_mileage_rate: Optional[float] = Field(None, description="میانگین کیلومتر روزانه")
+    window_days: int = Field(..., description="بازه محاسبه (روز)")
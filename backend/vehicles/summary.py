@@ -0,0 +1,100 @@
+"""
+Vehicle dashboard summaries for FastAPI MashinMan project.
+
+Service counts, the next scheduled service and the recent mileage history
+of any number of vehicles are computed with one aggregation: the matching
+service history entries are unioned into the services, and a $facet splits
+the combined stream into the per-field groupings. Only the hot history
+collection is read, so the mileage history and the last service date leave
+out records that were moved to the archive.
+"""
+
+import logging
+from typing import Dict, List
+
+from services.models import Service, OPEN_SERVICE_STATUSES, URGENT_SERVICE_PRIORITIES
+from history.models import ServiceHistory
+from core.config import get_settings
+
+logger = logging.getLogger('mashinman')
+_settings = get_settings()
+
+
+def _empty_summary(vehicle_id: str) -> Dict:
+    return {
+        "vehicle_id": vehicle_id,
+        "services_count": 0,
+        "pending_services_count": 0,
+        "urgent_services_count": 0,
+        "next_service_date": None,
+        "last_service_date": None,
+        "mileage_history": [],
+    }
+
+
+async def get_vehicle_summaries(vehicle_ids: List[str]) -> Dict[str, Dict]:
+    """
+    Compute the dashboard summary of some vehicles.
+
+    Args:
+        vehicle_ids (List[str]): Vehicle IDs
+
+    Returns:
+        Dict[str, Dict]: Fields of VehicleSummaryOut (dates as datetimes) keyed by vehicle ID
+    """
+    summaries = {vehicle_id: _empty_summary(vehicle_id) for vehicle_id in vehicle_ids}
+    if not vehicle_ids:
+        return summaries
+
+    is_open = {"$in": ["$status", OPEN_SERVICE_STATUSES]}
+    pipeline = [
+        {"$match": {"vehicle_id": {"$in": vehicle_ids}}},
+        {"$project": {"vehicle_id": 1, "status": 1, "priority": 1, "scheduled_date": 1, "source": {"$literal": "service"}}},
+        {"$unionWith": {
+            "coll": ServiceHistory.get_motor_collection().name,
+            "pipeline": [
+                {"$match": {"vehicle_id": {"$in": vehicle_ids}}},
+                # Only the newest entries of each vehicle reach the mileage facet
+                {"$setWindowFields": {
+                    "partitionBy": "$vehicle_id",
+                    "sortBy": {"actual_date": -1},
+                    "output": {"rank": {"$documentNumber": {}}},
+                }},
+                {"$match": {"rank": {"$lte": _settings.VEHICLE_SUMMARY_MILEAGE_POINTS}}},
+                {"$project": {"vehicle_id": 1, "actual_date": 1, "actual_mileage": 1, "source": {"$literal": "history"}}},
+            ],
+        }},
+        {"$facet": {
+            "services": [
+                {"$match": {"source": "service"}},
+                {"$group": {
+                    "_id": "$vehicle_id",
+                    "services_count": {"$sum": 1},
+                    "pending_services_count": {"$sum": {"$cond": [is_open, 1, 0]}},
+                    "urgent_services_count": {"$sum": {"$cond": [
+                        {"$and": [is_open, {"$in": ["$priority", URGENT_SERVICE_PRIORITIES]}]}, 1, 0
+                    ]}},
+                    # $min skips the nulls of closed or unscheduled services
+                    "next_service_date": {"$min": {"$cond": [is_open, "$scheduled_date", None]}},
+                }},
+            ],
+            "mileage": [
+                {"$match": {"source": "history"}},
+                {"$sort": {"actual_date": -1}},
+                {"$group": {
+                    "_id": "$vehicle_id",
+                    "points": {"$push": {"date": "$actual_date", "mileage": "$actual_mileage"}},
+                }},
+            ],
+        }},
+    ]
+    result = await Service.get_motor_collection().aggregate(pipeline).to_list(length=None)
+
+    for row in result[0]["services"]:
+        summaries[row.pop("_id")].update(row)
+    for row in result[0]["mileage"]:
+        summary = summaries[row["_id"]]
+        # Oldest first, for charting
+        summary["mileage_history"] = row["points"][::-1]
+        summary["last_service_date"] = row["points"][0]["date"]
+    return summaries
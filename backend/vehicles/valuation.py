@@ -0,0 +1,129 @@
+"""
+Vehicle portfolio valuation job for FastAPI MashinMan project.
+
+Joins every vehicle against the latest car price for its
+brand/model/manufacture year with an in-memory hash join and writes the
+result back onto the vehicle documents, so fleet value reads never have
+to touch the pricing collection.
+"""
+
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from .models import Vehicle
+from pricing.models import CarPricing
+from core.config import get_settings
+from core.jobs import PeriodicJob
+
+logger = logging.getLogger('mashinman')
+_settings = get_settings()
+
+CarKey = Tuple[str, str, int]
+
+
+async def load_latest_prices() -> Dict[CarKey, int]:
+    """
+    Build the hash side of the join: latest price per (brand, model, year).
+
+    Returns:
+        Dict[CarKey, int]: Latest price keyed by (brand, model, year)
+    """
+    pipeline = [
+        {"$sort": {"price_date": -1, "updated_at": -1}},
+        {"$group": {
+            "_id": {"brand": "$brand", "model": "$model", "year": "$year"},
+            "price": {"$first": "$price"},
+        }},
+    ]
+    prices = {}
+    async for row in CarPricing.aggregate(pipeline):
+        prices[(row["_id"]["brand"], row["_id"]["model"], row["_id"]["year"])] = row["price"]
+    return prices
+
+
+async def run_valuation(batch_size: Optional[int] = None) -> Dict[str, int]:
+    """
+    Value every vehicle against the latest car prices.
+
+    Args:
+        batch_size (int): Number of vehicle updates per bulk write
+
+    Returns:
+        Dict[str, int]: Counts of scanned, valued and unpriced vehicles
+    """
+    batch_size = batch_size or _settings.VEHICLE_VALUATION_BATCH_SIZE
+    prices = await load_latest_prices()
+    valued_at = datetime.utcnow()
+    collection = Vehicle.get_motor_collection()
+
+    stats = {"scanned": 0, "valued": 0, "unpriced": 0}
+    operations: List[UpdateOne] = []
+
+    cursor = collection.find(
+        {},
+        projection={"brand": 1, "model": 1, "manufacture_year": 1, "estimated_value": 1},
+        batch_size=batch_size,
+    )
+    async for vehicle in cursor:
+        stats["scanned"] += 1
+        price = prices.get((vehicle.get("brand"), vehicle.get("model"), vehicle.get("manufacture_year")))
+        if price is None:
+            stats["unpriced"] += 1
+            # Clear a stale value only when there is one to clear
+            if vehicle.get("estimated_value") is None:
+                continue
+        else:
+            stats["valued"] += 1
+
+        operations.append(UpdateOne(
+            {"_id": vehicle["_id"]},
+            {"$set": {"estimated_value": price, "valued_at": valued_at}},
+        ))
+        if len(operations) >= batch_size:
+            await collection.bulk_write(operations, ordered=False)
+            operations = []
+
+    if operations:
+        await collection.bulk_write(operations, ordered=False)
+
+    logger.info(
+        "Vehicle valuation finished: %(scanned)d scanned, %(valued)d valued, %(unpriced)d unpriced",
+        stats,
+    )
+    return stats
+
+
+async def get_fleet_value(user_id: str) -> Dict:
+    """
+    Sum the precomputed vehicle values of a user's fleet.
+
+    Args:
+        user_id (str): Owner user ID
+
+    Returns:
+        Dict: vehicles_count, valued_vehicles_count, total_value and valued_at
+    """
+    pipeline = [
+        {"$match": {"user_id": user_id}},
+        {"$group": {
+            "_id": None,
+            "vehicles_count": {"$sum": 1},
+            "valued_vehicles_count": {"$sum": {"$cond": [{"$gt": ["$estimated_value", None]}, 1, 0]}},
+            "total_value": {"$sum": {"$ifNull": ["$estimated_value", 0]}},
+            "valued_at": {"$max": "$valued_at"},
+        }},
+    ]
+    rows = await Vehicle.aggregate(pipeline).to_list()
+    if not rows:
+        return {"vehicles_count": 0, "valued_vehicles_count": 0, "total_value": 0, "valued_at": None}
+
+    row = rows[0]
+    row.pop("_id", None)
+    return row
+
+
+# Global valuation job instance
+vehicle_valuation_job = PeriodicJob("Vehicle valuation job", run_valuation, _settings.VEHICLE_VALUATION_INTERVAL_HOURS * 3600)